@@ -3,14 +3,17 @@ Triadeflow DataSync API
 Flask server para validacao de dados
 """
 
-from flask import Flask, request, jsonify, send_file, render_template_string
+from flask import Flask, Response, request, jsonify, send_file, render_template_string
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+import numpy as np
 import pandas as pd
+import io
 import os
-import random
+import secrets
 import string
 from datetime import datetime
+from itertools import chain
 import logging
 
 from contact_validator import ContactDataValidator
@@ -317,30 +320,52 @@ app = Flask(__name__)
 CORS(app)
 
 app.config['UPLOAD_FOLDER'] = '/tmp/uploads'
-app.config['OUTPUT_FOLDER'] = '/tmp/outputs'
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024
 app.config['DEFAULT_DDD'] = os.getenv('DEFAULT_DDD', '85')
+# /validate responde em streaming por padrao (?stream=0 monta o CSV inteiro antes de enviar)
+app.config['STREAM_RESPONSE'] = os.getenv('STREAM_RESPONSE', '1') != '0'
+# Linhas por bloco no streaming. Nome proprio: STREAM_CHUNK_ROWS e do worker do backend (la 0 = desligado)
+app.config['VALIDATE_CHUNK_ROWS'] = int(os.getenv('VALIDATE_CHUNK_ROWS', '5000'))
+if app.config['VALIDATE_CHUNK_ROWS'] < 1:
+    raise ValueError(
+        f"VALIDATE_CHUNK_ROWS deve ser >= 1 (recebido {app.config['VALIDATE_CHUNK_ROWS']}); "
+        "para desligar o streaming use STREAM_RESPONSE=0"
+    )
 
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
-
-def generate_id(length=20):
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=length))
-
-def split_name(name):
-    if pd.isna(name):
-        return "", ""
-    name_str = str(name).strip()
-    if '/' in name_str:
-        name_str = name_str.split('/')[0].strip()
-
-    name_parts = name_str.split()
-    if len(name_parts) == 0:
-        return "", ""
-    elif len(name_parts) == 1:
-        return name_parts[0].title(), ""
-    else:
-        return name_parts[0].title(), " ".join(name_parts[1:]).title()
+
+ID_ALPHABET = string.ascii_uppercase + string.digits
+_ID_CHARS = np.array(list(ID_ALPHABET))
+# Maior multiplo de len(ID_ALPHABET) que cabe em um byte: bytes acima disso sao descartados (sem vies)
+_ID_BYTE_LIMIT = 256 - 256 % len(ID_ALPHABET)
+
+def generate_ids(count, length=20):
+    """Gera count IDs de uma vez a partir de um buffer de secrets.token_bytes."""
+    needed = count * length
+    indexes = np.empty(0, dtype=np.uint8)
+    while len(indexes) < needed:
+        buf = np.frombuffer(secrets.token_bytes(needed - len(indexes) + 16), dtype=np.uint8)
+        indexes = np.concatenate([indexes, buf[buf < _ID_BYTE_LIMIT] % len(ID_ALPHABET)])
+    chars = _ID_CHARS[indexes[:needed]].reshape(count, length)
+    return chars.view(f'<U{length}').ravel().tolist() if count else []
+
+def split_names(names):
+    """Separa primeiro nome e sobrenome de uma coluna inteira (metodos de string do pandas)."""
+    s = pd.Series(names, dtype=object).reset_index(drop=True)
+    text = s.where(s.notna(), '').astype(str).str.strip()
+    text = text.str.split('/', n=1).str[0].str.strip()
+    parts = text.str.split(n=1)
+    first = parts.str[0].fillna('').str.title()
+    last = parts.str[1].fillna('').str.split().str.join(' ').str.title()
+    return first.tolist(), last.tolist()
+
+def _column_values(df, col):
+    """Valores da coluna como o df.iterrows() entregaria (inclui o upcast de planilhas so numericas)."""
+    if col is None:
+        return [''] * len(df)
+    common = df.iloc[:0].to_numpy().dtype
+    s = df[col] if common == object else df[col].astype(common)
+    return s.astype(object).tolist()
 
 @app.route('/')
 def home():
@@ -368,6 +393,93 @@ def health():
         'timestamp': datetime.now().isoformat()
     })
 
+def _map_columns(columns):
+    col_mapping = {}
+    for col in columns:
+        col_lower = str(col).lower()
+        if 'empresa' in col_lower or 'company' in col_lower or 'business' in col_lower:
+            col_mapping['business'] = col
+        elif 'telefone' in col_lower or 'phone' in col_lower or 'fone' in col_lower:
+            col_mapping['phone'] = col
+        elif 'email' in col_lower or 'e-mail' in col_lower:
+            col_mapping['email'] = col
+        elif ('contato' in col_lower or 'nome' in col_lower) and 'phone' not in col_lower:
+            col_mapping['contact'] = col
+    return col_mapping
+
+def _build_output(df, col_mapping, validator):
+    """Monta o DataFrame de saida (formato CRM) para um bloco de linhas da planilha."""
+    n = len(df)
+
+    phone_main, phone_additional = validator.format_phones_batch(
+        _column_values(df, col_mapping.get('phone'))
+    )
+    email_main, email_additional, _ = validator.validate_emails_batch(
+        _column_values(df, col_mapping.get('email'))
+    )
+    first_name, last_name = split_names(_column_values(df, col_mapping.get('contact')))
+    business = pd.Series(_column_values(df, col_mapping.get('business')), dtype=object).map(str)
+
+    return pd.DataFrame({
+        'Contact ID': generate_ids(n, 20),
+        'Phone': phone_main,
+        'Email': email_main,
+        'First Name': first_name,
+        'Last Name': last_name,
+        'Business Name': business.str.strip().tolist(),
+        'Opportunity ID': generate_ids(n, 20),
+        'Opportunity name': ('Opportunity - ' + business).tolist(),
+        'Pipeline': ['Sales Pipeline'] * n,
+        'Stage': ['New Lead'] * n,
+        'Opportunity Value': [''] * n,
+        'Source': ['DataSync API'] * n,
+        'Status': ['Open'] * n,
+        'Additional Emails': email_additional,
+        'Additional Phones': phone_additional,
+        'Tags': ['DataSync Import'] * n,
+    })
+
+def _read_excel(filepath):
+    try:
+        return pd.read_excel(filepath, skiprows=1)
+    except:
+        return pd.read_excel(filepath)
+
+def _read_csv(filepath, chunksize=None):
+    """
+    CSV com todas as colunas como texto, nos dois modos de /validate: o tipo nao muda entre
+    blocos do streaming e telefones numericos com celulas vazias nao viram float
+    (85987654321 nao vira "85987654321.0", que formatava como +55 85 859876543210).
+    """
+    return pd.read_csv(filepath, dtype=str, chunksize=chunksize)
+
+def _iter_input_chunks(filepath, filename, chunk_rows):
+    """
+    Le a planilha em blocos de chunk_rows linhas. CSV e lido em streaming (_read_csv);
+    XLSX e lido inteiro e fatiado.
+    """
+    if filename.endswith('.xlsx') or filename.endswith('.xls'):
+        df = _read_excel(filepath)
+        for start in range(0, max(len(df), 1), chunk_rows):
+            yield df.iloc[start:start + chunk_rows]
+    else:
+        yield from _read_csv(filepath, chunksize=chunk_rows)
+
+def _stream_csv(first_chunk, chunks, col_mapping, validator, filepath):
+    """Gera o CSV de saida bloco a bloco; apaga o upload quando termina (ou se o cliente desconectar)."""
+    rows = 0
+    try:
+        for i, chunk in enumerate(chain([first_chunk], chunks)):
+            rows += len(chunk)
+            yield _build_output(chunk, col_mapping, validator).to_csv(index=False, header=(i == 0))
+        logger.info(f"Validacao concluida (streaming): {rows} registros")
+    except Exception as e:
+        logger.error(f"Erro durante streaming: {str(e)}")
+        raise
+    finally:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
 @app.route('/validate', methods=['POST'])
 def validate():
     logger.info("Iniciando validacao")
@@ -382,75 +494,43 @@ def validate():
     filename = secure_filename(file.filename)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"{timestamp}_{filename}")
+    output_filename = f"validated_{timestamp}_{filename.replace('.xlsx', '.csv').replace('.xls', '.csv')}"
+    stream = request.args.get('stream', '1' if app.config['STREAM_RESPONSE'] else '0') != '0'
+    streaming_started = False
 
     try:
         file.save(filepath)
+        validator = ContactDataValidator(default_ddd=app.config['DEFAULT_DDD'])
+
+        if stream:
+            # O primeiro bloco e processado antes de responder: erros de leitura ainda viram 500 em JSON
+            chunks = _iter_input_chunks(filepath, filename, app.config['VALIDATE_CHUNK_ROWS'])
+            first_chunk = next(chunks, None)
+            if first_chunk is None:
+                first_chunk = pd.DataFrame()
+            col_mapping = _map_columns(first_chunk.columns)
+            body = _stream_csv(first_chunk, chunks, col_mapping, validator, filepath)
+            streaming_started = True
+            return Response(
+                body,
+                mimetype='text/csv',
+                headers={'Content-Disposition': f'attachment; filename="{output_filename}"'},
+            )
 
         if filename.endswith('.xlsx') or filename.endswith('.xls'):
-            try:
-                df = pd.read_excel(filepath, skiprows=1)
-            except:
-                df = pd.read_excel(filepath)
+            df = _read_excel(filepath)
         else:
-            df = pd.read_csv(filepath)
+            df = _read_csv(filepath)
 
         logger.info(f"Arquivo lido: {len(df)} registros")
 
-        col_mapping = {}
-        for col in df.columns:
-            col_lower = str(col).lower()
-            if 'empresa' in col_lower or 'company' in col_lower or 'business' in col_lower:
-                col_mapping['business'] = col
-            elif 'telefone' in col_lower or 'phone' in col_lower or 'fone' in col_lower:
-                col_mapping['phone'] = col
-            elif 'email' in col_lower or 'e-mail' in col_lower:
-                col_mapping['email'] = col
-            elif ('contato' in col_lower or 'nome' in col_lower) and 'phone' not in col_lower:
-                col_mapping['contact'] = col
-
-        validator = ContactDataValidator(default_ddd=app.config['DEFAULT_DDD'])
-        output_data = []
-
-        for idx, row in df.iterrows():
-            phone_main, phone_additional = validator.validate_and_format_phones(
-                row.get(col_mapping.get('phone', ''), '')
-            )
-            email_main, email_additional, _ = validator.validate_and_format_email(
-                row.get(col_mapping.get('email', ''), '')
-            )
-
-            first_name, last_name = split_name(
-                row.get(col_mapping.get('contact', ''), '')
-            )
+        output_df = _build_output(df, _map_columns(df.columns), validator)
+        output = io.BytesIO(output_df.to_csv(index=False).encode('utf-8'))
 
-            output_data.append({
-                'Contact ID': generate_id(20),
-                'Phone': phone_main,
-                'Email': email_main,
-                'First Name': first_name,
-                'Last Name': last_name,
-                'Business Name': str(row.get(col_mapping.get('business', ''), '')).strip(),
-                'Opportunity ID': generate_id(20),
-                'Opportunity name': f'Opportunity - {row.get(col_mapping.get("business", ""), "")}',
-                'Pipeline': 'Sales Pipeline',
-                'Stage': 'New Lead',
-                'Opportunity Value': '',
-                'Source': 'DataSync API',
-                'Status': 'Open',
-                'Additional Emails': email_additional,
-                'Additional Phones': phone_additional,
-                'Tags': 'DataSync Import'
-            })
-
-        output_df = pd.DataFrame(output_data)
-        output_filename = f"validated_{timestamp}_{filename.replace('.xlsx', '.csv').replace('.xls', '.csv')}"
-        output_path = os.path.join(app.config['OUTPUT_FOLDER'], output_filename)
-        output_df.to_csv(output_path, index=False)
-
-        logger.info(f"Validacao concluida: {output_path}")
+        logger.info(f"Validacao concluida: {len(output_df)} registros")
 
         return send_file(
-            output_path,
+            output,
             mimetype='text/csv',
             as_attachment=True,
             download_name=output_filename
@@ -461,7 +541,8 @@ def validate():
         return jsonify({'error': str(e)}), 500
 
     finally:
-        if os.path.exists(filepath):
+        # No modo streaming quem apaga o upload e o gerador, ao terminar
+        if not streaming_started and os.path.exists(filepath):
             os.remove(filepath)
 
 if __name__ == '__main__':
@@ -1,24 +1,48 @@
 # Autenticação: hash de senha, JWT, dependência get_current_user
+import asyncio
+import json
+import logging
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 import bcrypt
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 import jwt
 from sqlalchemy.orm import Session
 
-from app.config import JWT_ALGORITHM, JWT_SECRET
+from app.config import (
+    BCRYPT_ROUNDS,
+    BCRYPT_THREADS,
+    JWT_ALGORITHM,
+    JWT_SECRET,
+    REDIS_URL,
+    TESTING,
+    USER_CACHE_REDIS,
+    USER_CACHE_SIZE,
+    USER_CACHE_TTL,
+)
 from app.db import get_db
 from app.models import User
 
+logger = logging.getLogger(__name__)
+
 security = HTTPBearer(auto_error=False)
 
 
+# bcrypt solta o GIL: threads próprias, limitadas, para não disputar o threadpool das rotas
+_bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_THREADS, thread_name_prefix="bcrypt")
+
+
 def hash_password(password: str) -> str:
-    """Gera hash bcrypt da senha."""
+    """Gera hash bcrypt da senha (custo BCRYPT_ROUNDS)."""
     pwd_bytes = password.encode("utf-8")
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     return bcrypt.hashpw(pwd_bytes, salt).decode("utf-8")
 
 
@@ -30,6 +54,18 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     )
 
 
+async def hash_password_async(password: str) -> str:
+    """hash_password no pool do bcrypt, sem bloquear o event loop."""
+    return await asyncio.get_running_loop().run_in_executor(_bcrypt_executor, hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password no pool do bcrypt, sem bloquear o event loop."""
+    return await asyncio.get_running_loop().run_in_executor(
+        _bcrypt_executor, verify_password, plain_password, hashed_password
+    )
+
+
 def create_access_token(user_id: str) -> str:
     """Gera JWT com user_id no payload."""
     expire = datetime.utcnow() + timedelta(days=7)
@@ -46,6 +82,86 @@ def decode_token(token: str) -> str | None:
         return None
 
 
+class UserCache:
+    """
+    Cache de usuários autenticados por id, com TTL curto: evita um SELECT em users a cada request.
+    Guarda uma cópia desanexada da sessão só com id, email e created_at (sem hash de senha).
+    Com USER_CACHE_REDIS, usa também o Redis como segundo nível (compartilhado entre processos).
+    Nenhuma rota altera ou apaga usuários, então não há invalidação: um usuário removido direto
+    no banco ainda autentica por até ttl segundos (em cada nível), que é o limite de desatualização.
+    """
+
+    def __init__(self, ttl: float = USER_CACHE_TTL, max_size: int = USER_CACHE_SIZE, use_redis: bool = False):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.use_redis = use_redis
+        self._data: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis = None
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"user:{user_id}"
+
+    def _get_redis(self):
+        if self._redis is None:
+            from redis import Redis
+            self._redis = Redis.from_url(REDIS_URL, socket_timeout=0.5)
+        return self._redis
+
+    @staticmethod
+    def _to_user(data: dict) -> User:
+        return User(id=data["id"], email=data["email"], created_at=datetime.fromisoformat(data["created_at"]))
+
+    def get(self, user_id: str) -> User | None:
+        if self.ttl <= 0:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is not None:
+                if entry[0] > now:
+                    self._data.move_to_end(user_id)
+                    return self._to_user(entry[1])
+                del self._data[user_id]
+        if self.use_redis:
+            try:
+                raw = self._get_redis().get(self._key(user_id))
+            except Exception as e:
+                logger.warning(f"[AUTH] Falha ao ler usuário do cache Redis: {e}")
+                return None
+            if raw:
+                data = json.loads(raw)
+                self._store(user_id, data)
+                return self._to_user(data)
+        return None
+
+    def _store(self, user_id: str, data: dict) -> None:
+        with self._lock:
+            self._data[user_id] = (time.monotonic() + self.ttl, data)
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def put(self, user: User) -> None:
+        if self.ttl <= 0:
+            return
+        data = {"id": user.id, "email": user.email, "created_at": user.created_at.isoformat()}
+        self._store(user.id, data)
+        if self.use_redis:
+            try:
+                self._get_redis().set(self._key(user.id), json.dumps(data), ex=max(int(self.ttl), 1))
+            except Exception as e:
+                logger.warning(f"[AUTH] Falha ao gravar usuário no cache Redis: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+user_cache = UserCache(use_redis=USER_CACHE_REDIS and not TESTING)
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials | None = Depends(security),
     db: Session = Depends(get_db),
@@ -67,11 +183,16 @@ async def get_current_user(
             detail="Token inválido ou expirado",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = db.query(User).filter(User.id == user_id).first()
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    # Consulta síncrona vai para o threadpool: get_current_user é async e não pode travar o event loop
+    user = await run_in_threadpool(lambda: db.query(User).filter(User.id == user_id).first())
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuário não encontrado",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    user_cache.put(user)
     return user
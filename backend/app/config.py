@@ -27,6 +27,31 @@ REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 JWT_SECRET = os.getenv("JWT_SECRET", "altere-isso-em-producao-use-uma-string-longa-e-aleatoria")
 JWT_ALGORITHM = "HS256"
 
+# Pool de conexões do banco (por processo: API e cada worker RQ têm o seu)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Segundos esperando conexão livre antes de erro
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Recicla conexões mais velhas que isso (segundos; -1 = nunca)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Testa a conexão (SELECT 1) antes de usar: descarta conexões mortas após restart do Postgres
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Migração do schema (create_all + colunas/índices novos) no startup da API. Com vários processos
+# de API, desligue e rode "python -m app.migrate" uma vez antes de subir (ex.: release command)
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() in ("1", "true", "yes")
+
+# Custo do bcrypt (2^rounds iterações; cada +1 dobra o tempo). Hashes antigos seguem válidos
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Threads dedicadas ao bcrypt: picos de login não ocupam o threadpool compartilhado da API
+BCRYPT_THREADS = int(os.getenv("BCRYPT_THREADS", "0")) or min(4, os.cpu_count() or 1)
+
+# Cache dos usuários autenticados (evita SELECT em users a cada request). TTL em segundos; 0 desliga.
+# Sem invalidação: usuário apagado/alterado no banco continua valendo no cache por até USER_CACHE_TTL
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+# Também guarda no Redis (compartilhado entre os processos da API)
+USER_CACHE_REDIS = os.getenv("USER_CACHE_REDIS", "false").lower() in ("1", "true", "yes")
+
 # Rejeita qualquer fallback para SQLite ou banco em memória (exceto em testes)
 TESTING = os.getenv("TESTING", "").lower() in ("1", "true")
 if not TESTING and ("sqlite" in DATABASE_URL.lower() or ":memory:" in DATABASE_URL):
@@ -40,6 +65,56 @@ UPLOADS_DIR = STORAGE_DIR / "uploads"
 OUTPUTS_DIR = STORAGE_DIR / "outputs"
 REPORTS_DIR = STORAGE_DIR / "reports"
 
+# Compressão do CSV de saída em disco: "none" ou "gzip" (servido com Content-Encoding: gzip)
+OUTPUT_COMPRESSION = os.getenv("OUTPUT_COMPRESSION", "none").lower()
+OUTPUT_GZIP_LEVEL = int(os.getenv("OUTPUT_GZIP_LEVEL", "6"))
+
+# Leitor de CSV no modo streaming: "c" (pandas) ou "pyarrow" (colunas string[pyarrow]; exige pyarrow
+# e o mesmo número de colunas em todas as linhas)
+CSV_ENGINE = os.getenv("CSV_ENGINE", "c").lower()
+# Grava também uma cópia Parquet (colunar) da saída normalizada ao lado do CSV (exige pyarrow)
+PARQUET_OUTPUT = os.getenv("PARQUET_OUTPUT", "false").lower() in ("1", "true", "yes")
+
+# Engine do pipeline de normalização: "vectorized" (coluna a coluna) ou "rowwise" (df.iterrows, referência)
+PROCESSING_ENGINE = os.getenv("PROCESSING_ENGINE", "vectorized")
+
+# Cache LRU de telefones normalizados: "job" (um cache por job) ou "process" (sobrevive entre jobs do worker)
+PHONE_CACHE_SCOPE = os.getenv("PHONE_CACHE_SCOPE", "job")
+PHONE_CACHE_SIZE = int(os.getenv("PHONE_CACHE_SIZE", "100000"))
+
+# Streaming de CSV/XLSX: linhas por bloco na leitura/escrita (0 = lê o arquivo inteiro de uma vez)
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", "0"))
+
+# Processamento multi-core de um job: número de processos (1 = desligado, 0 = os.cpu_count()),
+# linhas por shard e mínimo de linhas para valer a pena subir o pool. Mesmo com um processo só
+# (e sem streaming), a normalização anda de SHARD_ROWS em SHARD_ROWS linhas e o progresso/ETA
+# do SSE é publicado a cada shard
+PROCESSING_WORKERS = int(os.getenv("PROCESSING_WORKERS", "1")) or (os.cpu_count() or 1)
+SHARD_ROWS = int(os.getenv("SHARD_ROWS", "20000"))
+PARALLEL_MIN_ROWS = int(os.getenv("PARALLEL_MIN_ROWS", "50000"))
+
+# Filas por tamanho do job (ordem de prioridade): small, large e bulk (usuário acima da cota justa).
+# Jobs com >= LARGE_JOB_ROWS linhas estimadas ou >= LARGE_JOB_MB vão para "large"; usuário com
+# FAIR_SHARE_ACTIVE_JOBS ou mais jobs ativos vai para "bulk". QUEUE_WEIGHTS pesa a escolha dos workers.
+LARGE_JOB_ROWS = int(os.getenv("LARGE_JOB_ROWS", "10000"))
+LARGE_JOB_MB = float(os.getenv("LARGE_JOB_MB", "2"))
+FAIR_SHARE_ACTIVE_JOBS = int(os.getenv("FAIR_SHARE_ACTIVE_JOBS", "3"))
+QUEUE_WEIGHTS = os.getenv("QUEUE_WEIGHTS", "small=6,large=3,bulk=1")
+
+# Tamanho máximo do upload em POST /jobs (MB). Com STREAM_CHUNK_ROWS ativo pode ser aumentado.
+MAX_UPLOAD_SIZE_MB = int(os.getenv("MAX_UPLOAD_SIZE_MB", "10"))
+
+# Tamanho máximo de página em GET /jobs
+JOBS_PAGE_MAX = int(os.getenv("JOBS_PAGE_MAX", "100"))
+# Tamanho máximo de página em GET /jobs/{id}/rows
+ROWS_PAGE_MAX = int(os.getenv("ROWS_PAGE_MAX", "500"))
+
+# Tempo máximo (segundos) de uma conexão SSE em GET /jobs/{id}/events; o EventSource reconecta sozinho
+SSE_MAX_SECONDS = int(os.getenv("SSE_MAX_SECONDS", "1800"))
+
+# Máximo de planilhas por requisição em POST /jobs/batch (contando as de dentro de .zip)
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "100"))
+
 
 def get_masked_database_url() -> str:
     """Retorna DATABASE_URL com senha mascarada (para logs/debug)."""
@@ -1,10 +1,24 @@
 # Conexão com o Postgres (banco de dados)
 # Usa SQLAlchemy para falar com o banco e psycopg3 como driver
+import os
 import re
-from sqlalchemy import create_engine, text
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.schema import CreateIndex
 
-from app.config import DATABASE_URL
+from app.config import (
+    DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+)
 
 
 def _mask_url(url: str) -> str:
@@ -21,7 +35,69 @@ _db_url = DATABASE_URL
 if _db_url.startswith("postgresql://") and "+" not in _db_url.split("?")[0]:
     _db_url = _db_url.replace("postgresql://", "postgresql+psycopg://", 1)
 
-engine = create_engine(_db_url)
+class PoolStats:
+    """Contadores do pool de conexões deste processo (checkouts, conexões novas e espera por conexão)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.checkouts = 0
+        self.connects = 0
+        self.invalidated = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+pool_stats = PoolStats()
+
+
+class _TimedQueuePool(QueuePool):
+    """QueuePool que mede quanto cada checkout esperou por uma conexão (inclui abrir conexão nova)."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_stats.record_wait(time.perf_counter() - start)
+
+
+def _engine_kwargs(url: str) -> dict:
+    """Configuração do pool (DB_POOL_*). SQLite (só nos testes) fica com o pool padrão."""
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "poolclass": _TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+# Um engine por processo: a API e cada worker RQ reaproveitam o mesmo pool entre requests/jobs
+engine = create_engine(_db_url, **_engine_kwargs(_db_url))
+event.listen(engine, "connect", lambda *_: pool_stats.incr("connects"))
+event.listen(engine, "invalidate", lambda *_: pool_stats.incr("invalidated"))
+
+# Processo filho (supervisor de workers, ProcessPoolExecutor) não pode usar as conexões
+# herdadas do pai: descarta o pool no filho sem fechar os sockets que ainda são do pai
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -35,6 +111,87 @@ def get_db():
         db.close()
 
 
+# Chave do pg_advisory_lock que serializa migrações entre processos (vários workers do uvicorn)
+MIGRATION_LOCK_KEY = 727_001
+
+
+def _is_postgres(conn) -> bool:
+    return conn.dialect.name == "postgresql"
+
+
+@contextmanager
+def _migration_lock(conn):
+    """No Postgres, só um processo migra por vez; os outros esperam e depois não acham nada a fazer."""
+    if not _is_postgres(conn):
+        yield
+        return
+    conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    try:
+        yield
+    finally:
+        conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+
+
+def _drop_invalid_indexes(conn, names: list[str]) -> None:
+    """CREATE INDEX CONCURRENTLY que falhou deixa o índice INVALID; apaga para ser recriado."""
+    invalid = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE NOT i.indisvalid AND c.relname = ANY(:names)"
+        ),
+        {"names": names},
+    ).scalars().all()
+    for name in invalid:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+
+def _create_index(conn, index) -> None:
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=conn.dialect))
+    if _is_postgres(conn):
+        # CONCURRENTLY: não bloqueia escritas na tabela enquanto o índice é construído
+        ddl = re.sub(r"^CREATE (UNIQUE )?INDEX", r"CREATE \1INDEX CONCURRENTLY", ddl)
+    conn.execute(text(ddl))
+
+
+def add_missing_columns() -> list[str]:
+    """
+    create_all não altera tabelas que já existem: adiciona (ALTER TABLE ... ADD COLUMN)
+    as colunas novas dos modelos que ainda faltam no banco e cria os índices que faltam.
+    As colunas entram sem NOT NULL nem default no servidor. Retorna "tabela.coluna" adicionadas.
+    Roda em autocommit (CREATE INDEX CONCURRENTLY não pode estar numa transação) e, no Postgres,
+    com advisory lock: processos que sobem juntos não disputam o mesmo ALTER/CREATE INDEX.
+    """
+    added = []
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn, _migration_lock(conn):
+        # Inspeciona depois de pegar o lock: vê o que outro processo acabou de migrar
+        insp = inspect(conn)
+        if_not_exists = "IF NOT EXISTS " if _is_postgres(conn) else ""
+        for table in Base.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            new_cols = [col for col in table.columns if col.name not in existing]
+            for col in new_cols:
+                col_type = col.type.compile(dialect=conn.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {if_not_exists}{col.name} {col_type}"))
+                added.append(f"{table.name}.{col.name}")
+            if _is_postgres(conn):
+                _drop_invalid_indexes(conn, [index.name for index in table.indexes])
+                insp = inspect(conn)
+            existing_indexes = {ix["name"] for ix in insp.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    _create_index(conn, index)
+    return added
+
+
+def migrate() -> list[str]:
+    """Cria as tabelas que faltam e aplica add_missing_columns (startup da API ou python -m app.migrate)."""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn, _migration_lock(conn):
+        Base.metadata.create_all(bind=conn)
+    return add_missing_columns()
+
+
 def test_connection():
     """
     Testa a conexão com o Postgres e retorna current_database, current_user.
@@ -46,6 +203,29 @@ def test_connection():
         return {"current_database": row[0], "current_user": row[1]}
 
 
+def pool_status() -> dict:
+    """Estado do pool deste processo: conexões em uso/livres e métricas de checkout."""
+    pool = engine.pool
+    status = {"pool_class": type(pool).__name__, "pre_ping": DB_POOL_PRE_PING}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            max_overflow=DB_MAX_OVERFLOW,
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=pool.overflow(),
+        )
+    checkouts = pool_stats.checkouts
+    status.update(
+        checkouts=checkouts,
+        connects=pool_stats.connects,
+        invalidated=pool_stats.invalidated,
+        wait_seconds_avg=round(pool_stats.wait_seconds_total / checkouts, 6) if checkouts else 0.0,
+        wait_seconds_max=round(pool_stats.wait_seconds_max, 6),
+    )
+    return status
+
+
 def get_effective_url_masked() -> str:
     """Retorna a URL efetiva (com driver psycopg) mascarada."""
     return _mask_url(_db_url)
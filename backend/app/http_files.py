@@ -0,0 +1,142 @@
+# Respostas de arquivos com cache HTTP: ETag/Last-Modified, GET condicional (304) e Range (retomar download)
+import os
+from collections.abc import Iterator
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+# Blocos lidos ao enviar um trecho (Range) do arquivo
+RANGE_CHUNK_SIZE = 64 * 1024
+
+
+class RangeNotSatisfiable(Exception):
+    """Range pedido começa depois do fim do arquivo."""
+
+
+def cache_headers(stat_result: os.stat_result, variant: str = "") -> dict:
+    """
+    ETag e Last-Modified a partir de mtime e tamanho do arquivo (sem ler o conteúdo).
+    variant separa representações diferentes do mesmo arquivo (ex.: gzip x descompactado).
+    """
+    return {
+        "ETag": f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}{variant}"',
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+    }
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in tags
+
+
+def _not_modified_since(header: str, mtime: float) -> bool:
+    try:
+        return int(mtime) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def is_not_modified(request: Request, headers: dict, mtime: float) -> bool:
+    """If-None-Match (tem prioridade) ou If-Modified-Since dizem que o cliente já tem esta versão."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, headers["ETag"])
+    if_modified_since = request.headers.get("if-modified-since")
+    return bool(if_modified_since) and _not_modified_since(if_modified_since, mtime)
+
+
+def parse_range(header: str | None, size: int) -> tuple[int, int] | None:
+    """
+    Interpreta "Range: bytes=..." com um único intervalo. Retorna (início, fim) inclusivos,
+    ou None se não houver Range utilizável (resposta completa). Vários intervalos também viram
+    resposta completa. Levanta RangeNotSatisfiable se o início passar do fim do arquivo.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_s, sep, end_s = header[len("bytes="):].strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start_s:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+        else:
+            # bytes=-N: os últimos N bytes
+            start, end = max(size - int(end_s), 0), size - 1
+    except ValueError:
+        return None
+    if start_s and end_s and start > end:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
+
+def _range_allowed(request: Request, headers: dict, mtime: float) -> bool:
+    """If-Range: só retoma o download se o arquivo ainda for a mesma versão."""
+    if_range = request.headers.get("if-range")
+    if not if_range:
+        return True
+    if if_range.startswith(('"', "W/")):
+        return if_range == headers["ETag"]
+    return _not_modified_since(if_range, mtime)
+
+
+def _iter_file_range(path: Path, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_response(
+    request: Request,
+    path: Path,
+    media_type: str,
+    filename: str | None = None,
+    headers: dict | None = None,
+    variant: str = "",
+) -> Response:
+    """
+    Envia o arquivo como está no disco (sem parse), com ETag/Last-Modified.
+    Responde 304 se o cliente já tem a versão, 206 para Range de um intervalo e 416 se o Range for inválido.
+    """
+    stat_result = path.stat()
+    response_headers = {**cache_headers(stat_result, variant), **(headers or {})}
+    if is_not_modified(request, response_headers, stat_result.st_mtime):
+        return Response(status_code=304, headers=response_headers)
+
+    response_headers["Accept-Ranges"] = "bytes"
+    byte_range = None
+    if _range_allowed(request, response_headers, stat_result.st_mtime):
+        try:
+            byte_range = parse_range(request.headers.get("range"), stat_result.st_size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=416,
+                headers={**response_headers, "Content-Range": f"bytes */{stat_result.st_size}"},
+            )
+    if byte_range is None:
+        return FileResponse(
+            path, media_type=media_type, filename=filename, headers=response_headers, stat_result=stat_result
+        )
+
+    start, end = byte_range
+    response_headers.update({
+        "Content-Range": f"bytes {start}-{end}/{stat_result.st_size}",
+        "Content-Length": str(end - start + 1),
+    })
+    if filename:
+        response_headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return StreamingResponse(
+        _iter_file_range(path, start, end), status_code=206, media_type=media_type, headers=response_headers
+    )
@@ -1,21 +1,33 @@
 # Servidor principal: FastAPI (expõe os endpoints HTTP)
+import base64
+import json
 import logging
 import os
+from datetime import datetime
 from pathlib import Path
 from contextlib import asynccontextmanager
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 from sqlalchemy.orm import Session
 
 from app.auth import get_current_user
-from app.config import get_env_loaded_path, TESTING
-from app.db import Base, engine, get_db, get_driver_info, get_effective_url_masked, test_connection
-from app import models  # Registra as tabelas no Base antes de create_all
+from app.config import get_env_loaded_path, DB_AUTO_MIGRATE, JOBS_PAGE_MAX, TESTING
+from app.db import (
+    engine,
+    get_db,
+    get_driver_info,
+    get_effective_url_masked,
+    migrate,
+    pool_status,
+    test_connection,
+)
+from app.metrics import load_job_metrics, render_prometheus
+from app import models  # Registra as tabelas no Base antes de migrate (create_all)
 from app.models import Job, User
 from app.routes_auth import router as auth_router
-from app.routes_jobs import router as jobs_router
-from sqlalchemy import text
+from app.routes_jobs import UploadSizeLimitMiddleware, router as jobs_router
+from sqlalchemy import and_, func, or_, text
 
 logger = logging.getLogger("uvicorn.error")
 
@@ -43,8 +55,13 @@ async def lifespan(app: FastAPI):
             logger.error(f"[STARTUP] ERRO ao conectar no Postgres: {e}")
             raise
 
-        Base.metadata.create_all(bind=engine)
-        logger.info("[STARTUP] Tabelas criadas/verificadas (create_all)")
+        if DB_AUTO_MIGRATE:
+            added = migrate()
+            logger.info("[STARTUP] Tabelas criadas/verificadas (create_all)")
+            if added:
+                logger.info(f"[STARTUP] Colunas adicionadas: {', '.join(added)}")
+        else:
+            logger.info("[STARTUP] DB_AUTO_MIGRATE=false - schema via python -m app.migrate")
     else:
         logger.info("[STARTUP] Modo TESTING - skip Postgres check")
 
@@ -68,6 +85,8 @@ if ENV == "production":
         allow_origins = ["*"]
 else:
     allow_origins = ["*"]
+# Adicionado antes do CORS (fica por dentro dele): a resposta 413 também leva os cabeçalhos de CORS
+app.add_middleware(UploadSizeLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allow_origins,
@@ -80,25 +99,69 @@ app.add_middleware(
 app.include_router(auth_router)
 
 
+def _encode_cursor(job: Job) -> str:
+    """Cursor opaco da paginação por chave: (created_at, id) do último job da página."""
+    raw = json.dumps({"created_at": job.created_at.isoformat(), "id": job.id})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return datetime.fromisoformat(data["created_at"]), str(data["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
 @app.get("/jobs", summary="Listar jobs")
 def list_jobs_root(
-    limit: int = 20,
-    offset: int = 0,
+    limit: int = Query(20, ge=1, le=JOBS_PAGE_MAX),
+    offset: int = Query(0, ge=0),
     status: str | None = None,
+    cursor: str | None = None,
+    include_total: bool | None = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Lista os jobs do usuário (ordenados por created_at decrescente). Parâmetros: limit, offset, status."""
+    """
+    Lista os jobs do usuário (ordenados por created_at decrescente). Parâmetros: limit, offset, status.
+    Paginação por cursor: passe cursor= (vazio na primeira página) e depois o next_cursor recebido;
+    não usa OFFSET, então o custo por página não cresce com o número de jobs.
+    O total (COUNT) é calculado por padrão só no modo offset; use include_total para escolher.
+    """
     query = db.query(Job).filter(Job.user_id == current_user.id)
     if status:
         query = query.filter(Job.status == status)
-    query = query.order_by(Job.created_at.desc())
-    total = query.count()
-    jobs = query.offset(offset).limit(limit).all()
+    keyset = cursor is not None
+    if cursor:
+        created_at, job_id = _decode_cursor(cursor)
+        query = query.filter(
+            or_(Job.created_at < created_at, and_(Job.created_at == created_at, Job.id < job_id))
+        )
+    # id desempata jobs com o mesmo created_at (ordem estável para o cursor)
+    query = query.order_by(Job.created_at.desc(), Job.id.desc())
+
+    if include_total is None:
+        include_total = not keyset
+    total = None
+    if include_total:
+        total_query = db.query(func.count(Job.id)).filter(Job.user_id == current_user.id)
+        if status:
+            total_query = total_query.filter(Job.status == status)
+        total = total_query.scalar()
+
+    if not keyset:
+        query = query.offset(offset)
+    # Uma linha a mais diz se existe próxima página sem precisar de COUNT
+    jobs = query.limit(limit + 1).all()
+    has_more = len(jobs) > limit
+    jobs = jobs[:limit]
     return {
         "total": total,
         "limit": limit,
-        "offset": offset,
+        "offset": None if keyset else offset,
+        "next_cursor": _encode_cursor(jobs[-1]) if has_more else None,
         "jobs": [
             {
                 "id": j.id,
@@ -141,6 +204,63 @@ def health_db():
         return {"status": "error", "error": f"{type(e).__name__}: {e}"}
 
 
+@app.get("/health/db/pool")
+def health_db_pool():
+    """Métricas do pool de conexões do banco neste processo da API."""
+    try:
+        return {"status": "ok", **pool_status()}
+    except Exception as e:
+        return {"status": "error", "error": f"{type(e).__name__}: {e}"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Métricas no formato Prometheus: histogramas das fases de process_job (agregadas de todos
+    os workers via Redis) e o pool de conexões do banco deste processo da API.
+    """
+    phases, rows, jobs = {}, {}, {}
+    if not TESTING:
+        try:
+            phases, rows, jobs = load_job_metrics()
+        except Exception as e:
+            logger.warning(f"[METRICS] Falha ao ler métricas dos jobs no Redis: {e}")
+    pool = pool_status()
+    extra = {
+        "flowbase_db_pool_checkouts_total": ("counter", "Checkouts de conexão do pool.", pool["checkouts"]),
+        "flowbase_db_pool_connects_total": ("counter", "Conexões novas abertas pelo pool.", pool["connects"]),
+        "flowbase_db_pool_checkout_wait_seconds_max": (
+            "gauge", "Maior espera por uma conexão do pool.", pool["wait_seconds_max"],
+        ),
+    }
+    if "checked_out" in pool:
+        extra["flowbase_db_pool_checked_out"] = ("gauge", "Conexões em uso.", pool["checked_out"])
+    return PlainTextResponse(
+        render_prometheus(phases, rows, jobs, extra), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/health/workers")
+def health_workers():
+    """Lista os workers RQ ativos e o estado de cada um."""
+    try:
+        from app.queue_rq import worker_health
+        workers = worker_health()
+        return {"status": "ok", "count": len(workers), "workers": workers}
+    except Exception as e:
+        return {"status": "error", "error": f"{type(e).__name__}: {e}"}
+
+
+@app.get("/health/queues")
+def health_queues():
+    """Profundidade e tempo de espera de cada classe de fila (small, large, bulk)."""
+    try:
+        from app.queue_rq import queue_stats
+        return {"status": "ok", "queues": queue_stats()}
+    except Exception as e:
+        return {"status": "error", "error": f"{type(e).__name__}: {e}"}
+
+
 if os.getenv("ENV", "development") != "production":
     @app.get("/debug/db")
     def debug_db():
@@ -0,0 +1,227 @@
+# Instrumentação dos jobs: tempo, CPU, linhas/s e pico de RSS por fase de process_job,
+# agregados no Redis e expostos em formato Prometheus (GET /metrics)
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+
+from app.config import REDIS_URL, TESTING
+
+logger = logging.getLogger(__name__)
+
+# Limites (segundos) dos buckets do histograma de duração das fases
+PHASE_SECONDS_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+_PHASES_KEY = "metrics:job_phase_seconds"
+_ROWS_KEY = "metrics:job_phase_rows"
+_JOBS_KEY = "metrics:jobs_total"
+
+_redis = None
+
+
+def _get_redis():
+    global _redis
+    if _redis is None:
+        from redis import Redis
+        _redis = Redis.from_url(REDIS_URL)
+    return _redis
+
+
+def rss_bytes() -> int | None:
+    """RSS atual do processo (Linux: /proc/self/statm; fora do Linux, o pico do processo via getrusage)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+class RssSampler:
+    """Thread que lê o RSS a cada interval segundos e chama on_sample(rss)."""
+
+    def __init__(self, on_sample, interval: float = 0.05):
+        self.on_sample = on_sample
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = rss_bytes()
+            if rss:
+                self.on_sample(rss)
+
+    def start(self) -> "RssSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+        rss = rss_bytes()
+        if rss:
+            self.on_sample(rss)
+
+
+class JobMetrics:
+    """
+    Acumula tempo de parede, CPU, linhas e pico de RSS por fase. A mesma fase pode ser aberta
+    várias vezes (ex.: uma por bloco) e os valores somam. Fases aninhadas são exclusivas:
+    o tempo da fase interna não conta na externa.
+    """
+
+    def __init__(self, sample_interval: float = 0.05):
+        self.phases: dict[str, dict] = {}
+        # Pilha de fases abertas: [nome, início parede, início CPU, parede dos filhos, CPU dos filhos]
+        self._stack: list[list] = []
+        self._sampler = RssSampler(self._on_rss, sample_interval)
+
+    def _entry(self, name: str) -> dict:
+        if name not in self.phases:
+            self.phases[name] = {"wall_seconds": 0.0, "cpu_seconds": 0.0, "rows": 0, "peak_rss_bytes": 0}
+        return self.phases[name]
+
+    def _on_rss(self, rss: int) -> None:
+        try:
+            name = self._stack[-1][0]
+        except IndexError:
+            return
+        entry = self._entry(name)
+        entry["peak_rss_bytes"] = max(entry["peak_rss_bytes"], rss)
+
+    def start(self) -> "JobMetrics":
+        self._sampler.start()
+        return self
+
+    def stop(self) -> None:
+        self._sampler.stop()
+
+    @contextmanager
+    def phase(self, name: str, rows: int = 0):
+        self._entry(name)
+        frame = [name, time.perf_counter(), time.process_time(), 0.0, 0.0]
+        self._stack.append(frame)
+        rss = rss_bytes()
+        if rss:
+            self._on_rss(rss)
+        try:
+            yield self
+        finally:
+            self._stack.pop()
+            wall = time.perf_counter() - frame[1]
+            cpu = time.process_time() - frame[2]
+            entry = self.phases[name]
+            entry["wall_seconds"] += wall - frame[3]
+            entry["cpu_seconds"] += cpu - frame[4]
+            entry["rows"] += rows
+            if self._stack:
+                self._stack[-1][3] += wall
+                self._stack[-1][4] += cpu
+
+    def add_rows(self, name: str, rows: int) -> None:
+        self._entry(name)["rows"] += rows
+
+    def timed_iter(self, name: str, items: Iterable, rows_of: Callable = len) -> Iterator:
+        """Repassa os itens de items medindo o tempo gasto em obter cada um; rows_of(item) = linhas do item."""
+        it = iter(items)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+                self.add_rows(name, rows_of(item))
+            yield item
+
+    def as_dict(self) -> dict:
+        """Métricas por fase para o report.json e o registro do job."""
+        result = {}
+        for name, entry in self.phases.items():
+            wall = entry["wall_seconds"]
+            result[name] = {
+                "wall_seconds": round(wall, 4),
+                "cpu_seconds": round(entry["cpu_seconds"], 4),
+                "rows": entry["rows"],
+                "rows_per_sec": round(entry["rows"] / wall, 1) if entry["rows"] and wall else None,
+                "peak_rss_mb": round(entry["peak_rss_bytes"] / 1024 / 1024, 1) if entry["peak_rss_bytes"] else None,
+            }
+        return result
+
+
+def record_job_metrics(phases: dict, status: str) -> None:
+    """
+    Soma as fases de um job nos histogramas globais (hashes no Redis, compartilhados entre workers).
+    Best-effort: falha no Redis nunca derruba o processamento.
+    """
+    if TESTING:
+        return
+    try:
+        pipe = _get_redis().pipeline(transaction=False)
+        for name, m in phases.items():
+            seconds = m["wall_seconds"]
+            for le in PHASE_SECONDS_BUCKETS:
+                if seconds <= le:
+                    pipe.hincrby(_PHASES_KEY, f"{name}|{le}", 1)
+            pipe.hincrby(_PHASES_KEY, f"{name}|+Inf", 1)
+            pipe.hincrbyfloat(_PHASES_KEY, f"{name}|sum", seconds)
+            pipe.hincrby(_ROWS_KEY, name, m["rows"])
+        pipe.hincrby(_JOBS_KEY, status, 1)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"[METRICS] Falha ao registrar métricas do job: {e}")
+
+
+def load_job_metrics() -> tuple[dict, dict, dict]:
+    """Lê (histogramas das fases, linhas por fase, jobs por status) do Redis."""
+    pipe = _get_redis().pipeline(transaction=False)
+    pipe.hgetall(_PHASES_KEY)
+    pipe.hgetall(_ROWS_KEY)
+    pipe.hgetall(_JOBS_KEY)
+    phases, rows, jobs = pipe.execute()
+
+    def _decode(data: dict) -> dict:
+        return {k.decode(): v.decode() for k, v in data.items()}
+
+    return _decode(phases), _decode(rows), _decode(jobs)
+
+
+def render_prometheus(phases: dict, rows: dict, jobs: dict, extra: dict | None = None) -> str:
+    """Monta o texto no formato de exposição do Prometheus a partir dos hashes agregados."""
+    lines = [
+        "# HELP flowbase_job_phase_seconds Duração de cada fase de process_job.",
+        "# TYPE flowbase_job_phase_seconds histogram",
+    ]
+    names = sorted({field.split("|", 1)[0] for field in phases})
+    for name in names:
+        # Buckets no Redis guardam só "<= le"; o histograma do Prometheus já é cumulativo assim
+        for le in (*PHASE_SECONDS_BUCKETS, "+Inf"):
+            count = int(phases.get(f"{name}|{le}", 0))
+            lines.append(f'flowbase_job_phase_seconds_bucket{{phase="{name}",le="{le}"}} {count}')
+        lines.append(f'flowbase_job_phase_seconds_sum{{phase="{name}"}} {float(phases.get(f"{name}|sum", 0))}')
+        lines.append(f'flowbase_job_phase_seconds_count{{phase="{name}"}} {int(phases.get(f"{name}|+Inf", 0))}')
+
+    lines += [
+        "# HELP flowbase_job_phase_rows_total Linhas processadas por fase.",
+        "# TYPE flowbase_job_phase_rows_total counter",
+    ]
+    lines += [f'flowbase_job_phase_rows_total{{phase="{name}"}} {int(v)}' for name, v in sorted(rows.items())]
+    lines += [
+        "# HELP flowbase_jobs_total Jobs finalizados por status.",
+        "# TYPE flowbase_jobs_total counter",
+    ]
+    lines += [f'flowbase_jobs_total{{status="{status}"}} {int(v)}' for status, v in sorted(jobs.items())]
+
+    for name, (kind, help_text, value) in (extra or {}).items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
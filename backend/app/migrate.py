@@ -0,0 +1,19 @@
+# Migração explícita do schema: python -m app.migrate (rode uma vez antes de subir a API com
+# DB_AUTO_MIGRATE=false, ex.: release command do deploy com vários workers do uvicorn)
+import logging
+
+from app import models  # noqa: F401  Registra as tabelas no Base antes de create_all
+from app.db import get_effective_url_masked, migrate
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    logger.info(f"[MIGRATE] DATABASE_URL (mascarada): {get_effective_url_masked()}")
+    added = migrate()
+    logger.info(f"[MIGRATE] Colunas adicionadas: {', '.join(added) if added else '(nenhuma)'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 # Modelos das tabelas do banco (cada classe = uma tabela)
-from sqlalchemy import String, DateTime, Text, ForeignKey
+from sqlalchemy import BigInteger, String, DateTime, Integer, Text, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime
 
@@ -19,6 +19,12 @@ class User(Base):
 class Job(Base):
     """Tabela jobs: um registro por arquivo enviado (um job = um processamento)."""
     __tablename__ = "jobs"
+    __table_args__ = (
+        # Listagem GET /jobs: filtro por usuário (+ status) já na ordem de created_at
+        Index("ix_jobs_user_status_created", "user_id", "status", "created_at"),
+        # Listagem sem filtro de status (ordem por created_at, id desempata o cursor)
+        Index("ix_jobs_user_created", "user_id", "created_at", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True)
     user_id: Mapped[str | None] = mapped_column(String(36), ForeignKey("users.id"), nullable=True, index=True)
@@ -30,3 +36,11 @@ class Job(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
     error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
+    # SHA-256 do arquivo enviado + versão do pipeline que gerou a saída (reuso de resultados)
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+    pipeline_version: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    # Tamanho do upload e linhas estimadas no upload (classe da fila e ETA sem reler o arquivo)
+    file_size: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    rows_estimate: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # Métricas por fase do processamento (JSON: tempo, CPU, linhas/s, pico de RSS)
+    metrics_json: Mapped[str | None] = mapped_column(Text, nullable=True)
@@ -1,16 +1,45 @@
 # Pipeline de processamento: lê planilha, mapeia colunas, normaliza, gera CSV GHL, report e preview
+import codecs
+import csv
 import json
 import re
+import zipfile
+from collections import OrderedDict, deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
+from functools import partial
+from itertools import chain
 from pathlib import Path
+from xml.etree import ElementTree
 
+import numpy as np
 import pandas as pd
 import phonenumbers
+from openpyxl import load_workbook
+from rq import get_current_job
 from sqlalchemy.orm import Session
 
-from app.config import OUTPUTS_DIR, REPORTS_DIR
+from app.config import (
+    CSV_ENGINE,
+    OUTPUTS_DIR,
+    PARALLEL_MIN_ROWS,
+    PARQUET_OUTPUT,
+    PHONE_CACHE_SCOPE,
+    PHONE_CACHE_SIZE,
+    PROCESSING_ENGINE,
+    PROCESSING_WORKERS,
+    REPORTS_DIR,
+    SHARD_ROWS,
+    STREAM_CHUNK_ROWS,
+)
 from app.db import SessionLocal
+from app.metrics import JobMetrics, record_job_metrics
 from app.models import Job
+from app.progress import ProgressTracker, publish_progress
+from app.row_index import RowIndexWriter
+from app.storage import open_output_binary, output_suffix, parquet_output_path, row_index_dir
 
 # Colunas do CSV no padrão de importação do GoHighLevel (ordem fixa)
 GHL_COLUMNS = [
@@ -28,6 +57,10 @@ GHL_COLUMNS = [
     "Source",
 ]
 
+# Versão do pipeline: incremente sempre que mudar o CSV gerado para o mesmo arquivo de entrada.
+# Jobs com o mesmo conteúdo e a mesma versão reaproveitam a saída (ver routes_jobs.create_job).
+PIPELINE_VERSION = "1"
+
 # Sinônimos PT/EN para encontrar colunas na planilha (chave = nome normalizado, valor = coluna GHL)
 COLUMN_SYNONYMS = {
     "full name": "Full Name",
@@ -70,6 +103,11 @@ COLUMN_SYNONYMS = {
 }
 
 
+def pipeline_version() -> str:
+    """Versão efetiva do pipeline; o streaming (colunas lidas como texto) pode mudar a saída."""
+    return f"{PIPELINE_VERSION}-{'stream' if STREAM_CHUNK_ROWS else 'full'}"
+
+
 def _normalize_col_name(s: str) -> str:
     """Remove acentos e deixa minúsculo para comparar com sinônimos."""
     if pd.isna(s) or not isinstance(s, str):
@@ -107,7 +145,76 @@ def _normalize_emails(val) -> str:
     return ", ".join(out) if out else ""
 
 
-def _normalize_phone(val, default_region="BR") -> str:
+class PhoneCache:
+    """
+    Cache LRU limitado para _normalize_phone, chaveado pelo número limpo + região.
+    Guarda o E.164 (ou None quando o número é inválido) e conta hits/misses.
+    """
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[tuple[str, str], str | None] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: tuple[str, str]):
+        """Retorna (True, valor) se a chave está no cache, senão (False, None)."""
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return False, None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return True, value
+
+    def put(self, key: tuple[str, str], value: str | None) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Contadores atuais (hits, misses, hit_rate, size)."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+
+# Cache compartilhado entre jobs do mesmo processo do worker (PHONE_CACHE_SCOPE=process)
+_process_phone_cache: PhoneCache | None = None
+
+
+def get_phone_cache() -> PhoneCache:
+    """Cache de telefones para um job: o do processo (scope=process) ou um novo por job (scope=job)."""
+    global _process_phone_cache
+    if PHONE_CACHE_SCOPE == "process":
+        if _process_phone_cache is None:
+            _process_phone_cache = PhoneCache(PHONE_CACHE_SIZE)
+        return _process_phone_cache
+    return PhoneCache(PHONE_CACHE_SIZE)
+
+
+def _parse_e164(s: str, default_region: str) -> str | None:
+    """phonenumbers.parse + is_valid_number + format_number. None se inválido."""
+    try:
+        parsed = phonenumbers.parse(s, default_region)
+        if phonenumbers.is_valid_number(parsed):
+            return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+    except Exception:
+        pass
+    return None
+
+
+def _normalize_phone(val, default_region="BR", cache: PhoneCache | None = None) -> str:
     """Tenta converter para E.164 (default BR +55). Retorna vazio se inválido."""
     if pd.isna(val) or val == "":
         return ""
@@ -115,16 +222,36 @@ def _normalize_phone(val, default_region="BR") -> str:
     s = re.sub(r"[\s\-\(\)]", "", s)
     if not s or not s.replace("+", "").isdigit():
         return str(val).strip()
-    try:
-        parsed = phonenumbers.parse(s, default_region)
-        if phonenumbers.is_valid_number(parsed):
-            return phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
-    except Exception:
-        pass
-    return str(val).strip()
+    if cache is None:
+        e164 = _parse_e164(s, default_region)
+    else:
+        key = (s, default_region)
+        found, e164 = cache.get(key)
+        if not found:
+            e164 = _parse_e164(s, default_region)
+            cache.put(key, e164)
+    return e164 if e164 is not None else str(val).strip()
+
+
+# Telefone normalizado válido: E.164 ("+" e 8 a 15 dígitos). _normalize_phone devolve a entrada
+# como veio quando não consegue converter, então "+55 11 1234" ou "123" ficam fora desse formato.
+E164_PATTERN = r"\+\d{8,15}"
+# Célula inteira válida: um ou mais E.164 separados por ", " (o formato de _normalize_phones_field)
+_VALID_PHONE_CELL = re.compile(rf"{E164_PATTERN}(?:, {E164_PATTERN})*")
+
+
+def invalid_phone_mask(phones: pd.Series) -> np.ndarray:
+    """
+    Máscara das células de telefone preenchidas com algum valor fora do E.164. Equivale a separar
+    a célula por ", " e exigir que cada parte case inteira com E164_PATTERN ("+" e 8 a 15 dígitos).
+    Usada pelo report (invalid_phones) e pelo filtro invalid_phone de GET /jobs/{id}/rows.
+    """
+    filled = phones.to_numpy() != ""
+    valid = phones.str.fullmatch(_VALID_PHONE_CELL, na=False).to_numpy(dtype=bool)
+    return filled & ~valid
 
 
-def _normalize_phones_field(val) -> str:
+def _normalize_phones_field(val, cache: PhoneCache | None = None) -> str:
     """Vários telefones separados por , ; espaço -> E.164 separados por vírgula."""
     if pd.isna(val) or val == "":
         return ""
@@ -132,13 +259,13 @@ def _normalize_phones_field(val) -> str:
     parts = re.split(r"[,;\n]+", s)
     out = []
     for p in parts:
-        n = _normalize_phone(p.strip())
+        n = _normalize_phone(p.strip(), cache=cache)
         if n and n not in out:
             out.append(n)
     return ", ".join(out) if out else ""
 
 
-def _row_to_ghl(row: pd.Series, mapping: dict, unmapped_cols: list) -> dict:
+def _row_to_ghl(row: pd.Series, mapping: dict, unmapped_cols: list, phone_cache: PhoneCache | None = None) -> dict:
     """Converte uma linha da planilha para um dicionário com colunas GHL."""
     ghl_row = {c: "" for c in GHL_COLUMNS}
     notes_parts = []
@@ -154,7 +281,7 @@ def _row_to_ghl(row: pd.Series, mapping: dict, unmapped_cols: list) -> dict:
         if ghl_col == "Email" or ghl_col == "Additional Emails":
             ghl_row[ghl_col] = _normalize_emails(val)
         elif ghl_col == "Phone" or ghl_col == "Additional Phone Numbers":
-            ghl_row[ghl_col] = _normalize_phones_field(val)
+            ghl_row[ghl_col] = _normalize_phones_field(val, cache=phone_cache)
         else:
             ghl_row[ghl_col] = val
 
@@ -184,18 +311,532 @@ def read_file(path: str) -> pd.DataFrame:
     raise ValueError("Aceito apenas .xlsx ou .csv")
 
 
-def process_to_ghl(df: pd.DataFrame) -> pd.DataFrame:
-    """Mapeia e normaliza o DataFrame para as colunas GHL."""
+def _detect_csv_encoding(path: str, block_size: int = 1024 * 1024) -> str:
+    """
+    Descobre o encoding do CSV (utf-8 ou latin-1) lendo o arquivo em blocos.
+    No modo streaming o fallback de read_file não serve: o erro apareceria depois
+    de parte do CSV de saída já ter sido escrita.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with open(path, "rb") as f:
+        try:
+            while block := f.read(block_size):
+                decoder.decode(block)
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError:
+            return "latin-1"
+    return "utf-8"
+
+
+def _xlsx_header(values: tuple) -> list:
+    """
+    Nomes de coluna da primeira linha da aba, no mesmo formato do pd.read_excel:
+    células vazias viram "Unnamed: N" e nomes repetidos ganham sufixo ".1", ".2"...
+    """
+    cells = list(values)
+    while cells and cells[-1] is None:
+        cells.pop()
+    return _dedupe_header(cells)
+
+
+def _dedupe_header(cells: list) -> list:
+    """Nomes vazios viram "Unnamed: N" e repetidos ganham ".1", ".2"... (como o pandas faz)."""
+    header = []
+    seen: dict = {}
+    for i, name in enumerate(cells):
+        if name is None:
+            name = f"Unnamed: {i}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        header.append(name)
+    return header
+
+
+def iter_xlsx_chunks(path: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    """
+    Lê a primeira aba do XLSX em streaming (openpyxl read_only + iter_rows(values_only=True)),
+    entregando blocos de até chunksize linhas sem carregar a planilha inteira.
+    Os valores ficam como vieram do openpyxl (dtype object) para o tipo não mudar entre blocos.
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = _xlsx_header(next(rows, ()))
+        width = len(header)
+        batch = []
+        for values in rows:
+            values = tuple(values[:width]) + (None,) * (width - len(values))
+            if all(v is None for v in values):
+                continue
+            batch.append(values)
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch, columns=header, dtype=object)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header, dtype=object)
+    finally:
+        wb.close()
+
+
+# Valores que o pd.read_csv trata como vazio por padrão; o leitor pyarrow usa a mesma lista
+CSV_NA_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+
+def _require_pyarrow():
+    """Importa o pyarrow (opcional: só CSV_ENGINE=pyarrow e PARQUET_OUTPUT precisam dele)."""
+    try:
+        import pyarrow
+        import pyarrow.csv  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise RuntimeError("CSV_ENGINE=pyarrow e PARQUET_OUTPUT exigem o pacote pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def iter_csv_chunks_arrow(path: str, chunksize: int, encoding: str = "utf-8") -> Iterator[pd.DataFrame]:
+    """
+    Lê o CSV em streaming com o leitor do pyarrow (multi-thread, em C++), entregando blocos
+    de até chunksize linhas com colunas string[pyarrow]. Mesma semântica do
+    pd.read_csv(dtype=str): tudo texto, mesmos nomes de coluna e mesmos valores vazios.
+    """
+    pa = _require_pyarrow()
+    # Cabeçalho lido à parte (nomes iguais aos do pandas); utf-8-sig descarta o BOM como o pandas faz
+    header_encoding = "utf-8-sig" if codecs.lookup(encoding).name == "utf-8" else encoding
+    with open(path, encoding=header_encoding, newline="") as f:
+        first_row = next(csv.reader(f), [])
+    names = _dedupe_header([c if c != "" else None for c in first_row])
+    reader = pa.csv.open_csv(
+        path,
+        read_options=pa.csv.ReadOptions(encoding=encoding, column_names=names, skip_rows=1),
+        convert_options=pa.csv.ConvertOptions(
+            column_types={name: pa.string() for name in names},
+            null_values=CSV_NA_VALUES,
+            strings_can_be_null=True,
+        ),
+    )
+    to_pandas = partial(pa.Table.to_pandas, types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+    # Os lotes do pyarrow têm tamanho em bytes (block_size); re-fatia em blocos de chunksize linhas
+    pending = pa.Table.from_batches([], schema=reader.schema)
+    yielded = False
+    for batch in reader:
+        pending = pa.concat_tables([pending, pa.Table.from_batches([batch])])
+        while pending.num_rows >= chunksize:
+            yield to_pandas(pending.slice(0, chunksize))
+            pending = pending.slice(chunksize)
+            yielded = True
+    if pending.num_rows or not yielded:
+        # Resto do arquivo; só cabeçalho vira um bloco vazio com as colunas, como no pd.read_csv
+        yield to_pandas(pending)
+
+
+def read_file_chunks(path: str, chunksize: int | None = None) -> Iterator[pd.DataFrame]:
+    """
+    Lê a planilha em blocos de até chunksize linhas (memória constante).
+    CSV usa pd.read_csv(chunksize) com as colunas como texto (dtype=str), já que o pandas
+    inferiria tipos diferentes em cada bloco (ou iter_csv_chunks_arrow com CSV_ENGINE=pyarrow);
+    XLSX usa iter_xlsx_chunks.
+    Sem chunksize devolve um único bloco com read_file.
+    """
+    p = Path(path)
+    if not p.exists():
+        raise FileNotFoundError(f"Arquivo não encontrado: {path}")
+    suf = p.suffix.lower()
+    if not chunksize:
+        return iter([read_file(path)])
+    if suf == ".xlsx":
+        return iter_xlsx_chunks(path, chunksize)
+    if suf == ".csv":
+        encoding = _detect_csv_encoding(path)
+        if CSV_ENGINE == "pyarrow":
+            return iter_csv_chunks_arrow(path, chunksize, encoding)
+        return iter(pd.read_csv(path, encoding=encoding, dtype=str, chunksize=chunksize))
+    raise ValueError("Aceito apenas .xlsx ou .csv")
+
+
+# Cache de telefones de cada processo do pool: sobrevive entre shards do mesmo processo
+_shard_phone_cache: PhoneCache | None = None
+
+
+def _normalize_shard(shard: pd.DataFrame, phone_cache: PhoneCache | None = None) -> tuple[pd.DataFrame, int, int]:
+    """
+    Normaliza um bloco e retorna (ghl_df, hits, misses) do cache de telefones.
+    Nos processos do pool (phone_cache=None) usa o cache do próprio processo.
+    """
+    global _shard_phone_cache
+    if phone_cache is None:
+        if _shard_phone_cache is None:
+            _shard_phone_cache = PhoneCache(PHONE_CACHE_SIZE)
+        phone_cache = _shard_phone_cache
+    hits, misses = phone_cache.hits, phone_cache.misses
+    ghl_df = process_to_ghl(shard, phone_cache=phone_cache)
+    return ghl_df, phone_cache.hits - hits, phone_cache.misses - misses
+
+
+def _iter_shards(chunks: Iterable[pd.DataFrame], shard_rows: int) -> Iterator[pd.DataFrame]:
+    """Fatia os blocos lidos em shards de até shard_rows linhas, na ordem original."""
+    for chunk in chunks:
+        for start in range(0, len(chunk), shard_rows):
+            yield chunk.iloc[start:start + shard_rows]
+
+
+def _normalize_parallel(shards: Iterable[pd.DataFrame], workers: int) -> Iterator[tuple]:
+    """
+    Normaliza os shards num ProcessPoolExecutor e devolve (shard, ghl_df, hits, misses) na ordem
+    original. No máximo 2 * workers shards ficam em voo, então a memória continua limitada.
+    """
+    pending: deque = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for shard in shards:
+            pending.append((shard, pool.submit(_normalize_shard, shard)))
+            if len(pending) >= 2 * workers:
+                shard_done, future = pending.popleft()
+                yield (shard_done, *future.result())
+        while pending:
+            shard_done, future = pending.popleft()
+            yield (shard_done, *future.result())
+
+
+def _iter_normalized(
+    chunks: Iterable[pd.DataFrame],
+    phone_cache: PhoneCache | None,
+    workers: int,
+    shard_rows: int,
+    min_parallel_rows: int,
+) -> Iterator[tuple]:
+    """
+    Gera (shard, ghl_df, hits, misses) para cada shard de até shard_rows linhas dos blocos de entrada.
+    Mesmo num processo só, o bloco único da leitura sem streaming é fatiado: o progresso
+    (on_progress de write_ghl_csv) sai a cada shard, não só no fim do arquivo.
+    Com workers > 1, lê shards até somar min_parallel_rows linhas: abaixo disso processa
+    no próprio processo (o custo de subir o pool não compensa), acima usa _normalize_parallel.
+    """
+    shards = _iter_shards(chunks, shard_rows)
+    if workers <= 1:
+        for shard in shards:
+            yield (shard, *_normalize_shard(shard, phone_cache))
+        return
+
+    buffered = []
+    buffered_rows = 0
+    for shard in shards:
+        buffered.append(shard)
+        buffered_rows += len(shard)
+        if buffered_rows >= min_parallel_rows:
+            yield from _normalize_parallel(chain(buffered, shards), workers)
+            return
+    for shard in buffered:
+        yield (shard, *_normalize_shard(shard, phone_cache))
+
+
+# estimate_rows lê no máximo isto do início do CSV e extrapola pelo tamanho do arquivo
+ESTIMATE_SAMPLE_BYTES = 256 * 1024
+
+_XLSX_DIMENSION = re.compile(rb"<(?:\w+:)?dimension\s+ref=\"[A-Z]*\d*:?[A-Z]*(\d+)\"")
+_XLSX_MAIN_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_XLSX_REL_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+
+
+def _xlsx_dimension_rows(path: str) -> int | None:
+    """Última linha do <dimension> da primeira aba, lendo só o começo do XML (sem abrir a planilha)."""
+    with zipfile.ZipFile(path) as zf:
+        first_sheet = next(ElementTree.fromstring(zf.read("xl/workbook.xml")).iter(f"{_XLSX_MAIN_NS}sheet"))
+        rels = ElementTree.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+        target = next(r.get("Target") for r in rels if r.get("Id") == first_sheet.get(_XLSX_REL_ID))
+        # Target é relativo a xl/ (ou absoluto, começando com /)
+        sheet = target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+        with zf.open(sheet) as f:
+            dimension = _XLSX_DIMENSION.search(f.read(4096))
+    return int(dimension.group(1)) if dimension else None
+
+
+def estimate_rows(path: str, size_bytes: int | None = None) -> int | None:
+    """
+    Estimativa barata do número de linhas de dados (classe da fila e ETA do progresso).
+    CSV: conta quebras de linha nos primeiros ESTIMATE_SAMPLE_BYTES e extrapola pelo tamanho
+    (exata se o arquivo couber na amostra); XLSX: <dimension> da primeira aba.
+    Não relê o arquivo inteiro. None se não der para estimar.
+    """
+    try:
+        p = Path(path)
+        suf = p.suffix.lower()
+        if suf == ".csv":
+            if size_bytes is None:
+                size_bytes = p.stat().st_size
+            with open(p, "rb") as f:
+                sample = f.read(ESTIMATE_SAMPLE_BYTES)
+            newlines = sample.count(b"\n")
+            if len(sample) >= size_bytes:
+                # Última linha sem \n também conta; o cabeçalho não
+                return max(newlines + (1 if sample and not sample.endswith(b"\n") else 0) - 1, 0)
+            return max(round(newlines * size_bytes / len(sample)) - 1, 0)
+        if suf == ".xlsx":
+            max_row = _xlsx_dimension_rows(path)
+            return max(max_row - 1, 0) if max_row else None
+    except Exception:
+        return None
+    return None
+
+
+class OutputStats:
+    """
+    Métricas do CSV de saída acumuladas bloco a bloco durante a escrita: linhas, preenchimento
+    por coluna, telefones inválidos, e-mails duplicados e preview. Compara os arrays de objetos
+    direto (sem astype(str)/strip, que copiariam as colunas) e não relê a saída.
+    """
+
+    def __init__(self, preview_rows: int = 20):
+        self.preview_rows = preview_rows
+        self.rows_output = 0
+        self.filled = dict.fromkeys(GHL_COLUMNS, 0)
+        self.invalid_phones = 0
+        self.preview: list[dict] = []
+        # Hash de 64 bits de cada e-mail principal: 8 bytes por linha em vez do set de strings
+        self._email_hashes: list[np.ndarray] = []
+
+    def add(self, ghl_df: pd.DataFrame) -> None:
+        self.rows_output += len(ghl_df)
+        for col in GHL_COLUMNS:
+            filled = ghl_df[col].to_numpy() != ""
+            self.filled[col] += int(filled.sum())
+            if col == "Phone":
+                self.invalid_phones += int(invalid_phone_mask(ghl_df[col]).sum())
+            elif col == "Email":
+                emails = ghl_df[col].to_numpy()[filled]
+                if len(emails):
+                    self._email_hashes.append(pd.util.hash_array(emails))
+        if len(self.preview) < self.preview_rows:
+            self.preview.extend(ghl_df.head(self.preview_rows - len(self.preview)).to_dict(orient="records"))
+
+    def duplicate_emails(self) -> int:
+        """Linhas cujo e-mail principal já apareceu antes no arquivo."""
+        if not self._email_hashes:
+            return 0
+        hashes = np.concatenate(self._email_hashes)
+        return int(len(hashes) - len(np.unique(hashes)))
+
+    def fill_rates(self) -> dict[str, float]:
+        """% de linhas com cada coluna GHL preenchida."""
+        return {
+            col: round(100 * count / self.rows_output, 1) if self.rows_output else 0
+            for col, count in self.filled.items()
+        }
+
+
+class ParquetOutput:
+    """Cópia Parquet da saída GHL, escrita bloco a bloco (todas as colunas como string)."""
+
+    def __init__(self, path: Path):
+        pa = _require_pyarrow()
+        self.path = path
+        self.schema = pa.schema([(name, pa.string()) for name in GHL_COLUMNS])
+        self._writer = pa.parquet.ParquetWriter(path, self.schema)
+        self._pa = pa
+
+    def write(self, ghl_df: pd.DataFrame) -> None:
+        if len(ghl_df):
+            table = self._pa.Table.from_pandas(ghl_df, schema=self.schema, preserve_index=False)
+            self._writer.write_table(table)
+
+    def close(self) -> None:
+        # Sem nenhum bloco, o arquivo fica só com o schema (0 linhas)
+        self._writer.close()
+
+    def __enter__(self) -> "ParquetOutput":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_ghl_csv(
+    chunks: Iterable[pd.DataFrame],
+    output_path: Path,
+    phone_cache: PhoneCache | None = None,
+    preview_rows: int = 20,
+    workers: int = 1,
+    shard_rows: int = 20_000,
+    min_parallel_rows: int = 50_000,
+    on_progress: Callable[[int], None] | None = None,
+    metrics: JobMetrics | None = None,
+    parquet_path: Path | None = None,
+    index_dir: Path | None = None,
+) -> dict:
+    """
+    Normaliza cada bloco com process_to_ghl e anexa ao CSV de saída (utf-8 com BOM; gzip se terminar em .gz).
+    Acumula as métricas do report e as primeiras preview_rows linhas (OutputStats) na mesma
+    passada, sem manter o resultado inteiro em memória.
+    A entrada é normalizada em shards de até shard_rows linhas; workers > 1 normaliza os shards
+    em paralelo (só a partir de min_parallel_rows linhas); a saída mantém a ordem original.
+    on_progress recebe o total de linhas de entrada já processadas após cada shard.
+    Com metrics, mede as fases read (leitura dos blocos), normalize e write_csv.
+    Com parquet_path, grava também uma cópia Parquet (um row group por bloco, colunas texto).
+    Com index_dir, grava o índice de linhas (RowIndexWriter) para a leitura paginada da saída.
+    """
+    counters = {
+        "total_rows": 0,
+        "phone_cache_hits": 0,
+        "phone_cache_misses": 0,
+    }
+    stats = OutputStats(preview_rows)
+    header = True
+    if metrics is not None:
+        chunks = metrics.timed_iter("read", chunks)
+    normalized = _iter_normalized(chunks, phone_cache, workers, shard_rows, min_parallel_rows)
+    if metrics is not None:
+        normalized = metrics.timed_iter("normalize", normalized, rows_of=lambda item: len(item[0]))
+    parquet = ParquetOutput(parquet_path) if parquet_path is not None else None
+    row_index = RowIndexWriter(index_dir, position=len(codecs.BOM_UTF8)) if index_dir is not None else None
+    with open_output_binary(output_path) as f, parquet or nullcontext(), row_index or nullcontext():
+        f.write(codecs.BOM_UTF8)
+        for chunk, ghl_df, hits, misses in normalized:
+            with metrics.phase("write_csv", rows=len(ghl_df)) if metrics is not None else nullcontext():
+                data = ghl_df.to_csv(index=False, header=header).encode("utf-8")
+                if row_index is not None:
+                    row_index.write(f, ghl_df, data, has_header=header)
+                else:
+                    f.write(data)
+            if parquet is not None:
+                with metrics.phase("write_parquet", rows=len(ghl_df)) if metrics is not None else nullcontext():
+                    parquet.write(ghl_df)
+            header = False
+
+            counters["total_rows"] += len(chunk)
+            stats.add(ghl_df)
+            counters["phone_cache_hits"] += hits
+            counters["phone_cache_misses"] += misses
+            if on_progress is not None:
+                on_progress(counters["total_rows"])
+        if header:
+            f.write(pd.DataFrame(columns=GHL_COLUMNS).to_csv(index=False).encode("utf-8"))
+    counters.update(
+        rows_output=stats.rows_output,
+        with_email=stats.filled["Email"],
+        with_phone=stats.filled["Phone"],
+        invalid_phones=stats.invalid_phones,
+        duplicate_emails=stats.duplicate_emails(),
+        fill_rates=stats.fill_rates(),
+        preview=stats.preview,
+    )
+    return counters
+
+
+def _unmapped_columns(df: pd.DataFrame, mapping: dict) -> list:
+    """Colunas da planilha que não foram mapeadas para nenhuma coluna GHL (vão para Notes)."""
+    return [c for c in df.columns if not any(mapping[ghl] == c for ghl in GHL_COLUMNS if mapping[ghl])]
+
+
+def _rowwise_values(df: pd.DataFrame, col) -> pd.Series:
+    """
+    Valores da coluna exatamente como df.iterrows() os entregaria (dtype object).
+    Em planilhas só numéricas o iterrows faz upcast da linha inteira (ex.: int -> float);
+    o dtype de uma fatia vazia reproduz esse upcast sem materializar o DataFrame.
+    """
+    common = df.iloc[:0].to_numpy().dtype
+    s = df[col]
+    if common != object:
+        s = s.astype(common)
+    return s.astype(object).reset_index(drop=True)
+
+
+def _map_unique(values: pd.Series, func) -> pd.Series:
+    """Aplica func uma vez por valor distinto e espalha o resultado pela coluna inteira."""
+    codes, uniques = pd.factorize(values)
+    mapped = np.array([func(u) for u in uniques], dtype=object)
+    return pd.Series(mapped[codes] if len(codes) else [], dtype=object)
+
+
+def _process_rowwise(df: pd.DataFrame, phone_cache: PhoneCache | None = None) -> pd.DataFrame:
+    """Engine linha a linha (df.iterrows + _row_to_ghl). Mantido como referência de equivalência."""
     mapping = _find_column_mapping(df)
-    unmapped = [c for c in df.columns if not any(mapping[ghl] == c for ghl in GHL_COLUMNS if mapping[ghl])]
+    unmapped = _unmapped_columns(df, mapping)
 
     rows = []
     for _, row in df.iterrows():
-        rows.append(_row_to_ghl(row, mapping, unmapped))
+        rows.append(_row_to_ghl(row, mapping, unmapped, phone_cache))
 
     return pd.DataFrame(rows, columns=GHL_COLUMNS)
 
 
+def _process_vectorized(df: pd.DataFrame, phone_cache: PhoneCache | None = None) -> pd.DataFrame:
+    """
+    Engine coluna a coluna: mesma saída de _process_rowwise, sem iterar linhas.
+    Limpeza e Notes usam operações de string do pandas sobre a Series inteira;
+    e-mails e telefones são normalizados uma vez por valor distinto da coluna.
+    """
+    mapping = _find_column_mapping(df)
+    unmapped = _unmapped_columns(df, mapping)
+    n = len(df)
+    empty = pd.Series([""] * n, dtype=object)
+
+    out = {c: empty for c in GHL_COLUMNS}
+    for ghl_col, source_col in mapping.items():
+        if source_col is None:
+            continue
+        values = _rowwise_values(df, source_col)
+        keep = values.notna() & values.fillna("").astype(bool)
+        cleaned = values.where(keep, "").astype(str).str.strip().astype(object)
+
+        if ghl_col == "Email" or ghl_col == "Additional Emails":
+            out[ghl_col] = _map_unique(cleaned, _normalize_emails)
+        elif ghl_col == "Phone" or ghl_col == "Additional Phone Numbers":
+            out[ghl_col] = _map_unique(cleaned, partial(_normalize_phones_field, cache=phone_cache))
+        else:
+            out[ghl_col] = cleaned
+
+    notes_parts = empty
+    for col in unmapped:
+        values = _rowwise_values(df, col)
+        text = values.where(values.notna(), "").astype(str).astype(object)
+        has_value = values.notna() & (text.str.strip() != "")
+        part = (f"{col}: " + text).where(has_value, "")
+        joined = notes_parts + " | " + part
+        notes_parts = joined.where((notes_parts != "") & has_value, notes_parts + part)
+    has_notes = notes_parts != ""
+    if has_notes.any():
+        merged = (out["Notes"] + " | " + notes_parts).str.strip(" | ")
+        out["Notes"] = merged.where(has_notes, out["Notes"])
+
+    return pd.DataFrame({c: out[c].to_numpy() for c in GHL_COLUMNS}, columns=GHL_COLUMNS)
+
+
+# Engines disponíveis para process_to_ghl (PROCESSING_ENGINE no .env escolhe o padrão)
+ENGINES = {
+    "vectorized": _process_vectorized,
+    "rowwise": _process_rowwise,
+}
+
+
+def process_to_ghl(
+    df: pd.DataFrame,
+    engine: str | None = None,
+    phone_cache: PhoneCache | None = None,
+) -> pd.DataFrame:
+    """
+    Mapeia e normaliza o DataFrame para as colunas GHL.
+    engine: "vectorized" (padrão) ou "rowwise"; ambos geram o mesmo CSV byte a byte.
+    phone_cache: cache opcional de telefones normalizados (ver get_phone_cache).
+    """
+    engine = engine or PROCESSING_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Engine de processamento inválida: {engine!r} (use {', '.join(ENGINES)})")
+    return ENGINES[engine](df, phone_cache=phone_cache)
+
+
+def _queue_wait() -> tuple[str | None, float | None]:
+    """Fila e tempo (s) que o job RQ atual esperou desde o enqueue. (None, None) fora do worker."""
+    rq_job = get_current_job()
+    if rq_job is None or rq_job.enqueued_at is None:
+        return None, None
+    waited = datetime.utcnow() - rq_job.enqueued_at.replace(tzinfo=None)
+    return rq_job.origin, round(max(waited.total_seconds(), 0.0), 3)
+
+
 def process_job(job_id: str) -> None:
     """
     Processa um job: lê o arquivo, gera CSV GHL, report.json e preview.
@@ -203,58 +844,101 @@ def process_job(job_id: str) -> None:
     Roda no worker RQ (processo separado do FastAPI).
     """
     db: Session | None = None
+    metrics = JobMetrics().start()
     try:
-        db = SessionLocal()
-        job = db.query(Job).filter(Job.id == job_id).first()
-        if not job:
-            return
-        job.status = "processing"
-        db.commit()
+        with metrics.phase("setup"):
+            db = SessionLocal()
+            job = db.query(Job).filter(Job.id == job_id).first()
+            if not job:
+                return
+            file_path = job.file_path
+            rows_estimate = job.rows_estimate if job.rows_estimate is not None else estimate_rows(file_path)
+            job.status = "processing"
+            # Depois do commit a conexão volta ao pool; o job só é tocado de novo no fim,
+            # então o processamento (que pode levar minutos) não segura conexão do banco
+            db.commit()
+            queue_name, queue_wait = _queue_wait()
+            tracker = ProgressTracker(job_id, rows_estimate)
+        tracker.phase("reading")
 
         try:
-            df = read_file(job.file_path)
+            # Sem streaming, o arquivo inteiro é lido aqui; com streaming, só é aberto
+            with metrics.phase("read"):
+                chunks = read_file_chunks(file_path, STREAM_CHUNK_ROWS)
         except Exception as e:
             job.status = "failed"
             job.error_message = str(e)
             db.commit()
+            publish_progress(job_id, "failed", error_message=str(e))
+            record_job_metrics(metrics.as_dict(), "failed")
             return
 
-        ghl_df = process_to_ghl(df)
-
         OUTPUTS_DIR.mkdir(parents=True, exist_ok=True)
         REPORTS_DIR.mkdir(parents=True, exist_ok=True)
 
-        output_csv_path = OUTPUTS_DIR / f"{job_id}.csv"
-        ghl_df.to_csv(output_csv_path, index=False, encoding="utf-8-sig")
-
-        total_rows = len(df)
-        rows_output = len(ghl_df)
-        with_email = (ghl_df["Email"].astype(str).str.strip() != "").sum()
-        with_phone = (ghl_df["Phone"].astype(str).str.strip() != "").sum()
-        pct_email = round(100 * with_email / rows_output, 1) if rows_output else 0
-        pct_phone = round(100 * with_phone / rows_output, 1) if rows_output else 0
-
-        report = {
-            "total_rows": total_rows,
-            "rows_output": rows_output,
-            "pct_with_email": pct_email,
-            "pct_with_phone": pct_phone,
-            "created_at": datetime.utcnow().isoformat() + "Z",
-        }
-        report_path = REPORTS_DIR / f"{job_id}_report.json"
-        report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
-
-        preview_df = ghl_df.head(20)
-        preview_data = preview_df.to_dict(orient="records")
-        preview_path = REPORTS_DIR / f"{job_id}_preview.json"
-        preview_path.write_text(json.dumps(preview_data, ensure_ascii=False, indent=2), encoding="utf-8")
-
+        output_csv_path = OUTPUTS_DIR / f"{job_id}{output_suffix()}"
+        result = write_ghl_csv(
+            chunks,
+            output_csv_path,
+            phone_cache=get_phone_cache(),
+            workers=PROCESSING_WORKERS,
+            shard_rows=SHARD_ROWS,
+            min_parallel_rows=PARALLEL_MIN_ROWS,
+            on_progress=tracker.rows,
+            metrics=metrics,
+            parquet_path=parquet_output_path(job_id) if PARQUET_OUTPUT else None,
+            index_dir=row_index_dir(job_id),
+        )
+        tracker.phase("writing_report")
+        with metrics.phase("report"):
+            cache_hits = result["phone_cache_hits"]
+            cache_misses = result["phone_cache_misses"]
+
+            rows_output = result["rows_output"]
+            pct_email = round(100 * result["with_email"] / rows_output, 1) if rows_output else 0
+            pct_phone = round(100 * result["with_phone"] / rows_output, 1) if rows_output else 0
+
+            report = {
+                "total_rows": result["total_rows"],
+                "rows_output": rows_output,
+                "pct_with_email": pct_email,
+                "pct_with_phone": pct_phone,
+                "invalid_phones": result["invalid_phones"],
+                "duplicate_emails": result["duplicate_emails"],
+                "fill_rates": result["fill_rates"],
+                "phone_cache": {
+                    "scope": PHONE_CACHE_SCOPE,
+                    "hits": cache_hits,
+                    "misses": cache_misses,
+                    "hit_rate": round(cache_hits / (cache_hits + cache_misses), 4) if cache_hits + cache_misses else 0.0,
+                },
+                "queue": queue_name,
+                "queue_wait_seconds": queue_wait,
+                # Fases até a escrita do CSV (a própria escrita do report fica no registro do job)
+                "phases": metrics.as_dict(),
+                "created_at": datetime.utcnow().isoformat() + "Z",
+            }
+            report_path = REPORTS_DIR / f"{job_id}_report.json"
+            report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+            preview_data = result["preview"]
+            preview_path = REPORTS_DIR / f"{job_id}_preview.json"
+            preview_path.write_text(json.dumps(preview_data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+        metrics.stop()
+        phases = metrics.as_dict()
         job.status = "done"
+        job.pipeline_version = pipeline_version()
         job.output_csv_path = str(output_csv_path.resolve())
         job.report_json_path = str(report_path.resolve())
         job.error_message = None
+        job.metrics_json = json.dumps(phases)
         db.commit()
+        tracker.phase("done", rows_output=rows_output)
+        record_job_metrics(phases, "done")
     except Exception as e:
+        publish_progress(job_id, "failed", error_message=str(e))
+        record_job_metrics(metrics.as_dict(), "failed")
         if db is not None:
             try:
                 job = db.query(Job).filter(Job.id == job_id).first()
@@ -265,5 +949,6 @@ def process_job(job_id: str) -> None:
             except Exception:
                 pass
     finally:
+        metrics.stop()
         if db is not None:
             db.close()
@@ -0,0 +1,159 @@
+# Progresso dos jobs em tempo real: o worker publica no Redis (pub/sub) e a API repassa via SSE
+import json
+import logging
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+
+from app.config import REDIS_URL, SSE_MAX_SECONDS, TESTING
+
+logger = logging.getLogger(__name__)
+
+# Último evento de cada job fica salvo por este tempo (para quem conectar no meio do processamento)
+PROGRESS_TTL_SECONDS = 3600
+# Intervalo dos comentários "ping" no SSE (mantém a conexão viva em proxies)
+HEARTBEAT_SECONDS = 15.0
+
+FINAL_PHASES = ("done", "failed")
+
+_redis = None
+
+
+def _channel(job_id: str) -> str:
+    return f"job:{job_id}:events"
+
+
+def _snapshot_key(job_id: str) -> str:
+    return f"job:{job_id}:progress"
+
+
+def _get_redis():
+    global _redis
+    if _redis is None:
+        from redis import Redis
+        _redis = Redis.from_url(REDIS_URL)
+    return _redis
+
+
+def _get_async_redis():
+    from redis.asyncio import Redis as AsyncRedis
+    return AsyncRedis.from_url(REDIS_URL)
+
+
+def clear_progress(*job_ids: str) -> None:
+    """
+    Apaga o último evento salvo dos jobs (antes de enfileirar de novo, ex.: retry), para o SSE
+    não entregar o "failed" da execução anterior. Best-effort, como publish_progress.
+    """
+    if TESTING or not job_ids:
+        return
+    try:
+        _get_redis().delete(*(_snapshot_key(job_id) for job_id in job_ids))
+    except Exception as e:
+        logger.warning(f"[PROGRESS] Falha ao limpar progresso dos jobs {job_ids}: {e}")
+
+
+def publish_progress(job_id: str, phase: str, **fields) -> None:
+    """
+    Publica um evento de progresso do job (canal job:{id}:events) e guarda o último
+    em job:{id}:progress. Best-effort: falha no Redis nunca derruba o processamento.
+    """
+    if TESTING:
+        return
+    event = {"job_id": job_id, "phase": phase, "ts": time.time(), **fields}
+    try:
+        payload = json.dumps(event, ensure_ascii=False)
+        pipe = _get_redis().pipeline()
+        pipe.set(_snapshot_key(job_id), payload, ex=PROGRESS_TTL_SECONDS)
+        pipe.publish(_channel(job_id), payload)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"[PROGRESS] Falha ao publicar progresso do job {job_id}: {e}")
+
+
+class ProgressTracker:
+    """Acompanha as linhas processadas de um job e publica progresso com ETA."""
+
+    def __init__(self, job_id: str, total_rows: int | None = None):
+        self.job_id = job_id
+        self.total_rows = total_rows
+        self.rows_processed = 0
+        self.started_at = time.monotonic()
+
+    def phase(self, phase: str, **fields) -> None:
+        publish_progress(
+            self.job_id,
+            phase,
+            rows_processed=self.rows_processed,
+            total_rows_estimate=self.total_rows,
+            **fields,
+        )
+
+    def rows(self, rows_processed: int) -> None:
+        """Callback de write_ghl_csv: total de linhas já normalizadas."""
+        self.rows_processed = rows_processed
+        eta = None
+        elapsed = time.monotonic() - self.started_at
+        if self.total_rows and rows_processed and rows_processed < self.total_rows:
+            eta = round(elapsed / rows_processed * (self.total_rows - rows_processed), 1)
+        elif self.total_rows:
+            eta = 0.0
+        self.phase("processing", eta_seconds=eta)
+
+
+def format_sse(data: str, event: str = "progress") -> str:
+    """Formata uma mensagem Server-Sent Events."""
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+def _is_final(payload: str) -> bool:
+    try:
+        return json.loads(payload).get("phase") in FINAL_PHASES
+    except ValueError:
+        return False
+
+
+async def iter_progress_events(
+    job_id: str,
+    heartbeat: float = HEARTBEAT_SECONDS,
+    job_status: Callable[[], Awaitable[tuple[str | None, str | None]]] | None = None,
+    max_seconds: float = SSE_MAX_SECONDS,
+) -> AsyncIterator[str]:
+    """
+    Assina o canal do job e gera mensagens SSE: primeiro o último evento salvo, depois
+    cada evento publicado pelo worker, até a fase final (done/failed).
+    A cada heartbeat sem eventos consulta job_status() -> (status, error_message) no banco:
+    se o job terminou (ou sumiu) sem o evento chegar (worker morreu, publish perdido), envia
+    o status do banco e encerra. A conexão dura no máximo max_seconds.
+    """
+    deadline = time.monotonic() + max_seconds
+    client = _get_async_redis()
+    pubsub = client.pubsub()
+    try:
+        # Assina antes de ler o snapshot para não perder eventos entre as duas operações
+        await pubsub.subscribe(_channel(job_id))
+        snapshot = await client.get(_snapshot_key(job_id))
+        if snapshot:
+            payload = snapshot.decode("utf-8")
+            yield format_sse(payload)
+            if _is_final(payload):
+                return
+        while time.monotonic() < deadline:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat)
+            if message is None:
+                if job_status is not None:
+                    status, error_message = await job_status()
+                    if status is None:
+                        return
+                    if status in FINAL_PHASES:
+                        payload = {"job_id": job_id, "phase": status, "error_message": error_message}
+                        yield format_sse(json.dumps(payload, ensure_ascii=False))
+                        return
+                yield ": ping\n\n"
+                continue
+            payload = message["data"].decode("utf-8")
+            yield format_sse(payload)
+            if _is_final(payload):
+                return
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
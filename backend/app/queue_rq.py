@@ -1,16 +1,112 @@
 # Fila RQ: enfileira processamento de jobs (usado pelo FastAPI)
+# Jobs vão para filas por classe de tamanho (small, large, bulk) para arquivos pequenos
+# não esperarem atrás de planilhas enormes.
 import os
+from datetime import datetime
+
+from app.config import FAIR_SHARE_ACTIVE_JOBS, LARGE_JOB_MB, LARGE_JOB_ROWS, QUEUE_WEIGHTS
+
+# Classes de fila em ordem de prioridade ("default" é a fila antiga, ainda consumida pelos workers)
+QUEUE_NAMES = ("small", "large", "bulk")
+
+
+def parse_queue_weights(spec: str = QUEUE_WEIGHTS) -> dict[str, float]:
+    """Converte "small=6,large=3,bulk=1" em {"small": 6.0, ...}; classes ausentes ficam com peso 1."""
+    weights = {name: 1.0 for name in QUEUE_NAMES}
+    for item in spec.split(","):
+        name, _, value = item.partition("=")
+        if name.strip() in weights and value.strip():
+            weights[name.strip()] = float(value)
+    return weights
+
+
+def classify_job(size_bytes: int, estimated_rows: int | None, active_jobs: int = 0) -> str:
+    """
+    Escolhe a fila do job: "bulk" se o usuário já tem FAIR_SHARE_ACTIVE_JOBS jobs ativos
+    (não monopoliza os workers), "large" para arquivos grandes, senão "small".
+    """
+    if active_jobs >= FAIR_SHARE_ACTIVE_JOBS:
+        return "bulk"
+    if size_bytes >= LARGE_JOB_MB * 1024 * 1024 or (estimated_rows or 0) >= LARGE_JOB_ROWS:
+        return "large"
+    return "small"
+
 
 if os.getenv("TESTING", "").lower() in ("1", "true"):
     # Em modo teste, usa uma fila fake (RQ requer fork, indisponível no Windows)
     class _FakeQueue:
         def enqueue(self, *args, **kwargs):
             pass
+
+        def enqueue_many(self, *args, **kwargs):
+            pass
     queue = _FakeQueue()
+
+    def worker_health() -> list[dict]:
+        return []
+
+    def queue_stats() -> list[dict]:
+        return []
 else:
     from redis import Redis
-    from rq import Queue
+    from rq import Queue, Worker
+    from rq.registry import StartedJobRegistry
     from app.config import REDIS_URL
 
     _redis = Redis.from_url(REDIS_URL)
-    queue = Queue("default", connection=_redis)
+
+    class _ClassQueues:
+        """Uma fila RQ por classe de job; enqueue(..., job_class=...) escolhe a fila."""
+
+        def __init__(self, connection):
+            self.queues = {name: Queue(name, connection=connection) for name in QUEUE_NAMES}
+
+        def enqueue(self, func, *args, job_class: str = "small", **kwargs):
+            return self.queues[job_class].enqueue(func, *args, **kwargs)
+
+        def enqueue_many(self, func, calls: list[tuple[tuple, str]]) -> None:
+            """Enfileira vários (args, job_class) de func com um único pipeline do Redis (um round trip)."""
+            by_class: dict[str, list] = {}
+            for args, job_class in calls:
+                q = self.queues[job_class]
+                by_class.setdefault(job_class, []).append(q.prepare_data(func, args=args))
+            with _redis.pipeline() as pipe:
+                for job_class, datas in by_class.items():
+                    self.queues[job_class].enqueue_many(datas, pipeline=pipe)
+                pipe.execute()
+
+    queue = _ClassQueues(_redis)
+
+    def worker_health() -> list[dict]:
+        """Estado de cada worker registrado no Redis (nome, estado, job atual, último heartbeat)."""
+        workers = []
+        for w in Worker.all(connection=_redis):
+            workers.append({
+                "name": w.name,
+                "pid": w.pid,
+                "hostname": w.hostname,
+                "state": w.get_state(),
+                "current_job_id": w.get_current_job_id(),
+                "last_heartbeat": w.last_heartbeat.isoformat() if w.last_heartbeat else None,
+                "successful_jobs": w.successful_job_count,
+                "failed_jobs": w.failed_job_count,
+            })
+        return workers
+
+    def queue_stats() -> list[dict]:
+        """Profundidade, jobs em execução e espera do job mais antigo de cada classe de fila."""
+        stats = []
+        now = datetime.utcnow()
+        for name, q in queue.queues.items():
+            oldest_wait = 0.0
+            job_ids = q.get_job_ids(0, 1)
+            oldest = q.fetch_job(job_ids[0]) if job_ids else None
+            if oldest is not None and oldest.enqueued_at:
+                oldest_wait = max((now - oldest.enqueued_at.replace(tzinfo=None)).total_seconds(), 0.0)
+            stats.append({
+                "name": name,
+                "depth": q.count,
+                "started": StartedJobRegistry(queue=q).count,
+                "oldest_wait_seconds": round(oldest_wait, 1),
+            })
+        return stats
@@ -3,10 +3,11 @@ import logging
 import uuid
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr, field_validator
 from sqlalchemy.orm import Session
 
-from app.auth import create_access_token, hash_password, verify_password
+from app.auth import create_access_token, hash_password_async, verify_password_async
 from app.db import get_db
 from app.models import User
 
@@ -31,27 +32,36 @@ class LoginRequest(BaseModel):
     password: str
 
 
+def _find_user_by_email(db: Session, email: str) -> User | None:
+    return db.query(User).filter(User.email == email.lower()).first()
+
+
+def _save_user(db: Session, user: User) -> None:
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+
+
 @router.post("/register", status_code=201)
-def register(
+async def register(
     body: RegisterRequest,
     db: Session = Depends(get_db),
 ):
     """
     Cria uma nova conta com email e senha.
     Retorna 400 se o email já existir.
+    Banco no threadpool e bcrypt no pool próprio: o event loop não fica bloqueado.
     """
     try:
-        existing = db.query(User).filter(User.email == body.email.lower()).first()
+        existing = await run_in_threadpool(_find_user_by_email, db, body.email)
         if existing:
             raise HTTPException(status_code=400, detail="Email já cadastrado")
         user = User(
             id=str(uuid.uuid4()),
             email=body.email.lower(),
-            password_hash=hash_password(body.password),
+            password_hash=await hash_password_async(body.password),
         )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+        await run_in_threadpool(_save_user, db, user)
         token = create_access_token(user.id)
         return {"access_token": token, "token_type": "bearer", "user_id": user.id}
     except HTTPException:
@@ -62,7 +72,7 @@ def register(
 
 
 @router.post("/login")
-def login(
+async def login(
     body: LoginRequest,
     db: Session = Depends(get_db),
 ):
@@ -71,8 +81,8 @@ def login(
     Retorna token JWT se as credenciais forem válidas.
     """
     try:
-        user = db.query(User).filter(User.email == body.email.lower()).first()
-        if not user or not verify_password(body.password, user.password_hash):
+        user = await run_in_threadpool(_find_user_by_email, db, body.email)
+        if not user or not await verify_password_async(body.password, user.password_hash):
             raise HTTPException(status_code=401, detail="Email ou senha incorretos")
         token = create_access_token(user.id)
         return {"access_token": token, "token_type": "bearer", "user_id": user.id}
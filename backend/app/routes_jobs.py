@@ -1,23 +1,85 @@
-# Endpoints de jobs: upload, status, preview, download, report, delete
+# Endpoints de jobs: upload, status, preview, linhas, download, report, delete
 import json
+import logging
 import re
+import shutil
 import uuid
+import zipfile
+import zlib
+from datetime import datetime
 from pathlib import Path
+from typing import BinaryIO
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.auth import get_current_user
-from app.config import REPORTS_DIR
-from app.db import get_db
+from app.config import BATCH_MAX_FILES, MAX_UPLOAD_SIZE_MB, REPORTS_DIR, ROWS_PAGE_MAX
+from app.db import SessionLocal, get_db
+from app.http_files import cache_headers, file_response, is_not_modified
 from app.models import Job, User
-from app.processing import process_job
-from app.queue_rq import queue
-from app.storage import allowed_file, save_upload
+from app.processing import GHL_COLUMNS, estimate_rows, pipeline_version, process_job
+from app.progress import FINAL_PHASES, clear_progress, format_sse, iter_progress_events
+from app.queue_rq import classify_job, queue
+from app.row_index import ROW_FILTERS, RowIndex
+from app.storage import (
+    UploadTooLarge,
+    allowed_file,
+    discard_job_artifacts,
+    is_gzip,
+    is_zip,
+    iter_gunzip,
+    iter_zip_uploads,
+    link_job_artifacts,
+    parquet_output_path,
+    row_index_dir,
+    save_upload_stream,
+)
+
+logger = logging.getLogger("uvicorn.error")
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
+# Folga para os cabeçalhos do multipart além dos bytes dos arquivos (checagem do Content-Length)
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+def _max_request_bytes(path: str) -> int | None:
+    """Maior corpo aceito em POST path (rotas de upload), ou None se a rota não tem limite."""
+    file_bytes = MAX_UPLOAD_SIZE_MB * 1024 * 1024
+    if path == "/jobs":
+        return file_bytes + MULTIPART_OVERHEAD_BYTES
+    if path == "/jobs/batch":
+        return file_bytes * BATCH_MAX_FILES + MULTIPART_OVERHEAD_BYTES
+    return None
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Recusa com 413 uploads cujo Content-Length já passa do limite, antes de o Starlette
+    receber (e gravar em arquivo temporário) o corpo inteiro. Sem Content-Length (chunked),
+    vale o limite aplicado durante a cópia (save_upload_stream).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST":
+            limit = _max_request_bytes(scope["path"].rstrip("/"))
+            length = dict(scope["headers"]).get(b"content-length", b"")
+            if limit is not None and length.isdigit() and int(length) > limit:
+                response = JSONResponse(
+                    status_code=413,
+                    content={"detail": f"Arquivo excede o tamanho máximo permitido de {MAX_UPLOAD_SIZE_MB} MB"},
+                    headers={"Connection": "close"},
+                )
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
+
 # Regex para validar UUID (rejeita "GET /jobs/", espaços, paths, etc.)
 UUID_PATTERN = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$")
 
@@ -45,52 +107,106 @@ def _get_job_or_404(job_id: str, db: Session, current_user: User) -> Job:
     return job
 
 
-@router.post("", status_code=201)
-def create_job(
-    file: UploadFile = File(..., description="Planilha .xlsx ou .csv"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
+def _find_reusable_job(db: Session, current_user: User, content_hash: str, file_path: str, version: str) -> Job | None:
+    """Job concluído do usuário com o mesmo arquivo e versão do pipeline, cujos artefatos ainda existem."""
+    candidates = (
+        db.query(Job)
+        .filter(
+            Job.user_id == current_user.id,
+            Job.content_hash == content_hash,
+            Job.file_path == file_path,
+            Job.pipeline_version == version,
+            Job.status == "done",
+        )
+        .order_by(Job.created_at.desc())
+        .limit(5)
+    )
+    for job in candidates:
+        paths = [job.output_csv_path, job.report_json_path]
+        if all(paths) and all(Path(p).exists() for p in paths):
+            return job
+    return None
+
+
+def _active_jobs_count(db: Session, user_id: str, exclude_job_id: str | None = None) -> int:
+    """Jobs do usuário ainda na fila ou em processamento (cota justa entre usuários)."""
+    query = db.query(Job).filter(Job.user_id == user_id, Job.status.in_(("queued", "processing")))
+    if exclude_job_id:
+        query = query.filter(Job.id != exclude_job_id)
+    return query.count()
+
+
+def _job_class(job: Job, active_jobs: int) -> str:
     """
-    Recebe o upload de um arquivo, salva no disco, cria o job no banco e enfileira o processamento.
-    Retorna o id do job para consultar status e baixar o resultado depois.
+    Classe de fila do job pelo tamanho do arquivo, linhas estimadas e jobs ativos do usuário.
+    Usa o que foi guardado no upload; só jobs antigos (sem file_size) consultam o arquivo.
     """
-    if not file.filename:
-        raise HTTPException(status_code=400, detail="Nome do arquivo é obrigatório")
-    if not allowed_file(file.filename):
-        raise HTTPException(
-            status_code=400,
-            detail="Aceito apenas .xlsx ou .csv",
-        )
+    if job.file_size is not None:
+        return classify_job(job.file_size, job.rows_estimate, active_jobs)
+    try:
+        size_bytes = Path(job.file_path).stat().st_size
+    except OSError:
+        return classify_job(0, None, active_jobs)
+    return classify_job(size_bytes, estimate_rows(job.file_path, size_bytes), active_jobs)
 
-    job_id = str(uuid.uuid4())
-    content = file.file.read()
 
-    MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
-    if len(content) > MAX_FILE_SIZE:
+def _enqueue_job(db: Session, job: Job) -> None:
+    """Enfileira process_job na fila da classe do job (tamanho do arquivo e cota do usuário)."""
+    active_jobs = _active_jobs_count(db, job.user_id, exclude_job_id=job.id)
+    clear_progress(job.id)
+    queue.enqueue(process_job, job.id, job_class=_job_class(job, active_jobs))
+
+
+def _build_job(db: Session, current_user: User, filename: str, fileobj: BinaryIO) -> Job:
+    """
+    Salva o upload (em blocos, endereçado pelo conteúdo) e monta o Job, ainda sem adicionar à sessão.
+    Se o mesmo arquivo já foi processado pelo usuário com a mesma versão do pipeline,
+    o job já nasce "done" com a saída reaproveitada. Levanta 413 se passar do limite.
+    """
+    job_id = str(uuid.uuid4())
+    try:
+        file_path, size, content_hash = save_upload_stream(
+            job_id, filename, fileobj, max_bytes=MAX_UPLOAD_SIZE_MB * 1024 * 1024
+        )
+    except UploadTooLarge:
         raise HTTPException(
             status_code=413,
-            detail="Arquivo excede o tamanho máximo permitido de 10 MB",
+            detail=f"Arquivo excede o tamanho máximo permitido de {MAX_UPLOAD_SIZE_MB} MB",
         )
 
-    file_path = save_upload(job_id, file.filename, content)
+    version = pipeline_version()
+    previous = _find_reusable_job(db, current_user, content_hash, file_path, version)
 
     job = Job(
         id=job_id,
         user_id=current_user.id,
         status="queued",
-        filename_original=file.filename,
+        filename_original=filename,
         file_path=file_path,
         output_csv_path=None,
         report_json_path=None,
         error_message=None,
+        content_hash=content_hash,
+        pipeline_version=version,
+        file_size=size,
+        rows_estimate=None if previous else estimate_rows(file_path, size),
+        created_at=datetime.utcnow(),
     )
-    db.add(job)
-    db.commit()
-    db.refresh(job)
+    if previous:
+        # Mesmo arquivo já processado com a mesma versão do pipeline: reaproveita a saída
+        try:
+            job.output_csv_path, job.report_json_path = link_job_artifacts(
+                previous.id, previous.output_csv_path, previous.report_json_path, job_id
+            )
+            job.status = "done"
+        except OSError as e:
+            # Saída do job anterior sumiu no meio do caminho (ex.: job apagado): processa de novo
+            logger.warning(f"[JOBS] Falha ao reaproveitar a saída do job {previous.id}: {e}")
+            discard_job_artifacts(job_id)
+    return job
 
-    queue.enqueue(process_job, job_id)
 
+def _job_summary(job: Job) -> dict:
     return {
         "id": job.id,
         "status": job.status,
@@ -99,6 +215,120 @@ def create_job(
     }
 
 
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """Accept-Encoding inclui gzip (ou *) com q > 0."""
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() not in ("gzip", "*"):
+            continue
+        q = params.strip().lower()
+        if q.startswith("q="):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+@router.post("", status_code=201)
+def create_job(
+    file: UploadFile = File(..., description="Planilha .xlsx ou .csv"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Recebe o upload de um arquivo, salva no disco, cria o job no banco e enfileira o processamento.
+    Retorna o id do job para consultar status e baixar o resultado depois.
+    """
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="Nome do arquivo é obrigatório")
+    if not allowed_file(file.filename):
+        raise HTTPException(
+            status_code=400,
+            detail="Aceito apenas .xlsx ou .csv",
+        )
+
+    job = _build_job(db, current_user, file.filename, file.file)
+    try:
+        db.add(job)
+        db.commit()
+    except Exception:
+        _discard_unsaved_jobs(db, [job])
+        raise
+    db.refresh(job)
+
+    if job.status == "queued":
+        _enqueue_job(db, job)
+
+    return _job_summary(job)
+
+
+@router.post("/batch", status_code=201)
+def create_jobs_batch(
+    files: list[UploadFile] = File(..., description="Planilhas .xlsx/.csv ou arquivos .zip com planilhas"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Recebe várias planilhas (ou .zip com planilhas) em uma requisição: grava todos os jobs
+    em uma única transação e enfileira todos com um único pipeline do Redis.
+    Dentro do .zip, arquivos que não são .xlsx/.csv são ignorados.
+    """
+    for f in files:
+        if not f.filename:
+            raise HTTPException(status_code=400, detail="Nome do arquivo é obrigatório")
+        if not (allowed_file(f.filename) or is_zip(f.filename)):
+            raise HTTPException(status_code=400, detail=f"Aceito apenas .xlsx, .csv ou .zip: {f.filename}")
+
+    jobs: list[Job] = []
+    try:
+        for f in files:
+            uploads = iter_zip_uploads(f.file) if is_zip(f.filename) else [(f.filename, f.file)]
+            for filename, fileobj in uploads:
+                if len(jobs) >= BATCH_MAX_FILES:
+                    raise HTTPException(status_code=400, detail=f"Máximo de {BATCH_MAX_FILES} arquivos por lote")
+                jobs.append(_build_job(db, current_user, filename, fileobj))
+        if not jobs:
+            raise HTTPException(status_code=400, detail="Nenhuma planilha .xlsx ou .csv encontrada")
+
+        active_jobs = _active_jobs_count(db, current_user.id)
+        calls = []
+        for job in jobs:
+            if job.status == "queued":
+                calls.append(((job.id,), _job_class(job, active_jobs)))
+                active_jobs += 1
+        summaries = [_job_summary(job) for job in jobs]
+
+        db.add_all(jobs)
+        db.commit()
+    except (zipfile.BadZipFile, zlib.error) as e:
+        _discard_unsaved_jobs(db, jobs)
+        raise HTTPException(
+            status_code=400, detail="Arquivo .zip inválido, criptografado ou com compressão não suportada"
+        ) from e
+    except Exception:
+        _discard_unsaved_jobs(db, jobs)
+        raise
+    if calls:
+        clear_progress(*(args[0] for args, _ in calls))
+        queue.enqueue_many(process_job, calls)
+
+    return {"total": len(summaries), "jobs": summaries}
+
+
+def _discard_unsaved_jobs(db: Session, jobs: list[Job]) -> None:
+    """
+    Desfaz jobs montados que não foram salvos (lote rejeitado ou commit com erro): apaga os
+    artefatos reaproveitados por hard link e os uploads que nenhum job do banco usa.
+    """
+    db.rollback()
+    for job in jobs:
+        discard_job_artifacts(job.id)
+        if not db.query(Job.id).filter(Job.file_path == job.file_path).first():
+            Path(job.file_path).unlink(missing_ok=True)
+
+
 @router.get("/{job_id}")
 def get_job(
     job_id: str,
@@ -116,61 +346,176 @@ def get_job(
         "created_at": job.created_at.isoformat(),
         "updated_at": job.updated_at.isoformat(),
         "error_message": job.error_message,
+        "metrics": json.loads(job.metrics_json) if job.metrics_json else None,
     }
 
 
+@router.get("/{job_id}/events")
+def job_events(
+    job_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Stream SSE (text/event-stream) com o progresso do job: fase, linhas processadas e ETA.
+    Autentica e consulta o job uma vez; depois repassa os eventos publicados pelo worker
+    no Redis, até a fase final (done/failed). A cada heartbeat relê o status no banco, então o
+    stream também fecha se o evento final se perder; dura no máximo SSE_MAX_SECONDS.
+    Substitui o polling de GET /jobs/{job_id}.
+    """
+    job = _get_job_or_404(job_id, db, current_user)
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if job.status in FINAL_PHASES:
+        payload = json.dumps({"job_id": job.id, "phase": job.status, "error_message": job.error_message})
+        return StreamingResponse(iter([format_sse(payload)]), media_type="text/event-stream", headers=headers)
+
+    async def _job_status() -> tuple[str | None, str | None]:
+        return await run_in_threadpool(_read_job_status, job.id)
+
+    return StreamingResponse(
+        iter_progress_events(job.id, job_status=_job_status), media_type="text/event-stream", headers=headers
+    )
+
+
+def _read_job_status(job_id: str) -> tuple[str | None, str | None]:
+    """(status, error_message) atual do job; (None, None) se foi apagado."""
+    with SessionLocal() as db:
+        job = db.get(Job, job_id)
+        return (job.status, job.error_message) if job else (None, None)
+
+
 @router.get("/{job_id}/preview")
 def get_preview(
     job_id: str,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Retorna as primeiras 20 linhas do CSV gerado em JSON. Só disponível quando status=done."""
+    """
+    Retorna as primeiras 20 linhas do CSV gerado em JSON. Só disponível quando status=done.
+    Envia o JSON salvo sem reprocessar, com ETag (304 se o cliente já tiver).
+    """
     job = _get_job_or_404(job_id, db, current_user)
     if job.status != "done":
         raise HTTPException(status_code=409, detail="Preview só disponível quando o job estiver concluído")
     preview_path = REPORTS_DIR / f"{job.id}_preview.json"
     if not preview_path.exists():
         raise HTTPException(status_code=404, detail="Arquivo de preview não encontrado")
-    data = json.loads(preview_path.read_text(encoding="utf-8"))
-    return data
+    return file_response(request, preview_path, "application/json")
+
+
+@router.get("/{job_id}/rows")
+def get_rows(
+    job_id: str,
+    request: Request,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=ROWS_PAGE_MAX),
+    filter: str | None = Query(None, pattern=f"^({'|'.join(ROW_FILTERS)})$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Página de linhas do CSV gerado, em JSON. Só disponível quando status=done.
+    filter restringe às linhas sem e-mail, sem telefone ou com telefone inválido.
+    Lê só as linhas da página pelo índice gravado junto com a saída (tempo constante em qualquer offset).
+    """
+    job = _get_job_or_404(job_id, db, current_user)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail="Linhas só disponíveis quando o job estiver concluído")
+    index = RowIndex(row_index_dir(job.id), Path(job.output_csv_path), GHL_COLUMNS)
+    if not index.exists():
+        raise HTTPException(status_code=404, detail="Índice de linhas não encontrado (job processado antes do índice)")
+    # Saída e índice não mudam depois de prontos: mesma versão do CSV = mesma página
+    stat_result = Path(job.output_csv_path).stat()
+    headers = cache_headers(stat_result, f"-rows-{offset}-{limit}-{filter or ''}")
+    if is_not_modified(request, headers, stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+    total, rows = index.page(offset, limit, filter)
+    next_offset = offset + len(rows)
+    return JSONResponse(
+        {
+            "job_id": job.id,
+            "filter": filter,
+            "offset": offset,
+            "limit": limit,
+            "total": total,
+            "next_offset": next_offset if next_offset < total else None,
+            "columns": GHL_COLUMNS,
+            "rows": rows,
+        },
+        headers=headers,
+    )
 
 
 @router.get("/{job_id}/download")
 def download_csv(
     job_id: str,
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Faz o download do CSV no padrão GHL. Só disponível quando status=done."""
+    """
+    Faz o download do CSV no padrão GHL. Só disponível quando status=done.
+    CSV guardado em .gz vai como está (Content-Encoding: gzip) se o cliente aceitar gzip;
+    senão é descompactado em streaming. Com ETag/Last-Modified (304) e Range para retomar downloads.
+    format=parquet envia a cópia Parquet (404 se o job foi processado sem PARQUET_OUTPUT).
+    """
     job = _get_job_or_404(job_id, db, current_user)
     if job.status != "done":
         raise HTTPException(status_code=409, detail="Download só disponível quando o job estiver concluído")
+    if format == "parquet":
+        path = parquet_output_path(job.id)
+        if not path.exists():
+            raise HTTPException(status_code=404, detail="Cópia Parquet não encontrada (PARQUET_OUTPUT desligado)")
+        return file_response(
+            request, path, "application/vnd.apache.parquet", filename=f"ghl_import_{job.id}.parquet"
+        )
     path = Path(job.output_csv_path)
     if not path.exists():
         raise HTTPException(status_code=404, detail="Arquivo CSV não encontrado")
-    return FileResponse(
-        path,
-        filename=f"ghl_import_{job.id}.csv",
+    filename = f"ghl_import_{job.id}.csv"
+    if not is_gzip(path):
+        return file_response(request, path, "text/csv", filename=filename)
+    if _accepts_gzip(request.headers.get("accept-encoding", "")):
+        return file_response(
+            request,
+            path,
+            "text/csv",
+            filename=filename,
+            headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+            variant="-gz",
+        )
+    # Descompactado em streaming: tamanho final desconhecido, então sem Range (só 304)
+    stat_result = path.stat()
+    headers = {**cache_headers(stat_result, "-identity"), "Vary": "Accept-Encoding"}
+    if is_not_modified(request, headers, stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+    return StreamingResponse(
+        iter_gunzip(path),
         media_type="text/csv",
+        headers={**headers, "Content-Disposition": f'attachment; filename="{filename}"'},
     )
 
 
 @router.get("/{job_id}/report")
 def get_report(
     job_id: str,
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Retorna o report.json com métricas do processamento. Só disponível quando status=done."""
+    """
+    Retorna o report.json com métricas do processamento. Só disponível quando status=done.
+    Envia o JSON salvo sem reprocessar, com ETag (304 se o cliente já tiver).
+    """
     job = _get_job_or_404(job_id, db, current_user)
     if job.status != "done":
         raise HTTPException(status_code=409, detail="Report só disponível quando o job estiver concluído")
     path = Path(job.report_json_path)
     if not path.exists():
         raise HTTPException(status_code=404, detail="Arquivo de report não encontrado")
-    data = json.loads(path.read_text(encoding="utf-8"))
-    return data
+    return file_response(request, path, "application/json")
 
 
 @router.post("/{job_id}/retry", status_code=202)
@@ -195,7 +540,7 @@ def retry_job(
     job.report_json_path = None
     db.commit()
 
-    queue.enqueue(process_job, job.id)
+    _enqueue_job(db, job)
 
     return {
         "id": job.id,
@@ -211,14 +556,16 @@ def delete_job(
     current_user: User = Depends(get_current_user),
 ):
     """
-    Deleta um job e todos os arquivos associados (upload, CSV, report, preview).
+    Deleta um job e todos os arquivos associados (upload, CSV, Parquet, índice de linhas, report, preview).
     Retorna 204 No Content em caso de sucesso.
     """
     job = _get_job_or_404(job_id, db, current_user)
 
     # Cleanup de arquivos associados
     files_to_delete = []
-    if job.file_path:
+    # Uploads são endereçados pelo conteúdo: só apaga se nenhum outro job usa o mesmo arquivo
+    shared_upload = db.query(Job.id).filter(Job.file_path == job.file_path, Job.id != job.id).first()
+    if job.file_path and not shared_upload:
         files_to_delete.append(Path(job.file_path))
     if job.output_csv_path:
         files_to_delete.append(Path(job.output_csv_path))
@@ -227,6 +574,7 @@ def delete_job(
     # Preview file
     preview_path = REPORTS_DIR / f"{job.id}_preview.json"
     files_to_delete.append(preview_path)
+    files_to_delete.append(parquet_output_path(job.id))
 
     for f in files_to_delete:
         try:
@@ -234,6 +582,7 @@ def delete_job(
                 f.unlink()
         except OSError:
             pass  # Best-effort cleanup
+    shutil.rmtree(row_index_dir(job.id), ignore_errors=True)
 
     db.delete(job)
     db.commit()
@@ -0,0 +1,191 @@
+# Índice de linhas da saída GHL, gravado junto com o CSV: início (em bytes) de cada linha,
+# linhas de cada filtro e, no .csv.gz, pontos onde a descompressão pode recomeçar.
+# GET /jobs/{id}/rows lê qualquer página com seeks, sem reler o CSV desde o começo.
+import csv
+import gzip
+import shutil
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Arquivos do índice (uint64 little-endian, um valor após o outro)
+OFFSETS_FILE = "offsets.u64"  # início de cada linha no CSV descompactado + fim dos dados (linhas + 1 valores)
+CHECKPOINTS_FILE = "checkpoints.u64"  # só .csv.gz: pares (offset descompactado, offset compactado)
+
+# No .csv.gz, um Z_FULL_FLUSH a cada CHECKPOINT_ROWS linhas: ler uma linha descompacta no máximo esse trecho
+CHECKPOINT_ROWS = 2000
+
+_INFLATE_READ_SIZE = 64 * 1024
+
+
+def _missing(col: str):
+    return lambda df: df[col].to_numpy() == ""
+
+
+def _invalid_phone(df: pd.DataFrame) -> np.ndarray:
+    # Mesmo predicado do report; import aqui porque app.processing importa este módulo
+    from app.processing import invalid_phone_mask
+
+    return invalid_phone_mask(df["Phone"])
+
+
+# Filtros de GET /jobs/{id}/rows?filter=...: nome -> máscara das linhas de um bloco da saída
+ROW_FILTERS = {
+    "missing_email": _missing("Email"),
+    "missing_phone": _missing("Phone"),
+    "invalid_phone": _invalid_phone,
+}
+
+
+def _filter_file(name: str) -> str:
+    return f"filter_{name}.u64"
+
+
+def _row_starts(data: bytes, rows: int, has_header: bool) -> np.ndarray:
+    """
+    Início (em bytes, relativo a data) de cada uma das rows linhas do CSV em data.
+    Sem quebras de linha dentro dos campos, cada linha do CSV é uma linha do arquivo;
+    senão o csv.reader diz quantas linhas físicas cada registro ocupa.
+    """
+    line_ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n")) + 1
+    line_starts = np.concatenate(([0], line_ends[:-1])).astype(np.uint64)
+    skip = 1 if has_header else 0
+    if len(line_starts) - skip == rows:
+        return line_starts[skip:]
+    reader = csv.reader(data[s:e].decode("utf-8") for s, e in zip(line_starts, line_ends))
+    starts = []
+    consumed = 0
+    for _ in reader:
+        starts.append(line_starts[consumed])
+        consumed = reader.line_num
+    return np.array(starts[skip:], dtype=np.uint64)
+
+
+class RowIndexWriter:
+    """
+    Escreve os blocos da saída no arquivo (binário; gzip.GzipFile no .csv.gz) e grava o índice
+    em directory. position = bytes do CSV descompactado já escritos antes do primeiro bloco (BOM).
+    """
+
+    def __init__(self, directory: Path, position: int = 0):
+        # Recria do zero: o diretório pode ter vindo por hard links de outro job (reaproveitamento)
+        shutil.rmtree(directory, ignore_errors=True)
+        directory.mkdir(parents=True)
+        self.directory = directory
+        self.position = position
+        self.rows = 0
+        self._offsets = open(directory / OFFSETS_FILE, "wb")
+        self._filters = {name: open(directory / _filter_file(name), "wb") for name in ROW_FILTERS}
+        self._checkpoints = None
+
+    def write(self, f, ghl_df: pd.DataFrame, data: bytes, has_header: bool) -> None:
+        """Escreve data (ghl_df.to_csv em utf-8) em f, registrando onde começa cada linha."""
+        starts = _row_starts(data, len(ghl_df), has_header)
+        (self.position + starts).astype("<u8").tofile(self._offsets)
+        for name, mask_of in ROW_FILTERS.items():
+            (self.rows + np.flatnonzero(mask_of(ghl_df))).astype("<u8").tofile(self._filters[name])
+
+        if not isinstance(f, gzip.GzipFile):
+            f.write(data)
+        else:
+            if self._checkpoints is None:
+                self._checkpoints = open(self.directory / CHECKPOINTS_FILE, "wb")
+            # Cabeçalho vai junto com o primeiro trecho; cada trecho começa num ponto de reinício
+            cuts = [0, *(int(s) for s in starts[CHECKPOINT_ROWS::CHECKPOINT_ROWS]), len(data)]
+            for begin, end in zip(cuts, cuts[1:]):
+                f.flush(zlib.Z_FULL_FLUSH)
+                np.array([self.position + begin, f.fileobj.tell()], dtype="<u8").tofile(self._checkpoints)
+                f.write(data[begin:end])
+
+        self.position += len(data)
+        self.rows += len(ghl_df)
+
+    def close(self) -> None:
+        # Fim dos dados: a última linha vai até aqui
+        np.array([self.position], dtype="<u8").tofile(self._offsets)
+        for fh in (self._offsets, *self._filters.values(), self._checkpoints):
+            if fh is not None:
+                fh.close()
+
+    def __enter__(self) -> "RowIndexWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class RowIndex:
+    """Leitura paginada da saída GHL usando o índice gravado por RowIndexWriter."""
+
+    def __init__(self, directory: Path, csv_path: Path, columns: list):
+        self.directory = directory
+        self.csv_path = csv_path
+        self.columns = columns
+
+    def exists(self) -> bool:
+        return (self.directory / OFFSETS_FILE).exists() and self.csv_path.exists()
+
+    def _count(self, name: str) -> int:
+        return (self.directory / name).stat().st_size // 8
+
+    def total(self, filter_name: str | None = None) -> int:
+        if filter_name:
+            return self._count(_filter_file(filter_name))
+        return max(self._count(OFFSETS_FILE) - 1, 0)
+
+    def page(self, offset: int, limit: int, filter_name: str | None = None) -> tuple[int, list[dict]]:
+        """(total de linhas do filtro, linhas [offset, offset + limit) como {"row": n, "data": {...}})."""
+        total = self.total(filter_name)
+        count = max(min(limit, total - offset), 0)
+        if not count:
+            return total, []
+        if filter_name:
+            row_numbers = np.fromfile(
+                self.directory / _filter_file(filter_name), dtype="<u8", count=count, offset=offset * 8
+            )
+        else:
+            row_numbers = np.arange(offset, offset + count, dtype=np.uint64)
+
+        ranges = []
+        with open(self.directory / OFFSETS_FILE, "rb") as f:
+            for n in row_numbers:
+                f.seek(int(n) * 8)
+                start, end = np.frombuffer(f.read(16), dtype="<u8")
+                ranges.append((int(start), int(end)))
+
+        rows = []
+        for n, raw in zip(row_numbers, self._read_ranges(ranges)):
+            values = next(csv.reader([raw.decode("utf-8")]))
+            rows.append({"row": int(n), "data": dict(zip(self.columns, values))})
+        return total, rows
+
+    def _read_ranges(self, ranges: list[tuple[int, int]]) -> list[bytes]:
+        """Bytes de cada (início, fim) do CSV descompactado; ranges em ordem crescente."""
+        with open(self.csv_path, "rb") as f:
+            if not (self.directory / CHECKPOINTS_FILE).exists():
+                result = []
+                for start, end in ranges:
+                    f.seek(start)
+                    result.append(f.read(end - start))
+                return result
+
+            checkpoints = np.fromfile(self.directory / CHECKPOINTS_FILE, dtype="<u8").reshape(-1, 2)
+            result = []
+            # Trecho já descompactado: (índice do checkpoint, bytes desde o checkpoint, inflater)
+            piece = None
+            for start, end in ranges:
+                k = int(np.searchsorted(checkpoints[:, 0], start, side="right")) - 1
+                base, compressed_at = (int(v) for v in checkpoints[k])
+                if piece is None or piece[0] != k:
+                    f.seek(compressed_at)
+                    piece = (k, bytearray(), zlib.decompressobj(-zlib.MAX_WBITS))
+                _, buffer, inflater = piece
+                while len(buffer) < end - base:
+                    chunk = f.read(_INFLATE_READ_SIZE)
+                    if not chunk:
+                        break
+                    buffer += inflater.decompress(chunk)
+                result.append(bytes(buffer[start - base:end - base]))
+            return result
@@ -1,26 +1,185 @@
 # Funções para salvar e localizar arquivos (uploads, CSVs gerados, reports)
+import gzip
+import hashlib
+import os
+import shutil
+import zipfile
+from collections.abc import Iterator
 from pathlib import Path
+from typing import BinaryIO
 
-from app.config import UPLOADS_DIR
+from app.config import OUTPUT_COMPRESSION, OUTPUT_GZIP_LEVEL, OUTPUTS_DIR, REPORTS_DIR, UPLOADS_DIR
 
 ALLOWED_EXTENSIONS = {".xlsx", ".csv"}
 
+# Tamanho dos blocos copiados do upload para o disco
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Upload passou do limite de bytes durante a cópia para o disco."""
+
+
+# Blocos lidos ao descompactar um CSV .gz para clientes sem suporte a gzip
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+
+def output_suffix(compression: str | None = None) -> str:
+    """Extensão do CSV de saída conforme OUTPUT_COMPRESSION (.csv ou .csv.gz)."""
+    return ".csv.gz" if (compression or OUTPUT_COMPRESSION) == "gzip" else ".csv"
+
+
+def parquet_output_path(job_id: str) -> Path:
+    """Cópia Parquet da saída do job (só existe com PARQUET_OUTPUT ligado)."""
+    return OUTPUTS_DIR / f"{job_id}.parquet"
+
+
+def row_index_dir(job_id: str) -> Path:
+    """Índice de linhas da saída do job (app.row_index), usado por GET /jobs/{id}/rows."""
+    return OUTPUTS_DIR / f"{job_id}.rows"
+
+
+def is_gzip(path: str | Path) -> bool:
+    return str(path).endswith(".gz")
+
+
+def open_output_binary(path: Path):
+    """Abre o CSV de saída para escrita em bytes, comprimindo (gzip.GzipFile) se o caminho terminar em .gz."""
+    if is_gzip(path):
+        return gzip.open(path, "wb", compresslevel=OUTPUT_GZIP_LEVEL)
+    return open(path, "wb")
+
+
+def iter_gunzip(path: Path, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+    """Lê um .gz descompactando em blocos (sem carregar o arquivo inteiro)."""
+    with gzip.open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            yield chunk
+
 
 def allowed_file(filename: str) -> bool:
     """Verifica se o arquivo tem extensão permitida (.xlsx ou .csv)."""
     return Path(filename).suffix.lower() in ALLOWED_EXTENSIONS
 
 
-def save_upload(job_id: str, filename_original: str, content: bytes) -> str:
+def is_zip(filename: str) -> bool:
+    """Verifica se o arquivo é um .zip (upload em lote)."""
+    return Path(filename).suffix.lower() == ".zip"
+
+
+def iter_zip_uploads(fileobj: BinaryIO) -> Iterator[tuple[str, BinaryIO]]:
     """
-    Salva o arquivo enviado na pasta de uploads.
-    Nome no disco: job_id + extensão do arquivo original.
-    Retorna o caminho absoluto do arquivo salvo (para guardar no banco).
+    Percorre um .zip enviado e gera (nome, arquivo aberto) para cada planilha .xlsx/.csv,
+    lendo cada membro em streaming. Pastas, outros tipos e metadados do macOS são ignorados.
     """
+    with zipfile.ZipFile(fileobj) as zf:
+        for info in zf.infolist():
+            name = Path(info.filename).name
+            if info.is_dir() or info.filename.startswith("__MACOSX/") or not allowed_file(name):
+                continue
+            try:
+                member = zf.open(info)
+            except (RuntimeError, NotImplementedError) as e:
+                # Membro criptografado ou com método de compressão não suportado
+                raise zipfile.BadZipFile(f"{info.filename}: {e}") from e
+            with member:
+                yield name, member
+
+
+def _upload_path(name: str, filename_original: str) -> Path:
+    """Caminho no disco: name + extensão do arquivo original (ou .csv se não permitida)."""
     UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
     ext = Path(filename_original).suffix.lower() or ".bin"
     if ext not in ALLOWED_EXTENSIONS:
         ext = ".csv"
-    path = UPLOADS_DIR / f"{job_id}{ext}"
-    path.write_bytes(content)
-    return str(path.resolve())
+    return UPLOADS_DIR / f"{name}{ext}"
+
+
+def save_upload_stream(
+    job_id: str,
+    filename_original: str,
+    fileobj: BinaryIO,
+    max_bytes: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> tuple[str, int, str]:
+    """
+    Copia o upload para a pasta de uploads em blocos de chunk_size bytes, sem manter
+    o arquivo inteiro em memória. Calcula o SHA-256 durante a cópia.
+    O arquivo fica endereçado pelo conteúdo (sha256 + extensão): o mesmo arquivo enviado
+    de novo não ocupa espaço extra.
+    Levanta UploadTooLarge (e apaga o arquivo parcial) assim que passar de max_bytes.
+    Retorna (caminho absoluto, tamanho em bytes, sha256 hex).
+    """
+    part_path = _upload_path(job_id, filename_original).with_suffix(".part")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(part_path, "wb") as out:
+            while chunk := fileobj.read(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Upload excede {max_bytes} bytes")
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
+    content_hash = digest.hexdigest()
+    path = _upload_path(content_hash, filename_original)
+    if path.exists():
+        part_path.unlink()
+    else:
+        part_path.replace(path)
+    return str(path.resolve()), size, content_hash
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    """Hard link de src em dst (sem copiar bytes); copia se o sistema de arquivos não suportar."""
+    dst.unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def link_job_artifacts(source_job_id: str, source_csv: str, source_report: str, job_id: str) -> tuple[str, str]:
+    """
+    Reaproveita CSV, report, preview, cópia Parquet e índice de linhas de um job concluído para job_id (hard links).
+    Cada job fica dono dos próprios caminhos, então apagar um não afeta o outro.
+    Retorna (output_csv_path, report_json_path) do novo job.
+    """
+    OUTPUTS_DIR.mkdir(parents=True, exist_ok=True)
+    REPORTS_DIR.mkdir(parents=True, exist_ok=True)
+    # Mantém a extensão da origem (.csv ou .csv.gz), mesmo que OUTPUT_COMPRESSION tenha mudado
+    output_csv = OUTPUTS_DIR / f"{job_id}{'.csv.gz' if is_gzip(source_csv) else '.csv'}"
+    report_json = REPORTS_DIR / f"{job_id}_report.json"
+    _link_or_copy(Path(source_csv), output_csv)
+    _link_or_copy(Path(source_report), report_json)
+    source_preview = REPORTS_DIR / f"{source_job_id}_preview.json"
+    if source_preview.exists():
+        _link_or_copy(source_preview, REPORTS_DIR / f"{job_id}_preview.json")
+    source_parquet = parquet_output_path(source_job_id)
+    if source_parquet.exists():
+        _link_or_copy(source_parquet, parquet_output_path(job_id))
+    source_index = row_index_dir(source_job_id)
+    if source_index.is_dir():
+        # O índice aponta para bytes do CSV, que é o mesmo arquivo (hard link)
+        index_dir = row_index_dir(job_id)
+        shutil.rmtree(index_dir, ignore_errors=True)
+        index_dir.mkdir()
+        for f in source_index.iterdir():
+            _link_or_copy(f, index_dir / f.name)
+    return str(output_csv.resolve()), str(report_json.resolve())
+
+
+def discard_job_artifacts(job_id: str) -> None:
+    """Remove tudo que link_job_artifacts criou para job_id (job que não chegou a ser salvo no banco)."""
+    for path in (
+        OUTPUTS_DIR / f"{job_id}.csv",
+        OUTPUTS_DIR / f"{job_id}.csv.gz",
+        REPORTS_DIR / f"{job_id}_report.json",
+        REPORTS_DIR / f"{job_id}_preview.json",
+        parquet_output_path(job_id),
+    ):
+        path.unlink(missing_ok=True)
+    shutil.rmtree(row_index_dir(job_id), ignore_errors=True)
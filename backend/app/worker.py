@@ -1,7 +1,14 @@
 # Worker RQ: processa jobs em background (roda em processo separado do FastAPI)
-# Comando: python -m app.worker
+# Comando: python -m app.worker              (um worker)
+#          python -m app.worker --workers 0  (supervisor com um worker por núcleo)
+import argparse
+import logging
+import multiprocessing
 import os
+import random
+import signal
 import sys
+import time
 from pathlib import Path
 
 # Garante que o backend está no path e carrega .env
@@ -18,15 +25,122 @@ from rq import Queue
 from rq.worker import SimpleWorker
 
 from app.config import REDIS_URL
+from app.queue_rq import QUEUE_NAMES, parse_queue_weights
+
+logger = logging.getLogger("app.worker")
+
+# Tempo que o supervisor espera os workers terminarem o job atual antes de matá-los
+SHUTDOWN_TIMEOUT_SECONDS = int(os.getenv("WORKER_SHUTDOWN_TIMEOUT", "300"))
+
+
+class WeightedWorker(SimpleWorker):
+    """
+    Worker que, após cada job, sorteia a ordem das filas com pesos (QUEUE_WEIGHTS):
+    small costuma vir primeiro, mas large e bulk também ganham a vez (sem starvation).
+    Fila vazia é pulada na hora, então a ordem nunca deixa o worker ocioso.
+    """
+
+    weights: dict[str, float] = {}
+
+    def reorder_queues(self, reference_queue):
+        remaining = list(self._ordered_queues)
+        ordered = []
+        while remaining:
+            weights = [self.weights.get(q.name, 1.0) for q in remaining]
+            pick = random.choices(range(len(remaining)), weights=weights)[0]
+            ordered.append(remaining.pop(pick))
+        self._ordered_queues = ordered
 
 
 def run_worker():
     redis_conn = Redis.from_url(REDIS_URL)
-    queue = Queue("default", connection=redis_conn)
-    # SimpleWorker no Windows (RQ usa os.fork() que não existe no Windows)
-    worker = SimpleWorker([queue], connection=redis_conn)
+    # "default" é a fila antiga (antes das classes de tamanho): peso baixo, só até esvaziar
+    queues = [Queue(name, connection=redis_conn) for name in (*QUEUE_NAMES, "default")]
+    # SimpleWorker no Windows (RQ usa os.fork() que não existe no Windows).
+    # No supervisor cada worker já é um processo próprio, e o SimpleWorker mantém
+    # os caches do processo (telefones, conexões) entre jobs.
+    WeightedWorker.weights = {**parse_queue_weights(), "default": 0.1}
+    worker = WeightedWorker(queues, connection=redis_conn)
     worker.work()
 
 
-if __name__ == "__main__":
+def _run_supervised_worker():
+    """
+    Alvo dos processos do supervisor: cada worker roda no próprio grupo de processos. O Ctrl+C do
+    terminal (SIGINT para o grupo em primeiro plano) chega só ao supervisor, que repassa um único
+    SIGTERM; com dois sinais o RQ faria cold shutdown e mataria o job em andamento.
+    """
+    if hasattr(os, "setpgid"):
+        os.setpgid(0, 0)
     run_worker()
+
+
+def _resolve_worker_count(requested: int) -> int:
+    """0 = um worker por núcleo da máquina."""
+    return requested if requested > 0 else (os.cpu_count() or 1)
+
+
+def run_supervisor(num_workers: int, shutdown_timeout: int = SHUTDOWN_TIMEOUT_SECONDS) -> None:
+    """
+    Mantém num_workers processos de worker rodando: reinicia quem morrer e, ao receber
+    SIGTERM/SIGINT, repassa SIGTERM (o RQ termina o job atual e sai) e espera até
+    shutdown_timeout segundos antes de matar quem ainda estiver vivo.
+    """
+    stopping = False
+
+    def _request_stop(signum, frame):
+        nonlocal stopping
+        if not stopping:
+            logger.info(f"[SUPERVISOR] Sinal {signum} recebido, encerrando workers...")
+        stopping = True
+
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+
+    def _start(index: int) -> multiprocessing.Process:
+        proc = multiprocessing.Process(target=_run_supervised_worker, name=f"rq-worker-{index}", daemon=False)
+        proc.start()
+        logger.info(f"[SUPERVISOR] Worker {index} iniciado (pid={proc.pid})")
+        return proc
+
+    procs = {i: _start(i) for i in range(num_workers)}
+    while not stopping:
+        for i, proc in list(procs.items()):
+            if not proc.is_alive() and not stopping:
+                logger.warning(f"[SUPERVISOR] Worker {i} (pid={proc.pid}) saiu com código {proc.exitcode}, reiniciando")
+                procs[i] = _start(i)
+        time.sleep(1)
+
+    for proc in procs.values():
+        if proc.is_alive():
+            proc.terminate()
+    deadline = time.monotonic() + shutdown_timeout
+    for proc in procs.values():
+        proc.join(max(deadline - time.monotonic(), 0))
+        if proc.is_alive():
+            logger.warning(f"[SUPERVISOR] Worker pid={proc.pid} não terminou a tempo, matando")
+            proc.kill()
+            proc.join()
+    logger.info("[SUPERVISOR] Todos os workers encerrados")
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Worker RQ do FlowBase")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WORKER_CONCURRENCY", "1")),
+        help="Número de workers (1 = worker único, 0 = um por núcleo). Padrão: WORKER_CONCURRENCY ou 1",
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    num_workers = _resolve_worker_count(args.workers)
+    if num_workers == 1:
+        run_worker()
+    else:
+        run_supervisor(num_workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Benchmark de login sob concorrência: mede vazão do POST /auth/login e, em paralelo,
+# a latência do GET /health (mostra se os logins estão travando o resto da API).
+# Uso (com a API rodando):
+#   python scripts/bench_login.py --url http://localhost:8000 --requests 200 --concurrency 20
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)]
+
+
+async def _ensure_user(client: httpx.AsyncClient, email: str, password: str) -> None:
+    resp = await client.post("/auth/register", json={"email": email, "password": password})
+    if resp.status_code not in (201, 400):
+        raise SystemExit(f"Falha ao criar usuário de benchmark: {resp.status_code} {resp.text}")
+
+
+async def _login_worker(client, email, password, pending: list[int], latencies: list[float], errors: list[int]):
+    while pending:
+        pending.pop()
+        start = time.perf_counter()
+        resp = await client.post("/auth/login", json={"email": email, "password": password})
+        latencies.append(time.perf_counter() - start)
+        if resp.status_code != 200:
+            errors.append(resp.status_code)
+
+
+async def _probe_health(client, stop: asyncio.Event, latencies: list[float], interval: float = 0.05):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/health")
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+
+
+async def run(url: str, total: int, concurrency: int, email: str, password: str) -> None:
+    limits = httpx.Limits(max_connections=concurrency + 1)
+    async with httpx.AsyncClient(base_url=url, timeout=60, limits=limits) as client:
+        await _ensure_user(client, email, password)
+
+        pending = list(range(total))
+        login_latencies: list[float] = []
+        health_latencies: list[float] = []
+        errors: list[int] = []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe_health(client, stop, health_latencies))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            _login_worker(client, email, password, pending, login_latencies, errors)
+            for _ in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await probe
+
+    print(f"logins: {len(login_latencies)} em {elapsed:.2f}s ({len(login_latencies) / elapsed:.1f}/s), erros: {len(errors)}")
+    print(
+        f"login   p50={_percentile(login_latencies, 50) * 1000:.0f}ms "
+        f"p95={_percentile(login_latencies, 95) * 1000:.0f}ms "
+        f"média={statistics.fmean(login_latencies) * 1000:.0f}ms"
+    )
+    print(
+        f"/health p50={_percentile(health_latencies, 50) * 1000:.0f}ms "
+        f"p95={_percentile(health_latencies, 95) * 1000:.0f}ms (durante os logins)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de login sob concorrência")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=200, help="Total de logins")
+    parser.add_argument("--concurrency", type=int, default=20, help="Logins simultâneos")
+    parser.add_argument("--email", default=f"bench-{uuid.uuid4().hex[:8]}@example.com")
+    parser.add_argument("--password", default="bench-senha-123")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.requests, args.concurrency, args.email, args.password))
+
+
+if __name__ == "__main__":
+    main()
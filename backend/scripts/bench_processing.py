@@ -0,0 +1,156 @@
+# Benchmark do pipeline de processamento com planilhas sintéticas (scripts/synthetic_leads.py).
+# Mede, por fase: tempo de parede, CPU, linhas/s e pico de RSS. Compara com o baseline salvo.
+# Uso:
+#   python scripts/bench_processing.py                          # 1k e 100k, CSV e XLSX, compara com o baseline
+#   python scripts/bench_processing.py --sizes 1m --formats csv # 1M linhas (gera o arquivo na primeira vez)
+#   python scripts/bench_processing.py --save-baseline          # grava os resultados como novo baseline
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# process_job roda contra um SQLite temporário, sem Redis (TESTING desliga o progresso)
+_DB_DIR = Path(tempfile.mkdtemp(prefix="flowbase-bench-db-"))
+atexit.register(shutil.rmtree, _DB_DIR, ignore_errors=True)
+os.environ.setdefault("TESTING", "1")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB_DIR / 'bench.db'}")
+
+from synthetic_leads import write_leads  # noqa: E402
+
+from app import processing, storage  # noqa: E402
+from app.metrics import JobMetrics  # noqa: E402
+from app.processing import process_to_ghl, read_file, read_file_chunks, write_ghl_csv  # noqa: E402
+
+BASELINE_PATH = Path(__file__).resolve().parent / "bench_baseline.json"
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def _measure(rows: int, fn):
+    """Executa fn() como uma fase de JobMetrics e retorna (resultado, métricas da fase)."""
+    metrics = JobMetrics(sample_interval=0.01).start()
+    try:
+        with metrics.phase("bench", rows=rows):
+            result = fn()
+    finally:
+        metrics.stop()
+    phase = metrics.as_dict()["bench"]
+    return result, {k: phase[k] for k in ("wall_seconds", "cpu_seconds", "rows_per_sec", "peak_rss_mb")}
+
+
+def _run_process_job(path: Path) -> None:
+    import uuid
+
+    from app.db import Base, SessionLocal, engine
+    from app.models import Job
+
+    Base.metadata.create_all(engine)
+    job_id = str(uuid.uuid4())
+    with SessionLocal() as db:
+        db.add(Job(id=job_id, status="queued", filename_original=path.name, file_path=str(path)))
+        db.commit()
+    processing.process_job(job_id)
+    with SessionLocal() as db:
+        job = db.get(Job, job_id)
+        if job.status != "done":
+            raise RuntimeError(f"process_job falhou: {job.error_message}")
+
+
+def bench_file(path: Path, rows: int, work_dir: Path, chunk_rows: int) -> dict:
+    """Fases medidas: read_file, process_to_ghl, write_ghl_csv (streaming) e process_job completo."""
+    phases = {}
+    df, phases["read_file"] = _measure(rows, lambda: read_file(str(path)))
+    _, phases["process_to_ghl"] = _measure(rows, lambda: process_to_ghl(df))
+    del df
+    out = work_dir / "out.csv"
+    _, phases["write_ghl_csv"] = _measure(
+        rows, lambda: write_ghl_csv(read_file_chunks(str(path), chunk_rows or None), out)
+    )
+    saved_dirs = (processing.OUTPUTS_DIR, processing.REPORTS_DIR, storage.OUTPUTS_DIR)
+    processing.OUTPUTS_DIR = processing.REPORTS_DIR = storage.OUTPUTS_DIR = work_dir
+    try:
+        _, phases["process_job"] = _measure(rows, lambda: _run_process_job(path))
+    finally:
+        processing.OUTPUTS_DIR, processing.REPORTS_DIR, storage.OUTPUTS_DIR = saved_dirs
+    return phases
+
+
+def _compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Casos/fases cujo linhas/s caiu mais que tolerance em relação ao baseline."""
+    regressions = []
+    for case, phases in results.items():
+        for phase, metrics in phases.items():
+            base = baseline.get(case, {}).get(phase, {}).get("rows_per_sec")
+            current = metrics["rows_per_sec"]
+            if not base or not current:
+                continue
+            change = current / base - 1
+            marker = ""
+            if change < -tolerance:
+                marker = "  <-- REGRESSÃO"
+                regressions.append(f"{case}/{phase}: {current:.0f} linhas/s (baseline {base:.0f}, {change:+.0%})")
+            print(f"    {case}/{phase}: {change:+.0%} vs baseline{marker}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de processamento")
+    parser.add_argument("--sizes", default="1k,100k", help=f"Tamanhos separados por vírgula ({', '.join(SIZES)})")
+    parser.add_argument("--formats", default="csv,xlsx")
+    parser.add_argument("--profile", choices=("pt", "en"), default="pt")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-rows", type=int, default=50_000, help="Linhas por bloco no write_ghl_csv (0 = inteiro)")
+    parser.add_argument("--data-dir", type=Path, default=Path(tempfile.gettempdir()) / "flowbase-bench")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Grava os resultados como baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Queda de linhas/s aceita (0.25 = 25%%)")
+    parser.add_argument("--json", type=Path, help="Grava os resultados completos neste arquivo")
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes.split(","):
+        rows = SIZES[size.strip().lower()]
+        for fmt in args.formats.split(","):
+            fmt = fmt.strip()
+            case = f"{args.profile}-{size.strip().lower()}-{fmt}"
+            path = args.data_dir / f"leads-{args.profile}-{rows}-s{args.seed}.{fmt}"
+            if not path.exists():
+                print(f"Gerando {path} ...")
+                write_leads(path, rows, fmt, args.profile, args.seed)
+            with tempfile.TemporaryDirectory(prefix="flowbase-bench-") as work_dir:
+                print(f"{case}:")
+                results[case] = bench_file(path, rows, Path(work_dir), args.chunk_rows)
+            for phase, m in results[case].items():
+                print(
+                    f"    {phase:<15} {m['wall_seconds']:>8.3f}s  cpu {m['cpu_seconds']:>8.3f}s  "
+                    f"{m['rows_per_sec'] or 0:>10.0f} linhas/s  pico RSS {m['peak_rss_mb']} MB"
+                )
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    if args.save_baseline:
+        stored = json.loads(args.baseline.read_text(encoding="utf-8")) if args.baseline.exists() else {}
+        stored.update(results)
+        stored["_machine"] = f"{platform.platform()} / Python {platform.python_version()} / {os.cpu_count()} CPUs"
+        args.baseline.write_text(json.dumps(stored, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"Baseline salvo em {args.baseline}")
+        return
+
+    if args.baseline.exists():
+        print("Comparação com o baseline:")
+        regressions = _compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        if regressions:
+            print("Regressões de desempenho:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
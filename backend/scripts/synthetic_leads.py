@@ -0,0 +1,133 @@
+# Gerador determinístico de listas de leads sintéticas (PT/EN) para benchmarks do pipeline.
+# Mesmo seed + mesmo número de linhas = mesmo arquivo, byte a byte.
+# Uso: python scripts/synthetic_leads.py --rows 100000 --format csv --out /tmp/leads.csv
+import argparse
+import csv
+import random
+from pathlib import Path
+
+FIRST_NAMES = [
+    "João", "Maria", "José", "Ana", "Antônio", "Francisca", "Luís", "Conceição", "Sebastião", "Iêda",
+    "John", "Mary", "Michael", "Jennifer", "Chloé", "René", "Zoë", "Ângela", "Márcio", "Patrícia",
+]
+LAST_NAMES = [
+    "Silva", "Santos", "Oliveira", "Souza", "Conceição", "Assunção", "Gonçalves", "Araújo", "Ribeiro",
+    "Smith", "Johnson", "O'Brien", "Müller", "García", "Nuñez", "Brandão", "Simões", "Lopes",
+]
+COMPANIES = ["Padaria Pão Quente", "Acme Corp", "Construtora Ômega", "Loja São Jorge", "Tech Ltda", ""]
+CITIES = [("Fortaleza", "CE"), ("São Paulo", "SP"), ("Belo Horizonte", "MG"), ("Porto Alegre", "RS"),
+          ("Miami", "FL"), ("Recife", "PE"), ("Goiânia", "GO")]
+DOMAINS = ["gmail.com", "hotmail.com", "empresa.com.br", "yahoo.com", "outlook.com"]
+TAGS = ["lead quente", "cliente", "evento 2024", "indicação", "newsletter"]
+
+# Variações de cabeçalho por perfil (colunas mapeadas + colunas sem sinônimo, que vão para Notes)
+HEADERS = {
+    "pt": ["Nome", "E-mail", "Telefone", "Telefones", "Empresa", "Cidade", "UF", "Tags", "Observações",
+           "Origem", "CPF", "Data de Nascimento", "Vendedor"],
+    "en": ["Full Name", "Email", "Phone", "Additional Phone Numbers", "Company", "City", "State", "Tags",
+           "Notes", "Source", "Customer ID", "Birthday", "Owner"],
+}
+
+
+def _phone(rng: random.Random) -> str:
+    """Telefone em formatos variados: BR com/sem DDI, pontuação, fixo, EUA, inválido ou vazio."""
+    ddd = rng.choice(["85", "11", "31", "51", "81", "62"])
+    number = f"9{rng.randint(1000, 9999)}{rng.randint(1000, 9999)}"
+    kind = rng.random()
+    if kind < 0.30:
+        return f"{ddd}{number}"
+    if kind < 0.50:
+        return f"({ddd}) {number[:5]}-{number[5:]}"
+    if kind < 0.62:
+        return f"+55 {ddd} {number}"
+    if kind < 0.70:
+        return f"{ddd} {rng.randint(3000, 3999)}-{rng.randint(1000, 9999)}"
+    if kind < 0.78:
+        return f"+1 305 {rng.randint(200, 999)} {rng.randint(1000, 9999)}"
+    if kind < 0.85:
+        return str(rng.randint(100, 99999))
+    return ""
+
+
+def _emails(rng: random.Random, first: str, last: str) -> str:
+    """Nenhum, um ou vários e-mails na mesma célula (vírgula/ponto e vírgula), às vezes inválidos."""
+    base = f"{first}.{last}".lower().replace("'", "").replace(" ", "")
+    kind = rng.random()
+    if kind < 0.15:
+        return ""
+    if kind < 0.70:
+        return f"{base}@{rng.choice(DOMAINS)}"
+    if kind < 0.80:
+        return f" {base.upper()}@{rng.choice(DOMAINS).upper()} "
+    if kind < 0.92:
+        sep = rng.choice([", ", ";", " ; "])
+        return sep.join(f"{base}{i}@{rng.choice(DOMAINS)}" for i in range(rng.randint(2, 3)))
+    return f"{base}-sem-arroba.{rng.choice(DOMAINS)}"
+
+
+def generate_rows(rows: int, profile: str = "pt", seed: int = 42):
+    """Gera (cabeçalho, iterador de linhas) determinísticos para o perfil "pt" ou "en"."""
+    rng = random.Random(f"{seed}-{profile}-{rows}")
+    header = HEADERS[profile]
+
+    def _iter():
+        for i in range(rows):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            city, state = rng.choice(CITIES)
+            extra_phones = ", ".join(_phone(rng) for _ in range(rng.randint(0, 2)))
+            yield [
+                f"{first} {last}" if rng.random() > 0.03 else "",
+                _emails(rng, first, last),
+                _phone(rng),
+                extra_phones,
+                rng.choice(COMPANIES),
+                city,
+                state,
+                ", ".join(rng.sample(TAGS, rng.randint(0, 2))),
+                "Cliente desde 2019; prefere WhatsApp" if rng.random() < 0.1 else "",
+                rng.choice(["site", "Instagram", "feira", ""]),
+                f"{rng.randint(0, 99999999999):011d}",
+                f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1950, 2005)}",
+                rng.choice(["Ana", "Bruno", "Carla"]) + f" #{i % 7}",
+            ]
+
+    return header, _iter()
+
+
+def write_leads(path: Path, rows: int, fmt: str = "csv", profile: str = "pt", seed: int = 42) -> Path:
+    """Escreve a planilha sintética em CSV (utf-8) ou XLSX (openpyxl write-only)."""
+    header, data = generate_rows(rows, profile, seed)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if fmt == "csv":
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(data)
+    elif fmt == "xlsx":
+        from openpyxl import Workbook
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(header)
+        for row in data:
+            ws.append(row)
+        wb.save(path)
+    else:
+        raise ValueError(f"Formato desconhecido: {fmt}")
+    return path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Gera planilha de leads sintética")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--format", choices=("csv", "xlsx"), default="csv")
+    parser.add_argument("--profile", choices=tuple(HEADERS), default="pt")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", type=Path, required=True)
+    args = parser.parse_args()
+    write_leads(args.out, args.rows, args.format, args.profile, args.seed)
+    print(f"{args.out} ({args.rows} linhas)")
+
+
+if __name__ == "__main__":
+    main()
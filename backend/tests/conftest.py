@@ -9,6 +9,7 @@ import uuid
 os.environ["TESTING"] = "1"
 os.environ["DATABASE_URL"] = "sqlite:///test.db"
 os.environ["JWT_SECRET"] = "test-secret-key"
+os.environ["BCRYPT_ROUNDS"] = "4"  # custo mínimo: testes rápidos
 
 import pytest
 from sqlalchemy import create_engine
@@ -18,7 +19,7 @@ from fastapi.testclient import TestClient
 
 from app.db import Base, get_db
 from app.models import User, Job
-from app.auth import hash_password, create_access_token
+from app.auth import hash_password, create_access_token, user_cache
 from app.main import app
 
 
@@ -46,10 +47,27 @@ app.dependency_overrides[get_db] = override_get_db
 def setup_db():
     """Cria e limpa tabelas antes/depois de cada teste."""
     Base.metadata.create_all(bind=test_engine)
+    user_cache.clear()
     yield
     Base.metadata.drop_all(bind=test_engine)
 
 
+@pytest.fixture(autouse=True)
+def storage_dirs(tmp_path_factory, monkeypatch):
+    """
+    Uploads, saídas e reports de cada teste em uma pasta temporária própria (nunca em backend/storage).
+    Fica fora do tmp_path: testes que olham o conteúdo do tmp_path não veem estas pastas.
+    """
+    root = tmp_path_factory.mktemp("storage")
+    dirs = {name: root / name for name in ("uploads", "outputs", "reports")}
+    monkeypatch.setattr("app.storage.UPLOADS_DIR", dirs["uploads"])
+    for module in ("app.storage", "app.processing"):
+        monkeypatch.setattr(f"{module}.OUTPUTS_DIR", dirs["outputs"])
+        monkeypatch.setattr(f"{module}.REPORTS_DIR", dirs["reports"])
+    monkeypatch.setattr("app.routes_jobs.REPORTS_DIR", dirs["reports"])
+    return dirs
+
+
 @pytest.fixture
 def db():
     """Sessão de banco para uso direto nos testes."""
@@ -87,3 +105,52 @@ def auth_headers(test_user):
     """Headers com Authorization Bearer para requests autenticados."""
     _, token = test_user
     return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def make_job(db, test_user, storage_dirs):
+    """
+    Fábrica de jobs do usuário de teste; retorna o id do job.
+    output/report: bytes gravados como saída (OUTPUTS_DIR/{id}{output_suffix}) e report.json.
+    input_csv: texto gravado como upload e processado de verdade por process_job.
+    """
+    from unittest.mock import patch
+
+    from app.processing import process_job
+
+    user, _ = test_user
+
+    def _make(status="done", output=None, report=None, input_csv=None, output_suffix=".csv"):
+        job = Job(
+            id=str(uuid.uuid4()),
+            user_id=user.id,
+            status=status,
+            filename_original="test.csv",
+            file_path="/tmp/test.csv",
+        )
+        if output is not None:
+            storage_dirs["outputs"].mkdir(parents=True, exist_ok=True)
+            path = storage_dirs["outputs"] / f"{job.id}{output_suffix}"
+            path.write_bytes(output)
+            job.output_csv_path = str(path)
+        if report is not None:
+            storage_dirs["reports"].mkdir(parents=True, exist_ok=True)
+            path = storage_dirs["reports"] / f"{job.id}_report.json"
+            path.write_bytes(report)
+            job.report_json_path = str(path)
+        if input_csv is not None:
+            storage_dirs["uploads"].mkdir(parents=True, exist_ok=True)
+            path = storage_dirs["uploads"] / f"{job.id}.csv"
+            path.write_text(input_csv, encoding="utf-8")
+            job.status, job.file_path = "queued", str(path)
+        db.add(job)
+        db.commit()
+        if input_csv is not None:
+            with patch("app.processing.SessionLocal", TestSessionLocal), \
+                    patch("app.processing.output_suffix", lambda: output_suffix):
+                process_job(job.id)
+            db.expire_all()
+        return job.id
+
+    return _make
+
@@ -1,4 +1,7 @@
 """Testes dos endpoints de autenticação."""
+import time
+from unittest.mock import patch
+
 import pytest
 
 
@@ -61,3 +64,67 @@ class TestLogin:
             "password": "senha123",
         })
         assert resp.status_code == 401
+
+
+class TestPasswordHashing:
+    def test_hash_uses_configured_rounds(self):
+        from app.auth import hash_password, verify_password
+
+        hashed = hash_password("senha123")
+        assert hashed.startswith("$2b$04$")
+        assert verify_password("senha123", hashed)
+
+    def test_async_hash_and_verify(self):
+        import asyncio
+
+        from app.auth import hash_password_async, verify_password_async
+
+        async def run():
+            hashed = await hash_password_async("senha123")
+            return await asyncio.gather(
+                verify_password_async("senha123", hashed),
+                verify_password_async("outra", hashed),
+            )
+
+        assert asyncio.run(run()) == [True, False]
+
+
+class TestUserCache:
+    def test_cached_user_skips_db(self, client, auth_headers, db, test_user):
+        user, _ = test_user
+        assert client.get("/jobs", headers=auth_headers).status_code == 200
+        # Usuário apagado do banco: ainda autentica enquanto estiver no cache
+        db.delete(user)
+        db.commit()
+        assert client.get("/jobs", headers=auth_headers).status_code == 200
+
+    def test_deleted_user_rejected_after_ttl(self, client, auth_headers, db, test_user):
+        from app.auth import user_cache
+
+        user, _ = test_user
+        assert client.get("/jobs", headers=auth_headers).status_code == 200
+        db.delete(user)
+        db.commit()
+        # O TTL é o limite de desatualização: depois dele o usuário volta a ser buscado no banco
+        later = time.monotonic() + user_cache.ttl + 1
+        with patch("app.auth.time.monotonic", return_value=later):
+            assert client.get("/jobs", headers=auth_headers).status_code == 401
+
+    def test_expired_entry(self, test_user):
+        from app.auth import UserCache
+
+        user, _ = test_user
+        cache = UserCache(ttl=0.01)
+        cache.put(user)
+        cached = cache.get(user.id)
+        assert cached.id == user.id and cached.email == user.email
+        time.sleep(0.02)
+        assert cache.get(user.id) is None
+
+    def test_disabled_cache(self, test_user):
+        from app.auth import UserCache
+
+        user, _ = test_user
+        cache = UserCache(ttl=0)
+        cache.put(user)
+        assert cache.get(user.id) is None
@@ -1,6 +1,11 @@
 """Testes dos endpoints de jobs."""
 import io
+import json
+import shutil
 import uuid
+from datetime import datetime, timedelta
+import zipfile
+from pathlib import Path
 from unittest.mock import patch
 
 import pytest
@@ -34,12 +39,257 @@ class TestCreateJob:
             resp = client.post("/jobs", files=files, headers=auth_headers)
         assert resp.status_code == 413
 
+    def test_upload_too_large_removes_partial_file(self, client, auth_headers, tmp_path):
+        big_content = b"x" * (11 * 1024 * 1024)
+        files = {"file": ("big.csv", io.BytesIO(big_content), "text/csv")}
+        # Content-Length dentro da folga: o limite que vale é o da cópia em blocos
+        with patch("app.storage.UPLOADS_DIR", tmp_path), \
+                patch("app.routes_jobs.MULTIPART_OVERHEAD_BYTES", 2 * 1024 * 1024):
+            resp = client.post("/jobs", files=files, headers=auth_headers)
+        assert resp.status_code == 413
+        assert list(tmp_path.iterdir()) == []
+
+    def test_content_length_rejected_before_reading_body(self, client, auth_headers, tmp_path):
+        with patch("app.routes_jobs.save_upload_stream") as mock_save:
+            resp = client.post(
+                "/jobs",
+                content=b"x" * 1024,
+                headers={**auth_headers, "Content-Length": str(20 * 1024 * 1024),
+                         "Content-Type": "multipart/form-data; boundary=x"},
+            )
+        assert resp.status_code == 413
+        assert "10 MB" in resp.json()["detail"]
+        mock_save.assert_not_called()
+
+    def test_upload_saved_to_disk(self, client, auth_headers, db, tmp_path):
+        csv_content = b"Nome,Email\nJoao,joao@test.com"
+        files = {"file": ("contatos.csv", io.BytesIO(csv_content), "text/csv")}
+        with patch("app.storage.UPLOADS_DIR", tmp_path), patch("app.routes_jobs.queue"):
+            resp = client.post("/jobs", files=files, headers=auth_headers)
+        assert resp.status_code == 201
+        job = db.query(Job).filter(Job.id == resp.json()["id"]).first()
+        assert Path(job.file_path).read_bytes() == csv_content
+
     def test_upload_requires_auth(self, client):
         files = {"file": ("test.csv", io.BytesIO(b"data"), "text/csv")}
         resp = client.post("/jobs", files=files)
         assert resp.status_code == 401
 
 
+class TestUploadReuse:
+    def _upload(self, client, auth_headers, content):
+        files = {"file": ("contatos.csv", io.BytesIO(content), "text/csv")}
+        with patch("app.routes_jobs.queue") as mock_queue:
+            resp = client.post("/jobs", files=files, headers=auth_headers)
+        return resp, mock_queue
+
+    def test_same_content_reuses_done_job(self, client, auth_headers, db, tmp_path):
+        content = b"Nome,Email\nJoao,joao@test.com"
+        with patch("app.storage.UPLOADS_DIR", tmp_path / "uploads"), \
+                patch("app.storage.OUTPUTS_DIR", tmp_path / "outputs"), \
+                patch("app.storage.REPORTS_DIR", tmp_path / "reports"):
+            first, _ = self._upload(client, auth_headers, content)
+            job = db.query(Job).filter(Job.id == first.json()["id"]).first()
+            csv_path = tmp_path / "first.csv"
+            report_path = tmp_path / "first_report.json"
+            csv_path.write_text("Full Name\nJoao\n", encoding="utf-8")
+            report_path.write_text("{}", encoding="utf-8")
+            index_dir = tmp_path / "outputs" / f"{job.id}.rows"
+            index_dir.mkdir(parents=True)
+            (index_dir / "offsets.u64").write_bytes(b"\x00" * 16)
+            job.status = "done"
+            job.output_csv_path = str(csv_path)
+            job.report_json_path = str(report_path)
+            db.commit()
+
+            second, mock_queue = self._upload(client, auth_headers, content)
+
+        assert second.status_code == 201
+        assert second.json()["status"] == "done"
+        mock_queue.enqueue.assert_not_called()
+        reused = db.query(Job).filter(Job.id == second.json()["id"]).first()
+        assert reused.content_hash == job.content_hash
+        assert reused.file_path == job.file_path
+        assert Path(reused.output_csv_path).read_text(encoding="utf-8") == "Full Name\nJoao\n"
+        assert (tmp_path / "outputs" / f"{reused.id}.rows" / "offsets.u64").read_bytes() == b"\x00" * 16
+        assert len(list((tmp_path / "uploads").iterdir())) == 1
+
+    def test_failed_commit_removes_reused_artifacts(self, client, auth_headers, db, tmp_path):
+        from sqlalchemy.exc import OperationalError
+
+        content = b"Nome,Email\nJoao,joao@test.com"
+        dirs = {name: tmp_path / name for name in ("uploads", "outputs", "reports")}
+        with patch("app.storage.UPLOADS_DIR", dirs["uploads"]), \
+                patch("app.storage.OUTPUTS_DIR", dirs["outputs"]), \
+                patch("app.storage.REPORTS_DIR", dirs["reports"]):
+            first, _ = self._upload(client, auth_headers, content)
+            job = db.get(Job, first.json()["id"])
+            dirs["outputs"].mkdir()
+            dirs["reports"].mkdir()
+            job.output_csv_path = str(dirs["outputs"] / f"{job.id}.csv")
+            job.report_json_path = str(dirs["reports"] / f"{job.id}_report.json")
+            Path(job.output_csv_path).write_text("Full Name\nJoao\n", encoding="utf-8")
+            Path(job.report_json_path).write_text("{}", encoding="utf-8")
+            job.status = "done"
+            db.commit()
+            before = {name: sorted(p.name for p in d.iterdir()) for name, d in dirs.items()}
+
+            error = OperationalError("INSERT", {}, Exception("conexão perdida"))
+            with patch("sqlalchemy.orm.Session.commit", side_effect=error), \
+                    pytest.raises(OperationalError):
+                self._upload(client, auth_headers, content)
+
+        assert db.query(Job).count() == 1
+        assert {name: sorted(p.name for p in d.iterdir()) for name, d in dirs.items()} == before
+
+    def test_output_removed_while_linking_is_reprocessed(self, client, auth_headers, db, tmp_path):
+        from app import storage
+
+        content = b"Nome\nA"
+        with patch("app.storage.UPLOADS_DIR", tmp_path / "uploads"), \
+                patch("app.storage.OUTPUTS_DIR", tmp_path / "outputs"), \
+                patch("app.storage.REPORTS_DIR", tmp_path / "reports"):
+            first, _ = self._upload(client, auth_headers, content)
+            job = db.get(Job, first.json()["id"])
+            job.status = "done"
+            job.output_csv_path = str(tmp_path / "first.csv")
+            job.report_json_path = str(tmp_path / "first_report.json")
+            Path(job.output_csv_path).write_text("Full Name\nA\n", encoding="utf-8")
+            Path(job.report_json_path).write_text("{}", encoding="utf-8")
+            db.commit()
+
+            # O job anterior é apagado entre a checagem e o hard link do report
+            link = storage._link_or_copy
+
+            def _link_then_vanish(source, target):
+                if source.name.endswith("_report.json"):
+                    raise FileNotFoundError(source)
+                link(source, target)
+
+            with patch("app.storage._link_or_copy", _link_then_vanish):
+                resp, mock_queue = self._upload(client, auth_headers, content)
+
+        assert resp.status_code == 201
+        assert resp.json()["status"] == "queued"
+        mock_queue.enqueue.assert_called_once()
+        assert list((tmp_path / "outputs").iterdir()) == []
+
+    def test_different_content_is_enqueued(self, client, auth_headers, tmp_path):
+        with patch("app.storage.UPLOADS_DIR", tmp_path):
+            self._upload(client, auth_headers, b"Nome\nA")
+            resp, mock_queue = self._upload(client, auth_headers, b"Nome\nB")
+        assert resp.json()["status"] == "queued"
+        mock_queue.enqueue.assert_called_once()
+
+
+class TestBatchUpload:
+    def test_multiple_files(self, client, auth_headers, db, tmp_path):
+        files = [
+            ("files", ("a.csv", io.BytesIO(b"Nome\nA"), "text/csv")),
+            ("files", ("b.csv", io.BytesIO(b"Nome\nB"), "text/csv")),
+        ]
+        with patch("app.storage.UPLOADS_DIR", tmp_path), patch("app.routes_jobs.queue") as mock_queue:
+            resp = client.post("/jobs/batch", files=files, headers=auth_headers)
+        assert resp.status_code == 201
+        data = resp.json()
+        assert data["total"] == 2
+        assert [j["filename_original"] for j in data["jobs"]] == ["a.csv", "b.csv"]
+        assert all(j["status"] == "queued" for j in data["jobs"])
+        assert db.query(Job).count() == 2
+        mock_queue.enqueue_many.assert_called_once()
+        calls = mock_queue.enqueue_many.call_args.args[1]
+        assert [args for args, _ in calls] == [(j["id"],) for j in data["jobs"]]
+
+    def test_zip_with_spreadsheets(self, client, auth_headers, tmp_path):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as zf:
+            zf.writestr("lote/a.csv", "Nome\nA")
+            zf.writestr("lote/b.csv", "Nome\nB")
+            zf.writestr("lote/leia-me.txt", "ignorado")
+        files = [("files", ("lote.zip", io.BytesIO(buf.getvalue()), "application/zip"))]
+        with patch("app.storage.UPLOADS_DIR", tmp_path), patch("app.routes_jobs.queue"):
+            resp = client.post("/jobs/batch", files=files, headers=auth_headers)
+        assert resp.status_code == 201
+        assert [j["filename_original"] for j in resp.json()["jobs"]] == ["a.csv", "b.csv"]
+        assert len(list(tmp_path.iterdir())) == 2
+
+    def test_invalid_extension_rejects_batch(self, client, auth_headers, db, tmp_path):
+        files = [
+            ("files", ("a.csv", io.BytesIO(b"Nome\nA"), "text/csv")),
+            ("files", ("data.txt", io.BytesIO(b"hello"), "text/plain")),
+        ]
+        with patch("app.storage.UPLOADS_DIR", tmp_path):
+            resp = client.post("/jobs/batch", files=files, headers=auth_headers)
+        assert resp.status_code == 400
+        assert db.query(Job).count() == 0
+        assert list(tmp_path.iterdir()) == []
+
+    def test_too_many_files_removes_saved_uploads(self, client, auth_headers, db, tmp_path):
+        files = [("files", (f"{i}.csv", io.BytesIO(f"Nome\n{i}".encode()), "text/csv")) for i in range(3)]
+        with patch("app.storage.UPLOADS_DIR", tmp_path), patch("app.routes_jobs.BATCH_MAX_FILES", 2):
+            resp = client.post("/jobs/batch", files=files, headers=auth_headers)
+        assert resp.status_code == 400
+        assert db.query(Job).count() == 0
+        assert list(tmp_path.iterdir()) == []
+
+    def test_encrypted_zip_member_rejects_batch(self, client, auth_headers, db, tmp_path):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as zf:
+            zf.writestr("a.csv", "Nome\nA")
+            zf.writestr("b.csv", "Nome\nB")
+        # Marca o último membro como criptografado (zipfile não escreve membros criptografados)
+        data = bytearray(buf.getvalue())
+        for signature, flag_offset in ((b"PK\x03\x04", 6), (b"PK\x01\x02", 8)):
+            data[data.rfind(signature) + flag_offset] |= 0x1
+        files = [("files", ("lote.zip", io.BytesIO(bytes(data)), "application/zip"))]
+        with patch("app.storage.UPLOADS_DIR", tmp_path):
+            resp = client.post("/jobs/batch", files=files, headers=auth_headers)
+        assert resp.status_code == 400
+        assert db.query(Job).count() == 0
+        assert list(tmp_path.iterdir()) == []
+
+    def test_rejected_batch_removes_reused_artifacts(self, client, auth_headers, db, tmp_path):
+        dirs = {name: tmp_path / name for name in ("uploads", "outputs", "reports")}
+        with patch("app.storage.UPLOADS_DIR", dirs["uploads"]), \
+                patch("app.storage.OUTPUTS_DIR", dirs["outputs"]), \
+                patch("app.storage.REPORTS_DIR", dirs["reports"]), \
+                patch("app.routes_jobs.queue"):
+            first = client.post(
+                "/jobs/batch", files=[("files", ("a.csv", io.BytesIO(b"Nome\nA"), "text/csv"))], headers=auth_headers
+            )
+            job = db.get(Job, first.json()["jobs"][0]["id"])
+            dirs["outputs"].mkdir()
+            dirs["reports"].mkdir()
+            job.output_csv_path = str(dirs["outputs"] / f"{job.id}.csv")
+            job.report_json_path = str(dirs["reports"] / f"{job.id}_report.json")
+            Path(job.output_csv_path).write_text("Full Name\nA\n", encoding="utf-8")
+            Path(job.report_json_path).write_text("{}", encoding="utf-8")
+            (dirs["reports"] / f"{job.id}_preview.json").write_text("[]", encoding="utf-8")
+            (dirs["outputs"] / f"{job.id}.rows").mkdir()
+            (dirs["outputs"] / f"{job.id}.rows" / "offsets.u64").write_bytes(b"\x00" * 8)
+            job.status = "done"
+            db.commit()
+            before = {name: sorted(p.name for p in d.iterdir()) for name, d in dirs.items()}
+
+            # a.csv é reaproveitado (hard links) antes de o lote estourar o limite
+            files = [
+                ("files", ("a.csv", io.BytesIO(b"Nome\nA"), "text/csv")),
+                ("files", ("b.csv", io.BytesIO(b"Nome\nB"), "text/csv")),
+                ("files", ("c.csv", io.BytesIO(b"Nome\nC"), "text/csv")),
+            ]
+            with patch("app.routes_jobs.BATCH_MAX_FILES", 2):
+                resp = client.post("/jobs/batch", files=files, headers=auth_headers)
+
+        assert resp.status_code == 400
+        assert db.query(Job).count() == 1
+        assert {name: sorted(p.name for p in d.iterdir()) for name, d in dirs.items()} == before
+
+    def test_batch_requires_auth(self, client):
+        files = [("files", ("a.csv", io.BytesIO(b"Nome\nA"), "text/csv"))]
+        resp = client.post("/jobs/batch", files=files)
+        assert resp.status_code == 401
+
+
 class TestGetJob:
     def test_get_job_success(self, client, auth_headers, db, test_user):
         user, _ = test_user
@@ -129,6 +379,46 @@ class TestListJobs:
         assert data["total"] == 3
         assert len(data["jobs"]) == 3
 
+    def test_list_cursor_pagination(self, client, auth_headers, db, test_user):
+        user, _ = test_user
+        created = datetime(2024, 1, 1)
+        for i in range(5):
+            db.add(Job(
+                id=str(uuid.uuid4()),
+                user_id=user.id,
+                status="done",
+                filename_original=f"file{i}.csv",
+                file_path=f"/tmp/file{i}.csv",
+                # Dois jobs com o mesmo created_at: o id desempata
+                created_at=created + timedelta(minutes=min(i, 3)),
+            ))
+        db.commit()
+
+        seen = []
+        resp = client.get("/jobs?cursor=&limit=2", headers=auth_headers)
+        while True:
+            assert resp.status_code == 200
+            data = resp.json()
+            assert data["total"] is None
+            seen.extend(j["filename_original"] for j in data["jobs"])
+            if not data["next_cursor"]:
+                break
+            resp = client.get(f"/jobs?cursor={data['next_cursor']}&limit=2", headers=auth_headers)
+
+        expected = client.get("/jobs?limit=5", headers=auth_headers).json()
+        assert seen == [j["filename_original"] for j in expected["jobs"]]
+        assert len(set(seen)) == 5
+        assert expected["total"] == 5
+        assert expected["next_cursor"] is None
+
+    def test_list_cursor_with_total(self, client, auth_headers):
+        resp = client.get("/jobs?cursor=&include_total=true", headers=auth_headers)
+        assert resp.json()["total"] == 0
+
+    def test_list_invalid_cursor(self, client, auth_headers):
+        resp = client.get("/jobs?cursor=nao-e-um-cursor", headers=auth_headers)
+        assert resp.status_code == 400
+
     def test_list_requires_auth(self, client):
         resp = client.get("/jobs")
         assert resp.status_code == 401
@@ -182,3 +472,440 @@ class TestJobPreviewDownloadReport:
 
         resp = client.get(f"/jobs/{job_id}/report", headers=auth_headers)
         assert resp.status_code == 409
+
+
+class TestCompressedDownload:
+    CSV = "\ufeffFull Name,Email\nJoao,joao@test.com\n"
+
+    def _done_job(self, make_job):
+        import gzip
+
+        return make_job(output=gzip.compress(self.CSV.encode("utf-8")), output_suffix=".csv.gz")
+
+    def test_gzip_passthrough(self, client, auth_headers, make_job):
+        job_id = self._done_job(make_job)
+        resp = client.get(f"/jobs/{job_id}/download", headers={**auth_headers, "Accept-Encoding": "gzip"})
+        assert resp.status_code == 200
+        assert resp.headers["content-encoding"] == "gzip"
+        assert resp.content.decode("utf-8") == self.CSV
+        assert 'filename="ghl_import_' in resp.headers["content-disposition"]
+
+    def test_decompressed_without_gzip(self, client, auth_headers, make_job):
+        job_id = self._done_job(make_job)
+        resp = client.get(f"/jobs/{job_id}/download", headers={**auth_headers, "Accept-Encoding": "identity"})
+        assert resp.status_code == 200
+        assert "content-encoding" not in resp.headers
+        assert resp.content.decode("utf-8") == self.CSV
+
+
+class TestJobRows:
+    def _processed_job(self, make_job, suffix=".csv"):
+        lines = ["Nome,Email,Telefone"]
+        for i in range(30):
+            email = f"user{i}@test.com" if i % 3 else ""
+            phone = f"8599999{i:04d}" if i % 5 else ""
+            lines.append(f"Contato {i},{email},{phone}")
+        return make_job(input_csv="\n".join(lines) + "\n", output_suffix=suffix)
+
+    @pytest.mark.parametrize("suffix", [".csv", ".csv.gz"])
+    def test_pages(self, client, auth_headers, make_job, suffix):
+        job_id = self._processed_job(make_job, suffix)
+        resp = client.get(f"/jobs/{job_id}/rows?offset=10&limit=5", headers=auth_headers)
+        last = client.get(f"/jobs/{job_id}/rows?offset=28&limit=5", headers=auth_headers).json()
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["total"] == 30
+        assert data["next_offset"] == 15
+        assert [r["row"] for r in data["rows"]] == [10, 11, 12, 13, 14]
+        assert data["rows"][0]["data"]["Full Name"] == "Contato 10"
+        assert data["rows"][1]["data"]["Email"] == "user11@test.com"
+        assert [r["row"] for r in last["rows"]] == [28, 29]
+        assert last["next_offset"] is None
+
+    def test_filter(self, client, auth_headers, make_job):
+        job_id = self._processed_job(make_job)
+        data = client.get(f"/jobs/{job_id}/rows?filter=missing_phone", headers=auth_headers).json()
+        emails = client.get(f"/jobs/{job_id}/rows?filter=missing_email&offset=2&limit=2", headers=auth_headers).json()
+        assert data["total"] == 6
+        assert [r["row"] for r in data["rows"]] == [0, 5, 10, 15, 20, 25]
+        assert all(r["data"]["Phone"] == "" for r in data["rows"])
+        assert emails["total"] == 10
+        assert [r["row"] for r in emails["rows"]] == [6, 9]
+
+    def test_etag_not_modified(self, client, auth_headers, make_job):
+        job_id = self._processed_job(make_job)
+        first = client.get(f"/jobs/{job_id}/rows", headers=auth_headers)
+        again = client.get(
+            f"/jobs/{job_id}/rows", headers={**auth_headers, "If-None-Match": first.headers["etag"]}
+        )
+        other_page = client.get(
+            f"/jobs/{job_id}/rows?offset=5", headers={**auth_headers, "If-None-Match": first.headers["etag"]}
+        )
+        assert again.status_code == 304
+        assert other_page.status_code == 200
+
+    def test_invalid_params(self, client, auth_headers, make_job):
+        job_id = self._processed_job(make_job)
+        assert client.get(f"/jobs/{job_id}/rows?filter=nope", headers=auth_headers).status_code == 422
+        assert client.get(f"/jobs/{job_id}/rows?limit=100000", headers=auth_headers).status_code == 422
+        assert client.get(f"/jobs/{job_id}/rows?offset=-1", headers=auth_headers).status_code == 422
+
+    def test_not_done(self, client, auth_headers, make_job):
+        job_id = make_job(status="queued")
+        assert client.get(f"/jobs/{job_id}/rows", headers=auth_headers).status_code == 409
+
+    def test_missing_index(self, client, auth_headers, make_job, storage_dirs):
+        job_id = self._processed_job(make_job)
+        # Job processado antes do índice existir: só o CSV
+        shutil.rmtree(storage_dirs["outputs"] / f"{job_id}.rows")
+        resp = client.get(f"/jobs/{job_id}/rows", headers=auth_headers)
+        assert resp.status_code == 404
+
+    def test_delete_removes_index(self, client, auth_headers, make_job, storage_dirs):
+        job_id = self._processed_job(make_job)
+        index_dir = storage_dirs["outputs"] / f"{job_id}.rows"
+        assert index_dir.is_dir()
+        assert client.delete(f"/jobs/{job_id}", headers=auth_headers).status_code == 204
+        assert not index_dir.exists()
+
+
+class TestParquetDownload:
+    def test_parquet_download(self, client, auth_headers, make_job, storage_dirs):
+        job_id = make_job(output=b"Full Name\n")
+        (storage_dirs["outputs"] / f"{job_id}.parquet").write_bytes(b"PAR1 fake PAR1")
+        resp = client.get(f"/jobs/{job_id}/download?format=parquet", headers=auth_headers)
+        assert resp.status_code == 200
+        assert resp.headers["content-type"] == "application/vnd.apache.parquet"
+        assert f'filename="ghl_import_{job_id}.parquet"' in resp.headers["content-disposition"]
+        assert resp.content == b"PAR1 fake PAR1"
+
+    def test_parquet_missing(self, client, auth_headers, make_job):
+        job_id = make_job(output=b"Full Name\n")
+        resp = client.get(f"/jobs/{job_id}/download?format=parquet", headers=auth_headers)
+        assert resp.status_code == 404
+
+    def test_invalid_format(self, client, auth_headers, make_job):
+        job_id = make_job(output=b"Full Name\n")
+        resp = client.get(f"/jobs/{job_id}/download?format=xml", headers=auth_headers)
+        assert resp.status_code == 422
+
+
+class TestArtifactCaching:
+    CSV = b"\xef\xbb\xbfFull Name,Email\nJoao,joao@test.com\nMaria,maria@test.com\n"
+
+    def _done_job(self, make_job):
+        return make_job(output=self.CSV, report=b'{\n  "total_rows": 2\n}')
+
+    def test_report_raw_passthrough_and_304(self, client, auth_headers, make_job):
+        job_id = self._done_job(make_job)
+        resp = client.get(f"/jobs/{job_id}/report", headers=auth_headers)
+        assert resp.status_code == 200
+        assert resp.text == '{\n  "total_rows": 2\n}'
+        assert resp.json() == {"total_rows": 2}
+        etag = resp.headers["etag"]
+        assert resp.headers["last-modified"]
+
+        again = client.get(f"/jobs/{job_id}/report", headers={**auth_headers, "If-None-Match": etag})
+        assert again.status_code == 304
+        assert again.content == b""
+
+        modified = client.get(
+            f"/jobs/{job_id}/report",
+            headers={**auth_headers, "If-Modified-Since": resp.headers["last-modified"]},
+        )
+        assert modified.status_code == 304
+
+    def test_download_range_resume(self, client, auth_headers, make_job):
+        job_id = self._done_job(make_job)
+        full = client.get(f"/jobs/{job_id}/download", headers=auth_headers)
+        assert full.headers["accept-ranges"] == "bytes"
+
+        resp = client.get(
+            f"/jobs/{job_id}/download",
+            headers={**auth_headers, "Range": "bytes=10-", "If-Range": full.headers["etag"]},
+        )
+        assert resp.status_code == 206
+        assert resp.content == self.CSV[10:]
+        assert resp.headers["content-range"] == f"bytes 10-{len(self.CSV) - 1}/{len(self.CSV)}"
+
+        tail = client.get(f"/jobs/{job_id}/download", headers={**auth_headers, "Range": "bytes=-5"})
+        assert tail.content == self.CSV[-5:]
+
+    def test_download_range_stale_if_range(self, client, auth_headers, make_job):
+        job_id = self._done_job(make_job)
+        resp = client.get(
+            f"/jobs/{job_id}/download",
+            headers={**auth_headers, "Range": "bytes=10-", "If-Range": '"outra-versao"'},
+        )
+        assert resp.status_code == 200
+        assert resp.content == self.CSV
+
+    def test_download_range_not_satisfiable(self, client, auth_headers, make_job):
+        job_id = self._done_job(make_job)
+        resp = client.get(f"/jobs/{job_id}/download", headers={**auth_headers, "Range": "bytes=9999-"})
+        assert resp.status_code == 416
+        assert resp.headers["content-range"] == f"bytes */{len(self.CSV)}"
+
+
+class TestProcessJobProgress:
+    def test_default_config_publishes_progress_per_shard(self, make_job):
+        from app import config
+
+        # Configuração padrão: sem streaming (arquivo lido de uma vez) e um processo só
+        assert config.STREAM_CHUNK_ROWS == 0 and config.PROCESSING_WORKERS == 1
+        rows = config.SHARD_ROWS * 2 + 10
+        events = []
+        with patch("app.progress.publish_progress", lambda job_id, phase, **f: events.append((phase, f))):
+            make_job(input_csv="Nome,Telefone\n" + "".join(f"Contato {i},85999{i:06d}\n" for i in range(rows)))
+
+        processing = [f for phase, f in events if phase == "processing"]
+        assert [f["rows_processed"] for f in processing] == [config.SHARD_ROWS, config.SHARD_ROWS * 2, rows]
+        # Estimativa por amostra do começo do arquivo (estimate_rows)
+        assert all(abs(f["total_rows_estimate"] - rows) < rows * 0.05 for f in processing)
+        assert processing[0]["eta_seconds"] > processing[-1]["eta_seconds"]
+        assert events[-1][0] == "done"
+
+
+class TestJobEvents:
+    def test_events_for_finished_job(self, client, auth_headers, db, test_user):
+        user, _ = test_user
+        job_id = str(uuid.uuid4())
+        job = Job(
+            id=job_id,
+            user_id=user.id,
+            status="done",
+            filename_original="test.csv",
+            file_path="/tmp/test.csv",
+        )
+        db.add(job)
+        db.commit()
+
+        resp = client.get(f"/jobs/{job_id}/events", headers=auth_headers)
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/event-stream")
+        assert resp.text.startswith("event: progress\ndata: ")
+        assert '"phase": "done"' in resp.text
+
+    def test_events_requires_auth(self, client):
+        resp = client.get(f"/jobs/{uuid.uuid4()}/events")
+        assert resp.status_code == 401
+
+    class _FakePubSub:
+        """pubsub do redis.asyncio sem eventos publicados (worker morto ou publish perdido)."""
+
+        async def subscribe(self, channel):
+            pass
+
+        async def get_message(self, ignore_subscribe_messages=True, timeout=None):
+            return None
+
+        async def aclose(self):
+            pass
+
+    class _FakeRedis:
+        def __init__(self, snapshot=None):
+            self.snapshot = snapshot
+
+        def pubsub(self):
+            return TestJobEvents._FakePubSub()
+
+        async def get(self, key):
+            return self.snapshot
+
+        async def aclose(self):
+            pass
+
+    def _collect(self, **kwargs):
+        import asyncio
+
+        from app.progress import iter_progress_events
+
+        async def run():
+            return [event async for event in iter_progress_events("job-1", heartbeat=0, **kwargs)]
+
+        with patch("app.progress._get_async_redis", lambda: self._FakeRedis()):
+            return asyncio.run(run())
+
+    def test_stream_closes_on_final_status_in_db(self):
+        statuses = iter([("processing", None), ("failed", "worker morreu")])
+
+        async def job_status():
+            return next(statuses)
+
+        events = self._collect(job_status=job_status)
+        assert events[0] == ": ping\n\n"
+        assert events[-1].startswith("event: progress\n")
+        assert '"phase": "failed"' in events[-1]
+        assert "worker morreu" in events[-1]
+
+    def test_stream_closes_when_job_deleted(self):
+        async def job_status():
+            return None, None
+
+        assert self._collect(job_status=job_status) == []
+
+    def test_stream_max_lifetime(self):
+        async def job_status():
+            return "processing", None
+
+        events = self._collect(job_status=job_status, max_seconds=0.05)
+        assert events
+        assert set(events) == {": ping\n\n"}
+
+    def test_retry_clears_progress_snapshot(self, client, auth_headers, db, test_user):
+        user, _ = test_user
+        job_id = str(uuid.uuid4())
+        db.add(Job(id=job_id, user_id=user.id, status="failed", filename_original="a.csv", file_path="/tmp/a.csv"))
+        db.commit()
+        with patch("app.routes_jobs.queue"), patch("app.routes_jobs.clear_progress") as mock_clear:
+            resp = client.post(f"/jobs/{job_id}/retry", headers=auth_headers)
+        assert resp.status_code == 202
+        mock_clear.assert_called_once_with(job_id)
+
+    def test_clear_progress_deletes_snapshot(self):
+        from unittest.mock import MagicMock
+
+        from app import progress
+
+        redis = MagicMock()
+        with patch("app.progress.TESTING", False), patch("app.progress._get_redis", return_value=redis):
+            progress.clear_progress("a", "b")
+        redis.delete.assert_called_once_with("job:a:progress", "job:b:progress")
+
+
+class TestHealthWorkers:
+    def test_health_workers(self, client):
+        resp = client.get("/health/workers")
+        assert resp.status_code == 200
+        assert resp.json() == {"status": "ok", "count": 0, "workers": []}
+
+
+class TestDbPool:
+    def test_health_db_pool(self, client):
+        resp = client.get("/health/db/pool")
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["status"] == "ok"
+        assert {"checkouts", "connects", "wait_seconds_avg", "wait_seconds_max"} <= set(data)
+
+    def test_timed_pool_records_checkouts(self, tmp_path):
+        from sqlalchemy import create_engine, text
+
+        from app.db import _TimedQueuePool, pool_stats
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=_TimedQueuePool, pool_size=1)
+        before = pool_stats.checkouts
+        for _ in range(3):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+        engine.dispose()
+        assert pool_stats.checkouts == before + 3
+        assert pool_stats.wait_seconds_max >= 0
+
+
+class TestMigrations:
+    def test_adds_missing_columns_and_indexes(self, tmp_path):
+        from sqlalchemy import create_engine, inspect, text
+
+        from app import db as app_db
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE jobs (id VARCHAR(36) PRIMARY KEY, status VARCHAR(20))"))
+        with patch.object(app_db, "engine", engine):
+            added = app_db.migrate()
+            # Segunda execução (outro processo subindo) não tem nada a fazer
+            assert app_db.migrate() == []
+
+        insp = inspect(engine)
+        job_columns = {c["name"] for c in insp.get_columns("jobs")}
+        assert "jobs.content_hash" in added and "content_hash" in job_columns
+        assert {ix.name for ix in Job.__table__.indexes} <= {ix["name"] for ix in insp.get_indexes("jobs")}
+        assert insp.has_table("users")
+        engine.dispose()
+
+
+class TestMetricsEndpoint:
+    def test_metrics_prometheus_text(self, client):
+        resp = client.get("/metrics")
+        assert resp.status_code == 200
+        assert resp.headers["content-type"].startswith("text/plain")
+        assert "# TYPE flowbase_job_phase_seconds histogram" in resp.text
+        assert "flowbase_db_pool_checkouts_total" in resp.text
+
+    def test_process_job_stores_phase_metrics(self, db, test_user, tmp_path):
+        from tests.conftest import TestSessionLocal
+
+        from app.processing import process_job
+
+        user, _ = test_user
+        src = tmp_path / "in.csv"
+        src.write_text("Nome,Email\nJoao,joao@test.com\n", encoding="utf-8")
+        job_id = str(uuid.uuid4())
+        db.add(Job(id=job_id, user_id=user.id, status="queued", filename_original="in.csv", file_path=str(src)))
+        db.commit()
+        with patch("app.processing.SessionLocal", TestSessionLocal), \
+                patch("app.processing.OUTPUTS_DIR", tmp_path), \
+                patch("app.storage.OUTPUTS_DIR", tmp_path), \
+                patch("app.processing.REPORTS_DIR", tmp_path):
+            process_job(job_id)
+
+        db.expire_all()
+        job = db.get(Job, job_id)
+        assert job.status == "done"
+        phases = json.loads(job.metrics_json)
+        assert {"setup", "read", "normalize", "write_csv", "report"} <= set(phases)
+        report = json.loads(Path(job.report_json_path).read_text(encoding="utf-8"))
+        assert "normalize" in report["phases"]
+
+
+class TestQueueClassification:
+    def test_small_upload_goes_to_small_queue(self, client, auth_headers, tmp_path):
+        files = {"file": ("contatos.csv", io.BytesIO(b"Nome\nJoao"), "text/csv")}
+        with patch("app.storage.UPLOADS_DIR", tmp_path), patch("app.routes_jobs.queue") as mock_queue:
+            client.post("/jobs", files=files, headers=auth_headers)
+        assert mock_queue.enqueue.call_args.kwargs["job_class"] == "small"
+
+    def test_estimate_is_stored_and_not_recomputed(self, client, auth_headers, db, tmp_path):
+        content = b"Nome\n" + b"".join(f"Contato {i}\n".encode() for i in range(30))
+        files = {"file": ("contatos.csv", io.BytesIO(content), "text/csv")}
+        with patch("app.storage.UPLOADS_DIR", tmp_path), patch("app.routes_jobs.queue"):
+            resp = client.post("/jobs", files=files, headers=auth_headers)
+        job = db.get(Job, resp.json()["id"])
+        assert (job.file_size, job.rows_estimate) == (len(content), 30)
+
+        # Reenfileirar classifica pelo que foi guardado, sem abrir o upload de novo
+        from app.routes_jobs import _job_class
+        with patch("app.routes_jobs.estimate_rows") as mock_estimate:
+            assert _job_class(job, 0) == "small"
+        mock_estimate.assert_not_called()
+
+    def test_classify_by_size_and_rows(self):
+        from app.queue_rq import classify_job
+        assert classify_job(1024, 10) == "small"
+        assert classify_job(50 * 1024 * 1024, None) == "large"
+        assert classify_job(1024, 1_000_000) == "large"
+
+    def test_user_over_fair_share_goes_to_bulk(self, client, auth_headers, db, test_user, tmp_path):
+        user, _ = test_user
+        for i in range(3):
+            db.add(Job(
+                id=str(uuid.uuid4()),
+                user_id=user.id,
+                status="queued",
+                filename_original=f"file{i}.csv",
+                file_path=f"/tmp/file{i}.csv",
+            ))
+        db.commit()
+        files = {"file": ("contatos.csv", io.BytesIO(b"Nome\nJoao"), "text/csv")}
+        with patch("app.storage.UPLOADS_DIR", tmp_path), patch("app.routes_jobs.queue") as mock_queue:
+            client.post("/jobs", files=files, headers=auth_headers)
+        assert mock_queue.enqueue.call_args.kwargs["job_class"] == "bulk"
+
+    def test_parse_queue_weights(self):
+        from app.queue_rq import parse_queue_weights
+        assert parse_queue_weights("small=5, large=2") == {"small": 5.0, "large": 2.0, "bulk": 1.0}
+
+    def test_health_queues(self, client):
+        resp = client.get("/health/queues")
+        assert resp.json() == {"status": "ok", "queues": []}
@@ -10,6 +10,12 @@ from app.processing import (
     _find_column_mapping,
     process_to_ghl,
     GHL_COLUMNS,
+    PhoneCache,
+    estimate_rows,
+    invalid_phone_mask,
+    iter_csv_chunks_arrow,
+    read_file_chunks,
+    write_ghl_csv,
 )
 
 
@@ -55,6 +61,36 @@ class TestNormalizePhone:
         assert _normalize_phone(None) == ""
 
 
+class TestPhoneCache:
+    def test_hits_and_misses(self):
+        cache = PhoneCache()
+        assert _normalize_phone("85999991234", cache=cache) == "+5585999991234"
+        assert _normalize_phone("(85) 99999-1234", cache=cache) == "+5585999991234"
+        assert cache.hits == 1
+        assert cache.misses == 1
+
+    def test_invalid_number_cached_keeps_original(self):
+        cache = PhoneCache()
+        assert _normalize_phone("123", cache=cache) == "123"
+        assert _normalize_phone(" 123 ", cache=cache) == "123"
+        assert cache.hits == 1
+
+    def test_bounded_lru(self):
+        cache = PhoneCache(maxsize=2)
+        for p in ["85999991234", "85988881234", "85977771234"]:
+            _normalize_phone(p, cache=cache)
+        assert len(cache) == 2
+        _normalize_phone("85999991234", cache=cache)
+        assert cache.hits == 0
+
+    def test_process_to_ghl_with_cache(self):
+        df = pd.DataFrame({"Telefone": ["85999991234", "85999991234"], "Telefones": ["85999991234", ""]})
+        cache = PhoneCache()
+        result = process_to_ghl(df, engine="rowwise", phone_cache=cache)
+        assert list(result["Phone"]) == ["+5585999991234", "+5585999991234"]
+        assert cache.stats()["hits"] == 2
+
+
 class TestNormalizePhonesField:
     def test_multiple_phones(self):
         result = _normalize_phones_field("85999991234;85988881234")
@@ -140,3 +176,420 @@ class TestProcessToGhl:
         result = process_to_ghl(df)
         for col in GHL_COLUMNS:
             assert col in result.columns
+
+
+class TestProcessEngines:
+    def _frame(self):
+        return pd.DataFrame({
+            "Nome": ["João Silva", " Ana ", None, "0"],
+            "E-mail": ["A@B.com; c@d.com", "x", None, "a@b.com a@b.com"],
+            "Telefone": ["85999991234", "(85) 9999-1234", "abc", None],
+            "Notas": ["| nota |", "", None, "ok"],
+            "CPF": ["123", " ", None, "0"],
+            "Idade": [1, 2, None, 0],
+        })
+
+    def test_vectorized_matches_rowwise_csv(self):
+        df = self._frame()
+        rowwise = process_to_ghl(df, engine="rowwise").to_csv(index=False)
+        vectorized = process_to_ghl(df, engine="vectorized").to_csv(index=False)
+        assert vectorized == rowwise
+
+    def test_numeric_only_frame_matches_rowwise(self):
+        # iterrows faz upcast int -> float quando todas as colunas são numéricas
+        df = pd.DataFrame({"Telefone": [85999991234, 0], "Score": [1.5, None]})
+        rowwise = process_to_ghl(df, engine="rowwise").to_csv(index=False)
+        vectorized = process_to_ghl(df, engine="vectorized").to_csv(index=False)
+        assert vectorized == rowwise
+
+    def test_empty_dataframe_vectorized(self):
+        df = pd.DataFrame(columns=["Nome", "Email", "CPF"])
+        result = process_to_ghl(df, engine="vectorized")
+        assert len(result) == 0
+        assert list(result.columns) == GHL_COLUMNS
+
+    def test_invalid_engine(self):
+        with pytest.raises(ValueError):
+            process_to_ghl(pd.DataFrame({"Nome": ["Test"]}), engine="nope")
+
+
+class TestStreamingCsv:
+    def _write_input(self, tmp_path, rows=25):
+        lines = ["Nome,Email,Telefone,CPF"]
+        for i in range(rows):
+            email = f"user{i}@test.com" if i % 3 else ""
+            lines.append(f"Contato {i},{email},8599999{i:04d},{i}")
+        path = tmp_path / "input.csv"
+        path.write_text("\n".join(lines), encoding="utf-8")
+        return path
+
+    def test_chunks_match_single_pass(self, tmp_path):
+        src = self._write_input(tmp_path)
+        single = tmp_path / "single.csv"
+        chunked = tmp_path / "chunked.csv"
+        write_ghl_csv(read_file_chunks(str(src)), single)
+        result = write_ghl_csv(read_file_chunks(str(src), chunksize=7), chunked)
+        assert chunked.read_bytes() == single.read_bytes()
+        assert chunked.read_bytes().startswith(b"\xef\xbb\xbf")
+        assert result["total_rows"] == 25
+        assert result["rows_output"] == 25
+        assert result["with_email"] == 16
+        assert result["with_phone"] == 25
+        assert len(result["preview"]) == 20
+
+    def test_gzip_output_matches_plain(self, tmp_path):
+        import gzip
+
+        src = self._write_input(tmp_path)
+        plain = tmp_path / "out.csv"
+        compressed = tmp_path / "out.csv.gz"
+        write_ghl_csv(read_file_chunks(str(src), chunksize=7), plain)
+        write_ghl_csv(read_file_chunks(str(src), chunksize=7), compressed)
+        assert gzip.decompress(compressed.read_bytes()) == plain.read_bytes()
+
+    def test_report_metrics_accumulated(self, tmp_path):
+        path = tmp_path / "in.csv"
+        path.write_text(
+            "Nome,Email,Telefone\n"
+            "Ana,ana@test.com,85999991234\n"
+            "Bia,ANA@test.com,123\n"
+            "Caio,,\n"
+            "Davi,davi@test.com,85999994321\n",
+            encoding="utf-8",
+        )
+        result = write_ghl_csv(read_file_chunks(str(path), chunksize=2), tmp_path / "out.csv")
+        assert result["with_email"] == 3
+        assert result["with_phone"] == 3
+        assert result["invalid_phones"] == 1
+        assert result["duplicate_emails"] == 1
+        assert result["fill_rates"]["Full Name"] == 100.0
+        assert result["fill_rates"]["Email"] == 75.0
+        assert result["fill_rates"]["Website"] == 0
+
+    def test_invalid_phone_mask(self):
+        phones = pd.Series([
+            "+55 11 1234",  # começa com "+" mas não foi convertido
+            "123",
+            "+5585999991234",
+            "+5585999991234, 123",
+            "+5585999991234, +13055550123",
+            "",
+        ])
+        assert invalid_phone_mask(phones).tolist() == [True, True, False, True, False, False]
+
+    def test_report_counts_unparseable_plus_phone(self, tmp_path):
+        path = tmp_path / "in.csv"
+        path.write_text(
+            "Nome,Telefone\n"
+            '"Ana","+55 11 1234"\n'
+            "Bia,123\n"
+            "Caio,85999991234\n",
+            encoding="utf-8",
+        )
+        result = write_ghl_csv(read_file_chunks(str(path), chunksize=2), tmp_path / "out.csv")
+        assert result["invalid_phones"] == 2
+
+    def test_latin1_detected(self, tmp_path):
+        path = tmp_path / "latin.csv"
+        path.write_bytes("Nome,Cidade\nJoão,São Paulo\n".encode("latin-1"))
+        chunks = list(read_file_chunks(str(path), chunksize=1))
+        assert chunks[0].iloc[0]["Nome"] == "João"
+
+    def test_header_only_writes_header(self, tmp_path):
+        path = tmp_path / "empty.csv"
+        path.write_text("Nome,Email\n", encoding="utf-8")
+        out = tmp_path / "out.csv"
+        result = write_ghl_csv(read_file_chunks(str(path), chunksize=10), out)
+        assert result["rows_output"] == 0
+        assert out.read_text(encoding="utf-8-sig").strip() == ",".join(GHL_COLUMNS)
+
+    def test_missing_file(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            read_file_chunks(str(tmp_path / "nope.csv"), chunksize=10)
+
+    def test_estimate_rows(self, tmp_path):
+        src = self._write_input(tmp_path)
+        assert estimate_rows(str(src)) == 25
+        assert estimate_rows(str(tmp_path / "nope.csv")) is None
+
+    def test_estimate_rows_reads_only_a_sample(self, tmp_path):
+        src = tmp_path / "grande.csv"
+        from unittest.mock import patch
+
+        line = b"Contato,contato@example.com\n"
+        src.write_bytes(b"Nome,Email\n" + line * 10_000)
+        with patch("app.processing.ESTIMATE_SAMPLE_BYTES", 4096):
+            estimate = estimate_rows(str(src))
+        assert abs(estimate - 10_000) <= 100
+
+    def test_estimate_rows_xlsx_dimension(self, tmp_path):
+        from openpyxl import Workbook
+
+        wb = Workbook()
+        ws = wb.active
+        ws.append(["Nome", "Email"])
+        for i in range(40):
+            ws.append([f"Contato {i}", f"c{i}@example.com"])
+        wb.create_sheet("Outra").append(["x"])
+        wb.save(tmp_path / "contatos.xlsx")
+        assert estimate_rows(str(tmp_path / "contatos.xlsx")) == 40
+
+    def test_progress_callback(self, tmp_path):
+        src = self._write_input(tmp_path)
+        seen = []
+        write_ghl_csv(read_file_chunks(str(src), chunksize=10), tmp_path / "out.csv", on_progress=seen.append)
+        assert seen == [10, 20, 25]
+
+
+class TestPyarrowCsv:
+    """CSV_ENGINE=pyarrow e PARQUET_OUTPUT (só rodam com o pyarrow instalado)."""
+
+    def _write_input(self, tmp_path):
+        path = tmp_path / "input.csv"
+        path.write_text(
+            "Nome,Email,,Email,Telefone\n"
+            'Ana,ana@test.com,NA,"a@x.com, b@x.com",85999991234\n'
+            "null,,x,,N/A\n"
+            + "".join(f"Contato {i},c{i}@test.com,,,8599999{i:04d}\n" for i in range(20)),
+            encoding="utf-8-sig",
+        )
+        return path
+
+    def test_matches_c_engine(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        src = self._write_input(tmp_path)
+        expected = pd.concat(pd.read_csv(src, encoding="utf-8", dtype=str, chunksize=5))
+        chunks = list(iter_csv_chunks_arrow(str(src), 5))
+        assert [len(c) for c in chunks] == [5, 5, 5, 5, 2]
+        assert str(chunks[0]["Nome"].dtype) == "string"
+        got = pd.concat(chunks, ignore_index=True)
+        assert list(got.columns) == list(expected.columns) == ["Nome", "Email", "Unnamed: 2", "Email.1", "Telefone"]
+        assert got.isna().equals(expected.reset_index(drop=True).isna())
+
+        c_out, arrow_out = tmp_path / "c.csv", tmp_path / "arrow.csv"
+        write_ghl_csv(read_file_chunks(str(src), chunksize=5), c_out)
+        write_ghl_csv(iter_csv_chunks_arrow(str(src), 5), arrow_out)
+        assert arrow_out.read_bytes() == c_out.read_bytes()
+
+    def test_read_file_chunks_uses_engine(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        from unittest.mock import patch
+
+        src = self._write_input(tmp_path)
+        with patch("app.processing.CSV_ENGINE", "pyarrow"):
+            chunks = list(read_file_chunks(str(src), chunksize=10))
+        assert str(chunks[0]["Nome"].dtype) == "string"
+        assert sum(map(len, chunks)) == 22
+
+    def test_header_only(self, tmp_path):
+        pytest.importorskip("pyarrow")
+        path = tmp_path / "empty.csv"
+        path.write_text("Nome,Email\n", encoding="utf-8")
+        chunks = list(iter_csv_chunks_arrow(str(path), 10))
+        assert [c.shape for c in chunks] == [(0, 2)]
+
+    def test_parquet_copy(self, tmp_path):
+        pq = pytest.importorskip("pyarrow.parquet")
+        src = self._write_input(tmp_path)
+        out = tmp_path / "out.csv"
+        parquet = tmp_path / "out.parquet"
+        result = write_ghl_csv(read_file_chunks(str(src), chunksize=5), out, parquet_path=parquet)
+        table = pq.read_table(parquet)
+        assert table.column_names == GHL_COLUMNS
+        assert pq.ParquetFile(parquet).num_row_groups == 5
+        from_parquet = table.to_pandas()
+        from_csv = pd.read_csv(out, encoding="utf-8-sig", dtype=str, keep_default_na=False)
+        assert len(from_parquet) == result["rows_output"] == 22
+        assert from_parquet.equals(from_csv)
+
+    def test_parquet_empty_output(self, tmp_path):
+        pq = pytest.importorskip("pyarrow.parquet")
+        path = tmp_path / "empty.csv"
+        path.write_text("Nome,Email\n", encoding="utf-8")
+        parquet = tmp_path / "out.parquet"
+        write_ghl_csv(read_file_chunks(str(path), chunksize=10), tmp_path / "out.csv", parquet_path=parquet)
+        table = pq.read_table(parquet)
+        assert table.num_rows == 0
+        assert table.column_names == GHL_COLUMNS
+
+
+class TestRowIndex:
+    def _write(self, tmp_path, out_name, text, chunksize=3):
+        from app.row_index import RowIndex
+
+        src = tmp_path / "in.csv"
+        src.write_text(text, encoding="utf-8")
+        out = tmp_path / out_name
+        write_ghl_csv(read_file_chunks(str(src), chunksize=chunksize), out, index_dir=tmp_path / "idx")
+        expected = pd.read_csv(out, encoding="utf-8-sig", dtype=str, keep_default_na=False)
+        return RowIndex(tmp_path / "idx", out, GHL_COLUMNS), expected.to_dict(orient="records")
+
+    def test_multiline_fields(self, tmp_path):
+        index, expected = self._write(
+            tmp_path,
+            "out.csv",
+            'Nome,Email,Obs\nAna,a@x.com,"linha 1\nlinha 2"\nBia,,"a\r\nb"\nCaio,c@x.com,ok\nDavi,,\n',
+        )
+        total, rows = index.page(0, 10)
+        assert total == 4
+        assert [r["data"] for r in rows] == expected
+        assert "linha 1\nlinha 2" in rows[0]["data"]["Notes"]
+        total, rows = index.page(0, 10, "missing_email")
+        assert (total, [r["row"] for r in rows]) == (2, [1, 3])
+
+    def test_gzip_checkpoints(self, tmp_path):
+        import gzip
+        from unittest.mock import patch
+
+        text = "Nome,Email,Telefone\n" + "".join(f"Contato {i},c{i}@x.com,8599999{i:04d}\n" for i in range(50))
+        with patch("app.row_index.CHECKPOINT_ROWS", 4):
+            index, expected = self._write(tmp_path, "out.csv.gz", text, chunksize=10)
+        assert (tmp_path / "idx" / "checkpoints.u64").stat().st_size == 16 * 15
+        for offset in (0, 3, 4, 17, 45):
+            total, rows = index.page(offset, 7)
+            assert total == 50
+            assert [r["data"] for r in rows] == expected[offset:offset + 7]
+        assert gzip.decompress((tmp_path / "out.csv.gz").read_bytes()).startswith(b"\xef\xbb\xbfFull Name,")
+
+    def test_invalid_phone_filter_matches_report(self, tmp_path):
+        index, _ = self._write(
+            tmp_path,
+            "out.csv",
+            'Nome,Telefone\nAna,"+55 11 1234"\nBia,123\nCaio,85999991234\nDavi,\n',
+        )
+        total, rows = index.page(0, 10, "invalid_phone")
+        assert (total, [r["row"] for r in rows]) == (2, [0, 1])
+
+    def test_offset_past_end(self, tmp_path):
+        index, _ = self._write(tmp_path, "out.csv", "Nome\nAna\n")
+        assert index.page(5, 10) == (1, [])
+
+
+class TestStreamingXlsx:
+    def _write_input(self, tmp_path, rows=25):
+        from openpyxl import Workbook
+
+        wb = Workbook()
+        ws = wb.active
+        ws.append(["Nome", "E-mail", "Telefone", None, "Nome", "CPF"])
+        for i in range(rows):
+            email = f"user{i}@test.com" if i % 2 else None
+            ws.append([f"Contato {i}", email, 85999990000 + i, None, "dup", i])
+        ws.append([None] * 6)
+        path = tmp_path / "input.xlsx"
+        wb.save(path)
+        return path
+
+    def test_header_matches_read_excel(self, tmp_path):
+        src = self._write_input(tmp_path)
+        first = next(read_file_chunks(str(src), chunksize=10))
+        assert list(first.columns) == list(pd.read_excel(src).columns)
+
+    def test_chunks_match_single_pass(self, tmp_path):
+        src = self._write_input(tmp_path)
+        single = tmp_path / "single.csv"
+        chunked = tmp_path / "chunked.csv"
+        write_ghl_csv(read_file_chunks(str(src)), single)
+        result = write_ghl_csv(read_file_chunks(str(src), chunksize=7), chunked)
+        assert chunked.read_bytes() == single.read_bytes()
+        assert result["total_rows"] == 25
+        assert result["with_email"] == 12
+
+
+class TestShardedProcessing:
+    def _frame(self, rows=60):
+        return pd.DataFrame({
+            "Nome": [f"Contato {i}" for i in range(rows)],
+            "Email": [f"user{i % 7}@test.com" for i in range(rows)],
+            "Telefone": [f"8599999{i % 11:04d}" for i in range(rows)],
+            "CPF": [str(i) for i in range(rows)],
+        })
+
+    def test_parallel_matches_single_process(self, tmp_path):
+        df = self._frame()
+        single = tmp_path / "single.csv"
+        parallel = tmp_path / "parallel.csv"
+        expected = write_ghl_csv([df], single)
+        result = write_ghl_csv([df], parallel, workers=2, shard_rows=7, min_parallel_rows=10)
+        assert parallel.read_bytes() == single.read_bytes()
+        assert result["preview"] == expected["preview"]
+        assert result["total_rows"] == 60
+        assert result["phone_cache_hits"] + result["phone_cache_misses"] > 0
+
+    def test_single_process_shards_report_progress(self, tmp_path):
+        df = self._frame()
+        whole = tmp_path / "whole.csv"
+        sharded = tmp_path / "sharded.csv"
+        write_ghl_csv([df], whole, shard_rows=len(df))
+        progress = []
+        result = write_ghl_csv([df], sharded, shard_rows=25, on_progress=progress.append)
+        assert sharded.read_bytes() == whole.read_bytes()
+        assert progress == [25, 50, 60]
+        assert result["total_rows"] == 60
+
+    def test_below_threshold_stays_inline(self, tmp_path):
+        df = self._frame(rows=5)
+        cache = PhoneCache()
+        result = write_ghl_csv([df], tmp_path / "out.csv", phone_cache=cache, workers=4, min_parallel_rows=100)
+        assert result["rows_output"] == 5
+        assert cache.misses == 5
+
+
+class TestJobMetrics:
+    def test_nested_phases_are_exclusive(self, monkeypatch):
+        from app import metrics as metrics_module
+        from app.metrics import JobMetrics
+
+        # Relógios falsos: só andam quando o teste manda (sem time.sleep)
+        clock = {"wall": 100.0, "cpu": 10.0}
+        monkeypatch.setattr(metrics_module.time, "perf_counter", lambda: clock["wall"])
+        monkeypatch.setattr(metrics_module.time, "process_time", lambda: clock["cpu"])
+
+        def advance(wall, cpu):
+            clock["wall"] += wall
+            clock["cpu"] += cpu
+
+        metrics = JobMetrics()
+        with metrics.phase("outer"):
+            advance(2.0, 1.0)
+            with metrics.phase("inner", rows=10):
+                advance(5.0, 4.0)
+            advance(1.0, 0.5)
+        with metrics.phase("inner", rows=5):
+            advance(0.5, 0.25)
+        phases = metrics.as_dict()
+        assert phases["outer"]["wall_seconds"] == 3.0
+        assert phases["outer"]["cpu_seconds"] == 1.5
+        assert phases["outer"]["rows_per_sec"] is None
+        assert phases["inner"]["wall_seconds"] == 5.5
+        assert phases["inner"]["cpu_seconds"] == 4.25
+        assert phases["inner"]["rows"] == 15
+        assert phases["inner"]["rows_per_sec"] == round(15 / 5.5, 1)
+
+    def test_write_ghl_csv_records_phases(self, tmp_path):
+        from app.metrics import JobMetrics
+
+        src = tmp_path / "in.csv"
+        src.write_text("Nome,Telefone\n" + "\n".join(f"C{i},8599999{i:04d}" for i in range(30)), encoding="utf-8")
+        metrics = JobMetrics().start()
+        write_ghl_csv(read_file_chunks(str(src), chunksize=7), tmp_path / "out.csv", metrics=metrics)
+        metrics.stop()
+        phases = metrics.as_dict()
+        assert phases["read"]["rows"] == 30
+        assert phases["normalize"]["rows"] == 30
+        assert phases["write_csv"]["rows"] == 30
+        assert phases["normalize"]["peak_rss_mb"] is None or phases["normalize"]["peak_rss_mb"] > 0
+
+    def test_render_prometheus(self):
+        from app.metrics import render_prometheus
+
+        text = render_prometheus(
+            {"normalize|1.0": "2", "normalize|+Inf": "3", "normalize|sum": "4.5"},
+            {"normalize": "300"},
+            {"done": "3"},
+        )
+        assert 'flowbase_job_phase_seconds_bucket{phase="normalize",le="1.0"} 2' in text
+        assert 'flowbase_job_phase_seconds_bucket{phase="normalize",le="0.5"} 0' in text
+        assert 'flowbase_job_phase_seconds_count{phase="normalize"} 3' in text
+        assert 'flowbase_job_phase_rows_total{phase="normalize"} 300' in text
+        assert 'flowbase_jobs_total{status="done"} 3' in text
@@ -0,0 +1,63 @@
+"""Testes do supervisor de workers (encerramento sem matar o job em andamento)."""
+import functools
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+import pytest
+
+from app import worker
+
+
+def _fake_rq_worker(log_path):
+    """
+    Simula um worker RQ com um job de ~1.5s: o primeiro sinal pede warm shutdown (termina o job);
+    um segundo sinal seria o cold shutdown do RQ, que mata o job.
+    """
+    received = []
+
+    def _on_signal(signum, frame):
+        received.append(signum)
+
+    signal.signal(signal.SIGINT, _on_signal)
+    signal.signal(signal.SIGTERM, _on_signal)
+    with open(log_path, "a") as f:
+        f.write("started\n")
+    deadline = time.monotonic() + 1.5
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+    with open(log_path, "a") as f:
+        f.write(f"done signals={len(received)}\n")
+
+
+def _supervisor_in_own_group():
+    # Como num terminal: supervisor e filhos no grupo em primeiro plano, que recebe o Ctrl+C
+    os.setpgid(0, 0)
+    worker.run_supervisor(1, shutdown_timeout=10)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="grupos de processos/fork só em POSIX")
+def test_ctrl_c_lets_running_job_finish(tmp_path, monkeypatch):
+    log_path = tmp_path / "worker.log"
+    monkeypatch.setattr(worker, "run_worker", functools.partial(_fake_rq_worker, str(log_path)))
+    supervisor = multiprocessing.get_context("fork").Process(target=_supervisor_in_own_group)
+    supervisor.start()
+    try:
+        deadline = time.monotonic() + 10
+        while not (log_path.exists() and "started" in log_path.read_text()):
+            assert time.monotonic() < deadline, "worker não iniciou"
+            time.sleep(0.05)
+
+        # Ctrl+C: SIGINT para o grupo de processos inteiro
+        os.killpg(supervisor.pid, signal.SIGINT)
+        supervisor.join(15)
+        assert supervisor.exitcode == 0
+    finally:
+        if supervisor.is_alive():
+            os.killpg(supervisor.pid, signal.SIGKILL)
+            supervisor.join()
+
+    # O job terminou e o worker recebeu um único sinal de parada (o SIGTERM do supervisor)
+    assert log_path.read_text().splitlines() == ["started", "done signals=1"]
@@ -3,9 +3,24 @@ Contact Data Validator
 Valida e formata emails e telefones brasileiros
 """
 
+import numpy as np
 import pandas as pd
 import re
-from typing import List, Tuple
+from typing import Iterable, List, Tuple
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+EMAIL_SPLIT_PATTERN = re.compile(r'[;/,\s]+')
+NON_DIGIT_PATTERN = re.compile(r'\D')
+
+
+def _as_text_series(values: Iterable) -> Tuple[pd.Series, pd.Series]:
+    """Series de texto (sem espacos nas pontas) e mascara das celulas vazias/nulas."""
+    s = pd.Series(list(values) if not isinstance(values, pd.Series) else values, dtype=object)
+    s = s.reset_index(drop=True)
+    missing = s.isna()
+    text = s.where(~missing, '').astype(str).str.strip().astype(object)
+    return text, missing | (text == '')
+
 
 class ContactDataValidator:
     def __init__(self, default_ddd='85'):
@@ -25,7 +40,7 @@ class ContactDataValidator:
             return '', '', []
 
         email_str = str(email_str).lower().strip()
-        potential_emails = re.split(r'[;/,\s]+', email_str)
+        potential_emails = EMAIL_SPLIT_PATTERN.split(email_str)
 
         valid_emails = []
         invalid_emails = []
@@ -35,8 +50,7 @@ class ContactDataValidator:
             if not email or '@' not in email:
                 continue
 
-            pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-            if re.match(pattern, email):
+            if EMAIL_PATTERN.match(email):
                 valid_emails.append(email)
                 self.validation_report['valid_emails'] += 1
             else:
@@ -55,7 +69,7 @@ class ContactDataValidator:
             return []
 
         phone_str = str(phone_str).strip()
-        digits_only = re.sub(r'\D', '', phone_str)
+        digits_only = NON_DIGIT_PATTERN.sub('', phone_str)
 
         if len(digits_only) == 8:
             digits_only = self.default_ddd + digits_only
@@ -91,3 +105,58 @@ class ContactDataValidator:
             return valid_phones[0], ''
         else:
             return valid_phones[0], ', '.join(valid_phones[1:])
+
+    def validate_emails_batch(self, email_values: Iterable) -> Tuple[List[str], List[str], List[List[str]]]:
+        """
+        Versao em lote de validate_and_format_email para uma coluna inteira.
+        Retorna (principais, adicionais, invalidos) na ordem da entrada e soma os
+        contadores do validation_report de uma vez.
+        """
+        text, empty = _as_text_series(email_values)
+        n = len(text)
+        tokens = text.where(~empty, '').str.lower().str.split(EMAIL_SPLIT_PATTERN).explode()
+        tokens = tokens.dropna().str.strip()
+        tokens = tokens[(tokens != '') & tokens.str.contains('@', regex=False)]
+        is_valid = tokens.str.match(EMAIL_PATTERN).astype(bool)
+
+        valid = tokens[is_valid]
+        invalid = tokens[~is_valid]
+        self.validation_report['valid_emails'] += int(is_valid.sum())
+        self.validation_report['invalid_emails'] += int((~is_valid).sum())
+
+        rank = valid.groupby(level=0).cumcount()
+        main = valid[rank.to_numpy() == 0].reindex(range(n), fill_value='')
+        additional = (
+            valid[rank.to_numpy() > 0].groupby(level=0).agg(', '.join).reindex(range(n), fill_value='')
+        )
+        invalid_lists = invalid.groupby(level=0).agg(list).reindex(range(n))
+        invalid_lists = [v if isinstance(v, list) else [] for v in invalid_lists]
+        return main.tolist(), additional.tolist(), invalid_lists
+
+    def format_phones_batch(self, phone_values: Iterable) -> Tuple[List[str], List[str]]:
+        """
+        Versao em lote de validate_and_format_phones para uma coluna inteira.
+        Retorna (principais, adicionais) na ordem da entrada e soma os contadores
+        do validation_report de uma vez.
+        """
+        text, empty = _as_text_series(phone_values)
+        digits = text.str.replace(NON_DIGIT_PATTERN, '', regex=True)
+
+        for size in (8, 9):
+            needs_ddd = ~empty & (digits.str.len() == size)
+            digits = digits.where(~needs_ddd, self.default_ddd + digits)
+            self.validation_report['phones_with_ddd_added'] += int(needs_ddd.sum())
+
+        lengths = digits.str.len()
+        ddd = digits.str[:2]
+        formatted = np.select(
+            [lengths == 11, lengths == 10],
+            [
+                '+55 ' + ddd + ' ' + digits.str[2:7] + '-' + digits.str[7:],
+                '+55 ' + ddd + ' ' + digits.str[2:6] + '-' + digits.str[6:],
+            ],
+            default=f'+55 {self.default_ddd} ' + digits,
+        )
+        formatted = np.where(empty, '', formatted)
+        self.validation_report['valid_phones'] += int((~empty).sum())
+        return formatted.tolist(), [''] * len(formatted)
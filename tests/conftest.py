@@ -0,0 +1,9 @@
+"""
+Testes do servidor Flask da raiz (api_server.py + contact_validator.py).
+O backend FastAPI tem os próprios testes em backend/tests.
+"""
+import sys
+from pathlib import Path
+
+# Módulos da raiz importáveis de qualquer diretório
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
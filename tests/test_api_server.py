@@ -0,0 +1,102 @@
+"""POST /validate: resposta em streaming (padrão) igual à do modo ?stream=0."""
+import importlib
+import io
+
+import pandas as pd
+import pytest
+
+import api_server
+
+ID_COLUMNS = ["Contact ID", "Opportunity ID"]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setitem(api_server.app.config, "UPLOAD_FOLDER", str(tmp_path))
+    monkeypatch.setitem(api_server.app.config, "STREAM_RESPONSE", True)
+    api_server.app.config["TESTING"] = True
+    return api_server.app.test_client()
+
+
+def _csv_input(rows):
+    lines = ["Nome Contato,Empresa,Telefone,Email"]
+    for i in range(rows):
+        # Celulares com DDD, fixos sem DDD e vazios
+        if i % 7 == 0:
+            phone = ""
+        elif i % 3:
+            phone = f"(85) 9{i % 10000:04d}-{i % 9000:04d}"
+        else:
+            phone = f"3456{i % 10000:04d}"
+        email = "" if i % 5 == 0 else f"contato{i}@example.com" + (f"; extra{i}@example.com" if i % 4 == 0 else "")
+        lines.append(f"contato {i} silva,Empresa {i % 13},{phone},{email}")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _post(client, content, query=""):
+    data = {"file": (io.BytesIO(content), "contatos.csv")}
+    return client.post(f"/validate{query}", data=data, content_type="multipart/form-data")
+
+
+def _read_output(resp):
+    df = pd.read_csv(io.BytesIO(resp.get_data()), dtype=str, keep_default_na=False)
+    assert df[ID_COLUMNS[0]].str.fullmatch(r"[A-Z0-9]{20}").all()
+    return df.drop(columns=ID_COLUMNS)
+
+
+@pytest.mark.parametrize("rows", [0, 10, 12_345])
+def test_streamed_output_matches_non_streamed(client, tmp_path, rows):
+    # 12_345 linhas: mais de um bloco com o padrão de 5000 linhas
+    content = _csv_input(rows)
+    streamed = _post(client, content)
+    buffered = _post(client, content, "?stream=0")
+
+    assert streamed.status_code == buffered.status_code == 200
+    # Em streaming o tamanho não é conhecido antes de responder
+    assert "Content-Length" not in streamed.headers and "Content-Length" in buffered.headers
+    assert streamed.headers["Content-Disposition"].startswith("attachment;")
+    pd.testing.assert_frame_equal(_read_output(streamed), _read_output(buffered))
+    assert len(_read_output(streamed)) == rows
+    # Os dois modos apagam o upload ao terminar
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_numeric_phone_column_with_blanks(client):
+    # Coluna de telefone só com números e células vazias: pd.read_csv inferiria float64
+    content = b"Nome,Telefone,Idade\nAna,85987654321,30\nBia,,\nCaio,1134567890,41\n"
+    streamed = _read_output(_post(client, content))
+    buffered = _read_output(_post(client, content, "?stream=0"))
+    pd.testing.assert_frame_equal(streamed, buffered)
+    assert streamed["Phone"].tolist() == ["+55 85 98765-4321", "", "+55 11 3456-7890"]
+
+
+def test_default_chunk_is_5000_rows(client, monkeypatch):
+    assert api_server.app.config["VALIDATE_CHUNK_ROWS"] == 5000
+    sizes = []
+    build_output = api_server._build_output
+
+    def _record(df, *args):
+        sizes.append(len(df))
+        return build_output(df, *args)
+
+    monkeypatch.setattr(api_server, "_build_output", _record)
+    resp = _post(client, _csv_input(12_345))
+    resp.get_data()
+    assert sizes == [5000, 5000, 2345]
+
+
+def test_backend_stream_setting_does_not_affect_validate(monkeypatch):
+    # STREAM_CHUNK_ROWS=0 desliga o streaming do worker do backend; /validate usa VALIDATE_CHUNK_ROWS
+    monkeypatch.setenv("STREAM_CHUNK_ROWS", "0")
+    monkeypatch.delenv("VALIDATE_CHUNK_ROWS", raising=False)
+    assert importlib.reload(api_server).app.config["VALIDATE_CHUNK_ROWS"] == 5000
+
+
+def test_invalid_chunk_rows_rejected_at_startup(monkeypatch):
+    monkeypatch.setenv("VALIDATE_CHUNK_ROWS", "0")
+    try:
+        with pytest.raises(ValueError, match="VALIDATE_CHUNK_ROWS"):
+            importlib.reload(api_server)
+    finally:
+        monkeypatch.delenv("VALIDATE_CHUNK_ROWS")
+        importlib.reload(api_server)
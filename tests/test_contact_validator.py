@@ -0,0 +1,70 @@
+"""Paridade das APIs em lote do ContactDataValidator com as funções por célula."""
+import numpy as np
+import pytest
+
+from contact_validator import ContactDataValidator
+
+EMAILS = [
+    "joao@test.com",
+    "  MARIA@Example.COM  ",
+    "a@b.com; c@d.org, e@f.net",
+    "invalido@",
+    "sem-arroba",
+    "ok@test.com / ruim@x",
+    "",
+    "   ",
+    None,
+    np.nan,
+    "x@y.co/ z@w.io",
+]
+
+PHONES = [
+    "85999991234",
+    "(11) 3456-7890",
+    "99999-1234",
+    "3456-7890",
+    "123",
+    "+55 85 99999-1234",
+    "",
+    "  ",
+    None,
+    np.nan,
+    85999991234,
+    "tel: 11 98765 4321",
+]
+
+
+def _per_cell_emails(validator, values):
+    results = [validator.validate_and_format_email(v) for v in values]
+    return [r[0] for r in results], [r[1] for r in results], [r[2] for r in results]
+
+
+def _per_cell_phones(validator, values):
+    results = [validator.validate_and_format_phones(v) for v in values]
+    return [r[0] for r in results], [r[1] for r in results]
+
+
+@pytest.mark.parametrize("values", [EMAILS, [], ["", None]])
+def test_validate_emails_batch_matches_per_cell(values):
+    per_cell, batch = ContactDataValidator(), ContactDataValidator()
+    assert batch.validate_emails_batch(values) == _per_cell_emails(per_cell, values)
+    assert batch.validation_report == per_cell.validation_report
+
+
+@pytest.mark.parametrize("values", [PHONES, [], ["", None]])
+def test_format_phones_batch_matches_per_cell(values):
+    per_cell, batch = ContactDataValidator(), ContactDataValidator()
+    assert batch.format_phones_batch(values) == _per_cell_phones(per_cell, values)
+    assert batch.validation_report == per_cell.validation_report
+
+
+def test_counters_accumulate_across_batches():
+    per_cell, batch = ContactDataValidator(default_ddd="11"), ContactDataValidator(default_ddd="11")
+    for _ in range(2):
+        _per_cell_emails(per_cell, EMAILS)
+        _per_cell_phones(per_cell, PHONES)
+        batch.validate_emails_batch(EMAILS)
+        batch.format_phones_batch(PHONES)
+    assert batch.validation_report == per_cell.validation_report
+    assert batch.validation_report["phones_with_ddd_added"] > 0
+    assert batch.validation_report["invalid_emails"] > 0